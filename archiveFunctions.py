@@ -0,0 +1,155 @@
+import os
+import tarfile
+import time
+import typing as tp
+import zipfile
+
+ARCHIVE_FORMATS = ('tar', 'zip') # archive file extensions
+
+ENTRY_OVERHEAD = 4096  # bytes reserved for the headers of an entry
+END_OVERHEAD   = 10240 # bytes reserved for the end of an archive
+
+# zip central directory record size of an entry without the name
+# (ZIP64 extra field included)
+CENTRAL_ENTRY_SIZE = 46 + 28
+
+class ArchiveWriter:
+  """
+  Writes files to a tar or zip archive (entries are stored, audio is
+      compressed already), optionally split into volumes of a maximum size.
+      Volumes are complete archives, an entry is never split.
+
+  baseName : str
+    Archive full name without the extension. Volumes are named
+        "<baseName>.001.<format>", "<baseName>.002.<format>", ... if
+        "maxBytes" is set, "<baseName>.<format>" otherwise.
+
+  archiveFormat : str
+    'tar' or 'zip'.
+
+  maxBytes : int
+    Maximum volume size in bytes (an entry larger than that gets
+        a volume of its own).
+    Defaults to None (a single archive).
+  """
+
+  def __init__(self, baseName : str, archiveFormat: str,
+                     maxBytes : tp.Optional[int]=None) -> None:
+    # check "archiveFormat" argument value provided
+    if archiveFormat not in ARCHIVE_FORMATS:
+      raise ValueError('"archiveFormat" must be "tar" or "zip" ' +
+                       f'("{archiveFormat}" was provided)!')
+
+    # check "maxBytes" argument type and value provided
+    if maxBytes is not None:
+      if not isinstance(maxBytes, int):
+        raise TypeError('"maxBytes" must be an integer ' +
+                        f'("{type(maxBytes)}" was provided)!')
+      if maxBytes < 1:
+        raise ValueError('"maxBytes" must be positive ' +
+                         f'("{maxBytes}" was provided)!')
+
+    self.baseName      = baseName
+    self.archiveFormat = archiveFormat
+    self.maxBytes      = maxBytes
+
+    self.volumes      = [] # archive full names
+    self.nEntries     = 0  # entries of the current volume
+    self.centralBytes = 0  # zip central directory size of the current volume
+    self.stream       = None
+    self.archive      = None
+
+  def openVolume(self) -> None:
+    self.closeVolume()
+
+    if self.maxBytes is None:
+      name = f'{self.baseName}.{self.archiveFormat}'
+    else:
+      name = f'{self.baseName}.{len(self.volumes) + 1:03d}.' + \
+             self.archiveFormat
+    self.volumes.append(name)
+
+    self.stream = open(name, 'wb')
+    if self.archiveFormat == 'tar':
+      self.archive = tarfile.open(fileobj=self.stream, mode='w',
+                                  format=tarfile.PAX_FORMAT)
+    else:
+      self.archive = zipfile.ZipFile(self.stream, 'w', zipfile.ZIP_STORED,
+                                     allowZip64=True)
+    self.nEntries     = 0
+    self.centralBytes = 0
+
+  def closeVolume(self) -> None:
+    if self.archive is not None:
+      self.archive.close()
+      self.stream.close()
+      self.archive, self.stream = None, None
+
+  def add(self, fileFullName: str, entryName: str) -> str:
+    """
+    Appends a file to the archive, starting a new volume if the file does
+        not fit in the current one. The zip central directory written at
+        the end of a volume is counted in its size.
+
+    fileFullName : str
+      Full name of the file.
+
+    entryName : str
+      Path of the entry in the archive ('/' separated).
+
+    Returns:
+      Full name of the archive volume the file was added to : str.
+    """
+
+    centralBytes = 0 # central directory record of the entry
+    if self.archiveFormat == 'zip':
+      centralBytes = CENTRAL_ENTRY_SIZE + len(entryName.encode('utf-8'))
+
+    with open(fileFullName, 'rb') as f:
+      nBytes = os.fstat(f.fileno()).st_size
+      if self.archive is None or \
+          (self.maxBytes is not None and self.nEntries > 0 and
+           self.stream.tell() + ENTRY_OVERHEAD + nBytes +
+           self.centralBytes + centralBytes + END_OVERHEAD > self.maxBytes):
+        self.openVolume()
+
+      if self.archiveFormat == 'tar':
+        info       = tarfile.TarInfo(entryName)
+        info.size  = nBytes
+        info.mtime = int(time.time())
+        info.mode  = 0o644
+        self.archive.addfile(info, f)
+      else:
+        info = zipfile.ZipInfo(entryName, time.localtime()[:6])
+        info.file_size     = nBytes # ZIP64 records for large files
+        info.compress_type = zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        with self.archive.open(info, 'w') as entry:
+          while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+              break
+            entry.write(chunk)
+
+    self.nEntries     += 1
+    self.centralBytes += centralBytes
+
+    return self.volumes[-1]
+
+  def close(self) -> tp.List[str]:
+    """
+    Finishes the archive.
+
+    Returns:
+      Full names of the archive volumes : List[str].
+    """
+
+    self.closeVolume()
+
+    return self.volumes
+
+  def __enter__(self) -> 'ArchiveWriter':
+    return self
+
+  def __exit__(self, *excInfo: tp.Any) -> None:
+    self.close()
@@ -1,74 +1,76 @@
-import csv
+import asyncio
+import contextlib
+import contextvars
+import hashlib
 import multiprocessing as mp
+import multiprocessing.pool
 import os
+import queue
+import shutil
 import subprocess as sp
+import tempfile
+import time
 import typing as tp
 
+import archiveFunctions as ar
+import cacheFunctions as cf
+import diskFunctions as df
 import fileFunctions as ff
-import getInfo as gi
+import manifestFunctions as mf
+import metricFunctions as mt
+import profileFunctions as pf
+import segmentFunctions as sg
 import sysFunctions as sf
+import tagFunctions as tg
+import trackFunctions as tf
 
-def readFileListData(infoFile: str) -> \
-    tp.Tuple[str, str, tp.List[str], tp.List[str], tp.List[str],
-             tp.List[str], tp.List[str], tp.List[str]]:
+def readFileListData(infoFile: tp.Union[str, tf.TrackTable]) -> \
+    tp.Tuple[str, str, tp.List[str], tp.List[str], tp.List[float],
+             tp.List[str], tp.List[str], tp.List[str], tp.List[int],
+             tp.List[str]]:
   """
-  Reads files data from a csv file.
+  Reads data of files to convert from a csv file or a binary track file.
 
-  infoFile : str
-    A csv file containing infromation about files.
+  infoFile : str or TrackTable
+    A csv file (or a binary track file) containing infromation about files,
+        or a table of tracks.
 
   Returns:
     Path to input root folder : str.
     Input root folder name : str.
     List of input file full names : List[str].
     List of input file names : List[str].
-    List of input file kbps : List[str].
+    List of input file kbps (0 if unknown) : List[float].
     List of converted file names : List[str].
     List of converted file titles : List[str].
     List of converted file artists : List[str].
+    List of input file sizes in bytes : List[int].
+    List of input file bitrate types : List[str].
   """
 
-  fullName      = []
-  existFileName = []
-  kbps          = []
-  newFileName   = []
-  title         = []
-  artist        = []
-
-  # read the content of a CSV file
-  with open(infoFile, 'r') as csvfile:
-    reader = csv.reader(csvfile, dialect='excel')
-
-    # extract the root folder path
-    header     = next(reader) # read and skip the header line
-    rootFolder = header[0]
-
-    # get first occurrence of root folder opening bracket
-    # NOTE: regex was not used because the path may contain brackets
-    openBracketIdx = rootFolder.find('(')
-    if openBracketIdx > -1:
-      rootPath   = rootFolder[openBracketIdx+1:-1]
-      rootFolder = os.path.split(rootPath)[-1] # get root folder name
-
-    for row in reader:
-      if len(row) > 8:            # files to process
-        processedName = row[8]  # gey a new file name value
-        if processedName != '': # check if a new file name exists
-          fullName.append(row[0])
-          existFileName.append(row[1])
-          kbps.append(row[4])
-          newFileName.append(row[8])
-          title.append(row[9])
-          artist.append(row[10])
-
-  return rootPath, rootFolder, fullName, existFileName, kbps, newFileName, \
-      title, artist
+  if isinstance(infoFile, tf.TrackTable):
+    tracks = infoFile
+  else:
+    tracks = tf.loadTracks(infoFile)
+  selected = tracks.selected() # files with a new file name
 
-def createFolders(rootPath      : str, rootFolder : str,
+  rootPath   = tracks.rootPath
+  rootFolder = os.path.split(rootPath)[-1] # get root folder name
+
+  def column(values: tp.Sequence[tp.Any]) -> tp.List[tp.Any]:
+    return [values[i] for i in selected]
+
+  return rootPath, rootFolder, column(tracks.fullName), \
+      column(tracks.fileName), column(tracks.kbps), \
+      column(tracks.newFileName), column(tracks.newTitle), \
+      column(tracks.newArtist), column(tracks.sizeBytes), \
+      column(tracks.bitrateType)
+
+def getOutFolders(rootPath      : str, rootFolder : str,
                   outFolder     : str, fullName   : tp.List[str],
                   existFileName : tp.List[str]) -> tp.List[str]:
   """
-  Creates output folder hierarchy.
+  Gets output folders of files.
 
   rootPath : str
     Input folder path.
@@ -98,6 +100,36 @@ def createFolders(rootPath      : str, rootFolder : str,
     thePath = thePath[:-1]
     outPaths.append(thePath)
 
+  return outPaths
+
+def createFolders(rootPath      : str, rootFolder : str,
+                  outFolder     : str, fullName   : tp.List[str],
+                  existFileName : tp.List[str]) -> tp.List[str]:
+  """
+  Creates output folder hierarchy.
+
+  rootPath : str
+    Input folder path.
+
+  rootFolder : str
+    Input folder name.
+
+  outFolder : str
+    Output folder path.
+
+  fullName : List[str]
+    List of input file full names.
+
+  existFileName : List[str]
+    List of input file names.
+
+  Returns:
+    List of output folders : List[str].
+  """
+
+  outPaths = getOutFolders(rootPath, rootFolder, outFolder, fullName,
+                           existFileName)
+
   # remove duplicates
   setOutFolders = list(set(outPaths))
 
@@ -107,19 +139,268 @@ def createFolders(rootPath      : str, rootFolder : str,
 
   return outPaths
 
-def convertAudioFile(fileFullName  : str, fileExistkbps : str,
+def getEncodekbps(fileFullName : str, fileExistkbps : float,
+                  newkbps      : int, profile: str='mp3') -> \
+    tp.Optional[float]:
+  """
+  Gets the kbps an audio file is encoded with.
+
+  fileFullName : str
+    Input file name.
+
+  fileExistkbps : float
+    Input file kbps (0 if unknown).
+
+  newkbps : int
+    Converted file kbps.
+
+  profile : str
+    Output profile name (see "profileFunctions.getProfile").
+    Defaults to 'mp3' (constant bitrate MP3 at "newkbps").
+
+  Returns:
+    Encode kbps (nominal kbps for quality modes) : float,
+        or None if the audio is copied.
+  """
+
+  outProfile = pf.getProfile(profile, newkbps)
+
+  if outProfile.kbps > fileExistkbps: # for smaller existing kbps ...
+    if fileFullName[-4:] == '.mp3' and \
+        outProfile.codec == 'libmp3lame': # ... copy audio
+      return None
+    if fileExistkbps > 0 and outProfile.quality is None:
+      return fileExistkbps # ... convert to new filetype
+
+  return float(outProfile.kbps) # reduce kbps (or input kbps is unknown)
+
+def getOutputBitrate(fileFullName : str, fileExistkbps : float,
+                     fileExistBitrateType : str, newkbps : int,
+                     profile : str='mp3') -> tp.Tuple[str, str]:
+  """
+  Gets the bitrate of a converted file.
+
+  fileFullName : str
+    Input file name.
+
+  fileExistkbps : float
+    Input file kbps (0 if unknown).
+
+  fileExistBitrateType : str
+    Input file bitrate type.
+
+  newkbps : int
+    Converted file kbps.
+
+  profile : str
+    Output profile name. Defaults to 'mp3'.
+
+  Returns:
+    Converted file Bitrate Type, Bitrate (kbps, nominal for quality
+        modes) : Tuple[str, str].
+  """
+
+  encodekbps = getEncodekbps(fileFullName, fileExistkbps, newkbps, profile)
+  if encodekbps is None: # audio is copied
+    return fileExistBitrateType, tf.kbpsText(fileExistkbps)
+
+  return pf.getProfile(profile, newkbps).bitrateType, \
+      tf.kbpsText(encodekbps)
+
+def buildConvertCmd(fileFullName : str, fileExistkbps : float,
+                    fileArtist   : str, fileTitle     : str,
+                    newkbps      : int, output: str='pipe:1',
+                    profile      : str='mp3') -> tp.List[str]:
+  """
+  Builds a converter command.
+
+  fileFullName : str
+    Input file name.
+
+  fileExistkbps : float
+    Input file kbps (0 if unknown).
+
+  fileArtist : str
+    Converted file artist.
+
+  fileTitle : str
+    Converted file title.
+
+  newkbps : int
+    Converted file kbps.
+
+  output : str
+    Converter output. Defaults to 'pipe:1' (standard output).
+
+  profile : str
+    Output profile name. Defaults to 'mp3'.
+
+  Returns:
+    Converter command : List[str].
+  """
+
+  # converter command
+  cmd = ['ffmpeg', '-i', f'{fileFullName}',
+         *buildOutputArgs(fileFullName, fileExistkbps, fileArtist,
+                          fileTitle, newkbps, output, profile)]
+
+  if not output.startswith('pipe:'): # overwrite an empty temporary file
+    cmd.insert(1, '-y')
+
+  return cmd
+
+def buildOutputArgs(fileFullName : str, fileExistkbps : float,
+                    fileArtist   : str, fileTitle     : str,
+                    newkbps      : int, output        : str,
+                    profile      : str='mp3') -> tp.List[str]:
+  """
+  Builds converter arguments of a single output (the converter may have
+      several outputs of one input).
+
+  fileFullName : str
+    Input file name.
+
+  fileExistkbps : float
+    Input file kbps (0 if unknown).
+
+  fileArtist : str
+    Converted file artist.
+
+  fileTitle : str
+    Converted file title.
+
+  newkbps : int
+    Converted file kbps.
+
+  output : str
+    Converter output.
+
+  profile : str
+    Output profile name. Defaults to 'mp3'.
+
+  Returns:
+    Converter output arguments : List[str].
+  """
+
+  outProfile = pf.getProfile(profile, newkbps)
+  encodekbps = getEncodekbps(fileFullName, fileExistkbps, newkbps, profile)
+
+  if encodekbps is None: # copy audio
+    return ['-vn', '-sn', '-dn',
+            '-map', 'a', '-codec:a', 'copy',
+            '-map_metadata', '-1',
+            '-metadata', f'Artist={fileArtist}',
+            '-metadata', f'Title={fileTitle}',
+            '-f', 'mp3', output]
+
+  # convert with the profile encoder
+  return ['-vn', '-sn', '-dn',
+          '-map', 'a', *outProfile.encodeArgs(encodekbps),
+          '-map_metadata', '-1',
+          '-metadata', f'Artist={fileArtist}',
+          '-metadata', f'Title={fileTitle}',
+          '-f', outProfile.muxer, output]
+
+def rewriteAudioTags(fileFullName : str, fileArtist: str, fileTitle: str,
+                     outFile      : tp.BinaryIO) -> \
+    tp.Optional[tp.Tuple[int, bytes]]:
+  """
+  Writes an MP3 file with Artist and Title tags only, copying its audio
+      frames without the converter.
+
+  fileFullName : str
+    Input MP3 file name.
+
+  fileArtist : str
+    Converted file artist.
+
+  fileTitle : str
+    Converted file title.
+
+  outFile : BinaryIO
+    Empty output file opened in binary mode.
+
+  Returns:
+    Return code (0 on success), error output : Tuple[int, bytes],
+        or None if the input is not a plain MP3 file (nothing is written).
+  """
+
+  try:
+    if not tg.rewriteMP3Tags(fileFullName, outFile.fileno(), fileTitle,
+                             fileArtist):
+      return None
+  except OSError as err:
+    return 1, str(err).encode('utf-8')
+
+  return 0, b''
+
+def runConverter(cmd    : tp.List[str], fileFullName: str,
+                 stdout : tp.Any) -> tp.Tuple[int, bytes]:
+  """
+  Runs a converter holding a reader slot of the input file device (see
+      "diskFunctions.readerSlot"). If read-ahead is set in the worker
+      process (see "diskFunctions.initReaders"), files which can be
+      streamed are fed to the converter standard input instead, and
+      the slot is only held while the file is read.
+
+  cmd : List[str]
+    Converter command reading "fileFullName" (the "-i" argument).
+
+  fileFullName : str
+    Input file name.
+
+  stdout : Any
+    Converter standard output (file object or subprocess constant).
+
+  Returns:
+    Converter return code and error output : Tuple[int, bytes].
+  """
+
+  if df.READ_AHEAD is None or not df.isStreamable(fileFullName):
+    with df.readerSlot(fileFullName):
+      cmdout = sp.run(cmd, stdout=stdout, stderr=sp.PIPE)
+    return cmdout.returncode, cmdout.stderr
+
+  cmd = list(cmd)
+  cmd[cmd.index('-i') + 1] = 'pipe:0' # read the input from the feeder
+  process = sp.Popen(cmd, stdin=sp.PIPE, stdout=stdout, stderr=sp.PIPE)
+  feeder  = df.FileFeeder(fileFullName, process.stdin, df.READ_AHEAD)
+  feeder.start()
+  try:
+    outerr = process.stderr.read()
+    process.wait()
+  except BaseException:
+    process.kill()
+    process.wait()
+    raise
+  finally:
+    feeder.join()
+
+  if feeder.error is not None: # truncated input
+    return 1, outerr + str(feeder.error).encode('utf-8')
+
+  return process.returncode, outerr
+
+def convertAudioFile(fileFullName  : str, fileExistkbps : float,
                      fileOutFolder : str, fileNewName   : str,
                      fileArtist    : str, fileTitle     : str,
-                     newkbps       : int, mOutput) -> None:
+                     newkbps       : int,
+                     nativeCopy    : bool=False,
+                     profile       : str='mp3',
+                     timings       : tp.Optional[tp.Dict[str, float]]=None) \
+    -> tp.Tuple[str, str, int, bytes]:
   """
-  Converts an audio file to MP3 format, reduces kbps,
+  Converts an audio file to MP3 format (or the format of another output
+      profile), reduces kbps,
       removes all tags and album art, and adds Artist and Title tags.
+  The converted stream is written to a temporary file in the output folder
+      which is renamed to the converted file name on success.
 
   fileFullName : str
     Input file name.
 
-  fileExistkbps : str
-    Input file kbps.
+  fileExistkbps : float
+    Input file kbps (0 if unknown).
 
   fileOutFolder : str
     Converted file folder.
@@ -136,91 +417,947 @@ def convertAudioFile(fileFullName  : str, fileExistkbps : str,
   newkbps : int
     Converted file kbps.
 
-  mOutput : multiprocessing manager
-    Output manager storying input file name, converted file name,
-        converted binary output, binary output error.
+  nativeCopy : bool
+    Specifies whether to rewrite tags of MP3 files which are not
+        re-encoded without the converter (audio frames are copied in
+        the kernel where possible).
+    Defaults to False (copy audio with the converter).
 
-  Returns None.
+  profile : str
+    Output profile name, defines the encoder, the output format and
+        the converted file extension (see "profileFunctions.getProfile").
+    Defaults to 'mp3' (constant bitrate MP3 at "newkbps").
+
+  timings : Dict[str, float]
+    Dictionary to which time spent in the "encode" (converter run) and
+        "write" (finishing the converted file) stages is written, seconds.
+    Defaults to None (do not measure).
+
+  Returns:
+    Input file name, converted file name, converted file size in bytes
+        (0 if not converted), tail of the converter error output :
+        Tuple[str, str, int, bytes].
   """
 
-  # if input file doesn't contain kbps info
-  if fileExistkbps == '':
-    fileExistkbps = 0
+  errTailLength = 4096 # bytes of the converter error output to keep
 
-  # converter command
-  if newkbps > float(fileExistkbps): # for smaller existing kbps ...
-    if fileFullName[-4:] == '.mp3': # ... copy audio
-      cmd = ['ffmpeg', '-i', f'{fileFullName}', '-vn', '-sn', '-dn',
-             '-map', 'a', '-codec:a', 'copy',
-             '-map_metadata', '-1',
-             '-metadata', f'Artist={fileArtist}',
-             '-metadata', f'Title={fileTitle}',
-             '-f', 'mp3', 'pipe:1']
-    else: # ... convert to new filetype
-      cmd = ['ffmpeg', '-i', f'{fileFullName}', '-vn', '-sn', '-dn',
-             '-map', 'a', '-codec:a', 'libmp3lame', '-b:a',
-             f'{fileExistkbps}k',
-             '-map_metadata', '-1',
-             '-metadata', f'Artist={fileArtist}',
-             '-metadata', f'Title={fileTitle}',
-             '-f', 'mp3', 'pipe:1']
-  else: # reduce kbps (convert with new kbps)
-    cmd = ['ffmpeg', '-i', f'{fileFullName}', '-vn', '-sn', '-dn',
-           '-map', 'a', '-codec:a', 'libmp3lame', '-b:a', f'{newkbps}k',
-           '-map_metadata', '-1',
-           '-metadata', f'Artist={fileArtist}',
-           '-metadata', f'Title={fileTitle}',
-           '-f', 'mp3', 'pipe:1']
-
-  # convert file
-  cmdout = sp.run(cmd, stdout=sp.PIPE, stderr=sp.PIPE)
-  output = cmdout.stdout
-  outerr = cmdout.stderr
+  # get converted file's full path
+  outProfile     = pf.getProfile(profile, newkbps)
+  outputFullName = os.path.join(fileOutFolder,
+                                fileNewName + '.' + outProfile.extension)
+
+  # audio of MP3 files which are not re-encoded is copied natively
+  nativeCopy = nativeCopy is True and \
+               getEncodekbps(fileFullName, fileExistkbps, newkbps,
+                             profile) is None
+
+  # convert file streaming the output to disk, muxers which rewrite
+  # the file header write the temporary file themselves
+  tempFd, tempFullName = ff.createTempFile(outputFullName)
+  output = tempFullName if outProfile.needsSeek else 'pipe:1'
+  cmd    = buildConvertCmd(fileFullName, fileExistkbps, fileArtist,
+                           fileTitle, newkbps, output,
+                           profile) # converter command
+  try:
+    with os.fdopen(tempFd, 'wb') as tempFile:
+      start  = time.perf_counter()
+      result = None
+      if nativeCopy is True:
+        with df.readerSlot(fileFullName):
+          result = rewriteAudioTags(fileFullName, fileArtist, fileTitle,
+                                    tempFile)
+      if result is None: # not copied natively
+        result = runConverter(cmd, fileFullName, tempFile
+                              if output == 'pipe:1' else sp.DEVNULL)
+      encoded = time.perf_counter()
+      nBytes  = os.fstat(tempFile.fileno()).st_size
+    returncode, outerr = result[0], result[1][-errTailLength:]
+
+    if returncode == 0 and nBytes > 0: # converted file stream
+      os.replace(tempFullName, outputFullName)
+    else: # no converted file stream (error)
+      os.remove(tempFullName)
+      nBytes = 0
+
+    if timings is not None:
+      timings['encode'] = encoded - start
+      timings['write']  = time.perf_counter() - encoded
+  except BaseException:
+    if os.path.exists(tempFullName):
+      os.remove(tempFullName)
+    raise
+
+  return fileFullName, outputFullName, nBytes, outerr
+
+def convertAudioJob(job: tp.Tuple[str, float, str, str, str, str, int,
+                                  bool, str]) -> \
+    tp.Tuple[str, str, int, bytes, tp.Dict[str, float]]:
+  """
+  Converts an audio file in a worker process.
+
+  job : Tuple[str, float, str, str, str, str, int, bool, str]
+    "convertAudioFile" arguments.
+
+  Returns:
+    Input file name, converted file name, converted file size in bytes,
+        tail of the converter error output, time spent in the "encode"
+        and "write" stages and the job wall time ("seconds"), seconds :
+        Tuple[str, str, int, bytes, Dict[str, float]].
+  """
+
+  timings = {}
+  start   = time.perf_counter()
+  result  = convertAudioFile(*job, timings=timings)
+  timings['seconds'] = time.perf_counter() - start
+
+  return (*result, timings)
+
+def convertRenditionsFile(fileFullName : str, fileExistkbps : float,
+                          fileArtist   : str, fileTitle     : str,
+                          renditions   : tp.List[tp.Tuple[str, str, int,
+                                                          str]],
+                          timings      : tp.Optional[tp.Dict[str,
+                                                             float]]=None) \
+    -> tp.List[tp.Tuple[str, str, int, bytes]]:
+  """
+  Converts an audio file into several renditions (e.g. bitrates) by
+      a single converter run: the input is read and decoded once and
+      the decoded audio is encoded by each rendition encoder. Renditions
+      are written to temporary files in their output folders which are
+      renamed to the converted file names on success.
+
+  fileFullName : str
+    Input file name.
+
+  fileExistkbps : float
+    Input file kbps (0 if unknown).
+
+  fileArtist : str
+    Converted file artist.
+
+  fileTitle : str
+    Converted file title.
+
+  renditions : List[Tuple[str, str, int, str]]
+    List of converted file folder, converted file name, converted file
+        kbps and output profile name.
+
+  timings : Dict[str, float]
+    Dictionary to which time spent in the "encode" (converter run) and
+        "write" (finishing the converted files) stages is written, seconds.
+    Defaults to None (do not measure).
+
+  Returns:
+    List of input file name, converted file name, converted file size
+        in bytes (0 if not converted), tail of the converter error output
+        in the order of renditions : List[Tuple[str, str, int, bytes]].
+  """
+
+  errTailLength = 4096 # bytes of the converter error output to keep
+
+  # the converter writes all renditions itself
+  cmd     = ['ffmpeg', '-y', '-i', f'{fileFullName}']
+  outputs = [] # converted file full name, temporary file full name
+  try:
+    for fileOutFolder, fileNewName, newkbps, profile in renditions:
+      outputFullName = os.path.join(fileOutFolder, fileNewName + '.' +
+                                    pf.getProfile(profile,
+                                                  newkbps).extension)
+      tempFd, tempFullName = ff.createTempFile(outputFullName)
+      os.close(tempFd)
+      outputs.append((outputFullName, tempFullName))
+      cmd.extend(buildOutputArgs(fileFullName, fileExistkbps, fileArtist,
+                                 fileTitle, newkbps, tempFullName, profile))
+
+    start   = time.perf_counter()
+    cmdout  = sp.run(cmd, stdout=sp.DEVNULL, stderr=sp.PIPE)
+    encoded = time.perf_counter()
+    outerr  = cmdout.stderr[-errTailLength:]
+
+    results = []
+    for outputFullName, tempFullName in outputs:
+      nBytes = os.stat(tempFullName).st_size
+      if cmdout.returncode == 0 and nBytes > 0: # converted file stream
+        os.replace(tempFullName, outputFullName)
+      else: # no converted file stream (error)
+        os.remove(tempFullName)
+        nBytes = 0
+      results.append((fileFullName, outputFullName, nBytes, outerr))
+
+    if timings is not None:
+      timings['encode'] = encoded - start
+      timings['write']  = time.perf_counter() - encoded
+  except BaseException:
+    for _, tempFullName in outputs:
+      if os.path.exists(tempFullName):
+        os.remove(tempFullName)
+    raise
+
+  return results
+
+def convertRenditionsJob(job: tp.Tuple[str, float, str, str,
+                                       tp.List[tp.Tuple[str, str, int,
+                                                        str]]]) -> \
+    tp.Tuple[tp.List[tp.Tuple[str, str, int, bytes]], tp.Dict[str, float]]:
+  """
+  Converts an audio file into several renditions in a worker process.
+
+  job : Tuple[str, float, str, str, List[Tuple[str, str, int, str]]]
+    "convertRenditionsFile" arguments.
+
+  Returns:
+    "convertRenditionsFile" results, time spent in the "encode" and
+        "write" stages and the job wall time ("seconds"), seconds :
+        Tuple[List[Tuple[str, str, int, bytes]], Dict[str, float]].
+  """
+
+  timings = {}
+  start   = time.perf_counter()
+  results = convertRenditionsFile(*job, timings=timings)
+  timings['seconds'] = time.perf_counter() - start
+
+  return results, timings
+
+def encodeSegmentJob(job: tp.Tuple[str, int, int, tp.Optional[int], str,
+                                   str]) -> \
+    tp.Tuple[str, int, tp.Optional[str], bytes, tp.Dict[str, float]]:
+  """
+  Encodes a segment of an audio file to a temporary file in a worker
+      process (see "segmentFunctions.buildSegmentCmd").
+
+  job : Tuple[str, int, int, Optional[int], str, str]
+    Input file name, output sample rate, first frame, frame after the last
+        frame (None for the last segment), encode kbps, converted file
+        full name.
+
+  Returns:
+    Converted file full name, first frame, encoded segment file name
+        (None if not encoded), tail of the converter error output, time
+        spent in the "encode" stage and the job wall time ("seconds"),
+        seconds : Tuple[str, int, Optional[str], bytes, Dict[str, float]].
+  """
+
+  errTailLength = 4096 # bytes of the converter error output to keep
+
+  fileFullName, sampleRate, startFrame, endFrame, encodekbps, \
+      outputFullName = job
+  cmd = sg.buildSegmentCmd(fileFullName, sampleRate, startFrame, endFrame,
+                           encodekbps, 'pipe:1') # converter command
+
+  # encode the segment streaming the output to disk
+  start = time.perf_counter()
+  tempFd, tempFullName = ff.createTempFile(outputFullName)
+  try:
+    with os.fdopen(tempFd, 'wb') as tempFile, \
+         df.readerSlot(fileFullName): # segments are read with seeks
+      cmdout = sp.run(cmd, stdout=tempFile, stderr=sp.PIPE)
+      nBytes = os.fstat(tempFile.fileno()).st_size
+
+    if cmdout.returncode != 0 or nBytes == 0: # no encoded stream (error)
+      os.remove(tempFullName)
+      tempFullName = None
+  except BaseException:
+    if os.path.exists(tempFullName):
+      os.remove(tempFullName)
+    raise
+
+  seconds = time.perf_counter() - start
+  timings = {'encode': seconds, 'seconds': seconds}
+
+  return outputFullName, startFrame, tempFullName, \
+      cmdout.stderr[-errTailLength:], timings
+
+async def encodeSegmentJobAsync(job: tp.Tuple[str, int, int,
+                                              tp.Optional[int], str,
+                                              str]) -> \
+    tp.Tuple[str, int, tp.Optional[str], bytes, tp.Dict[str, float]]:
+  """
+  Encodes a segment of an audio file like "encodeSegmentJob" without
+      blocking the event loop.
+
+  job : Tuple[str, int, int, Optional[int], str, str]
+    See "encodeSegmentJob".
+
+  Returns:
+    See "encodeSegmentJob".
+  """
+
+  errTailLength = 4096 # bytes of the converter error output to keep
+
+  fileFullName, sampleRate, startFrame, endFrame, encodekbps, \
+      outputFullName = job
+  cmd = sg.buildSegmentCmd(fileFullName, sampleRate, startFrame, endFrame,
+                           encodekbps, 'pipe:1') # converter command
+
+  # encode the segment streaming the output to disk
+  start = time.perf_counter()
+  tempFd, tempFullName = ff.createTempFile(outputFullName)
+  try:
+    with os.fdopen(tempFd, 'wb') as tempFile:
+      proc = await asyncio.create_subprocess_exec(
+        *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=tempFile,
+        stderr=asyncio.subprocess.PIPE)
+      try:
+        _, outerr = await proc.communicate()
+      except BaseException: # cancelled, do not leave the converter running
+        if proc.returncode is None:
+          proc.kill()
+          await proc.wait()
+        raise
+      nBytes = os.fstat(tempFile.fileno()).st_size
+
+    if proc.returncode != 0 or nBytes == 0: # no encoded stream (error)
+      os.remove(tempFullName)
+      tempFullName = None
+  except BaseException:
+    if os.path.exists(tempFullName):
+      os.remove(tempFullName)
+    raise
+
+  seconds = time.perf_counter() - start
+  timings = {'encode': seconds, 'seconds': seconds}
+
+  return outputFullName, startFrame, tempFullName, \
+      outerr[-errTailLength:], timings
+
+def joinAudioSegments(outputFullName : str,
+                      segments       : tp.List[tp.Tuple[str, int,
+                                                        tp.Optional[int]]],
+                      nSamples       : int, fileArtist: str,
+                      fileTitle      : str) -> tp.Tuple[int, bytes]:
+  """
+  Joins encoded segments into a converted file and removes the segment
+      files. The joined file is written to a temporary file in the output
+      folder which is renamed to the converted file name on success.
+
+  outputFullName : str
+    Converted file full name.
+
+  segments : List[Tuple[str, int, Optional[int]]]
+    List of encoded segment file name, first frame and frame after the last
+        frame (None for the last segment) in order.
+
+  nSamples : int
+    Number of samples of the input stream.
+
+  fileArtist : str
+    Converted file artist.
+
+  fileTitle : str
+    Converted file title.
+
+  Returns:
+    Converted file size in bytes (0 if not joined), error output :
+        Tuple[int, bytes].
+  """
+
+  tempFd, tempFullName = ff.createTempFile(outputFullName)
+  try:
+    with os.fdopen(tempFd, 'wb') as tempFile:
+      sg.joinSegments(segments, tempFile.fileno(), nSamples, fileTitle,
+                      fileArtist)
+      nBytes = os.fstat(tempFile.fileno()).st_size
+    os.replace(tempFullName, outputFullName)
+    outerr = b''
+  except (OSError, ValueError) as err: # broken segments
+    os.remove(tempFullName)
+    nBytes = 0
+    outerr = str(err).encode('utf-8')
+  finally:
+    for segment in segments:
+      if os.path.exists(segment[0]):
+        os.remove(segment[0])
+
+  return nBytes, outerr
+
+def payloadKey(contentHash : str, profile: str,
+               encodekbps  : tp.Optional[float]) -> str:
+  """
+  Gets the conversion cache key of an input file content converted with
+      encode parameters.
+
+  contentHash : str
+    Input file hash (see "fileFunctions.hashFiles").
+
+  profile : str
+    Output profile name.
+
+  encodekbps : float
+    Encode kbps (see "getEncodekbps").
+
+  Returns:
+    Cache key (hexadecimal) : str.
+  """
+
+  params = mf.jobParams(contentHash, profile, tf.kbpsText(encodekbps))
+
+  return hashlib.blake2b(params.encode('utf-8'), digest_size=20).hexdigest()
+
+def retagAudioFile(payloadFullName : str, fileFullName: str,
+                   outputFullName  : str, fileArtist  : str,
+                   fileTitle       : str, newkbps     : int,
+                   profile         : str='mp3') -> \
+    tp.Tuple[str, str, int, bytes]:
+  """
+  Writes a converted file from a converted file of the same audio (e.g.
+      a cached one) with its own Artist and Title tags: MP3 audio frames
+      are copied natively, other formats are remuxed by the converter
+      without re-encoding.
+
+  payloadFullName : str
+    Full name of the converted file of the same audio.
+
+  fileFullName : str
+    Input file name.
+
+  outputFullName : str
+    Converted file full name.
+
+  fileArtist : str
+    Converted file artist.
+
+  fileTitle : str
+    Converted file title.
+
+  newkbps : int
+    Converted file kbps.
+
+  profile : str
+    Output profile name. Defaults to 'mp3'.
+
+  Returns:
+    Input file name, converted file name, converted file size in bytes
+        (0 if not written), tail of the converter error output :
+        Tuple[str, str, int, bytes].
+  """
+
+  errTailLength = 4096 # bytes of the converter error output to keep
+
+  outProfile = pf.getProfile(profile, newkbps)
+
+  tempFd, tempFullName = ff.createTempFile(outputFullName)
+  output = tempFullName if outProfile.needsSeek else 'pipe:1'
+  cmd    = ['ffmpeg', '-i', f'{payloadFullName}', '-map', 'a',
+            '-codec:a', 'copy',
+            '-map_metadata', '-1',
+            '-metadata', f'Artist={fileArtist}',
+            '-metadata', f'Title={fileTitle}',
+            '-f', outProfile.muxer, output]
+  if output != 'pipe:1': # overwrite an empty temporary file
+    cmd.insert(1, '-y')
+  try:
+    with os.fdopen(tempFd, 'wb') as tempFile:
+      result = None
+      if outProfile.codec == 'libmp3lame':
+        result = rewriteAudioTags(payloadFullName, fileArtist, fileTitle,
+                                  tempFile)
+      if result is None: # not copied natively
+        cmdout = sp.run(cmd, stdout=tempFile if output == 'pipe:1' else
+                        sp.DEVNULL, stderr=sp.PIPE)
+        result = cmdout.returncode, cmdout.stderr
+      nBytes = os.fstat(tempFile.fileno()).st_size
+    returncode, outerr = result[0], result[1][-errTailLength:]
+
+    if returncode == 0 and nBytes > 0: # converted file stream
+      os.replace(tempFullName, outputFullName)
+    else: # no converted file stream (error)
+      os.remove(tempFullName)
+      nBytes = 0
+  except BaseException:
+    if os.path.exists(tempFullName):
+      os.remove(tempFullName)
+    raise
+
+  return fileFullName, outputFullName, nBytes, outerr
+
+def retagAudioJob(job: tp.Tuple[str, str, str, str, str, int, str]) -> \
+    tp.Tuple[str, str, int, bytes, tp.Dict[str, float]]:
+  """
+  Writes a converted file from a converted file of the same audio in
+      a worker thread.
+
+  job : Tuple[str, str, str, str, str, int, str]
+    "retagAudioFile" arguments.
+
+  Returns:
+    Input file name, converted file name, converted file size in bytes,
+        tail of the converter error output, time spent in the "write"
+        stage and the job wall time ("seconds"), seconds :
+        Tuple[str, str, int, bytes, Dict[str, float]].
+  """
+
+  start  = time.perf_counter()
+  result = retagAudioFile(*job)
+  wall   = time.perf_counter() - start
+
+  return (*result, {'write': wall, 'seconds': wall})
+
+def runJob(job: tp.Tuple[str, tp.Tuple[tp.Any, ...]]) -> \
+    tp.Tuple[str, tp.Tuple[tp.Any, ...]]:
+  """
+  Runs a conversion job of any kind in a worker process.
+
+  job : Tuple[str, Tuple[Any, ...]]
+    Job kind ('file' or 'segment') and "convertAudioJob" or
+        "encodeSegmentJob" arguments.
+
+  Returns:
+    Job kind and the job result : Tuple[str, Tuple[Any, ...]].
+  """
+
+  kind, args = job
+  if kind == 'segment':
+    return kind, encodeSegmentJob(args)
+
+  return kind, convertAudioJob(args)
+
+async def runJobAsync(job: tp.Tuple[str, tp.Tuple[tp.Any, ...]]) -> \
+    tp.Tuple[str, tp.Tuple[tp.Any, ...]]:
+  """
+  Runs a conversion job of any kind like "runJob" without blocking
+      the event loop.
+
+  job : Tuple[str, Tuple[Any, ...]]
+    See "runJob".
+
+  Returns:
+    See "runJob".
+  """
+
+  kind, args = job
+  if kind == 'segment':
+    return kind, await encodeSegmentJobAsync(args)
+
+  return kind, await convertAudioJobAsync(args)
+
+async def convertAudioFileAsync(fileFullName  : str, fileExistkbps : float,
+                                fileOutFolder : str, fileNewName   : str,
+                                fileArtist    : str, fileTitle     : str,
+                                newkbps       : int,
+                                nativeCopy    : bool=False,
+                                profile       : str='mp3',
+                                timings       : tp.Optional[
+                                                  tp.Dict[str, float]]=None) \
+    -> tp.Tuple[str, str, int, bytes]:
+  """
+  Converts an audio file like "convertAudioFile" without blocking the event
+      loop. The converter is killed and the temporary file is removed if
+      the task is cancelled.
+
+  fileFullName, fileExistkbps, fileOutFolder, fileNewName, fileArtist,
+      fileTitle, newkbps, nativeCopy, profile, timings
+    See "convertAudioFile".
+
+  Returns:
+    Input file name, converted file name, converted file size in bytes
+        (0 if not converted), tail of the converter error output :
+        Tuple[str, str, int, bytes].
+  """
+
+  errTailLength = 4096 # bytes of the converter error output to keep
 
   # get converted file's full path
-  outputFullName = os.path.join(fileOutFolder, fileNewName+'.mp3')
+  outProfile     = pf.getProfile(profile, newkbps)
+  outputFullName = os.path.join(fileOutFolder,
+                                fileNewName + '.' + outProfile.extension)
+
+  # audio of MP3 files which are not re-encoded is copied natively
+  nativeCopy = nativeCopy is True and \
+               getEncodekbps(fileFullName, fileExistkbps, newkbps,
+                             profile) is None
+
+  # convert file streaming the output to disk, muxers which rewrite
+  # the file header write the temporary file themselves
+  tempFd, tempFullName = ff.createTempFile(outputFullName)
+  output = tempFullName if outProfile.needsSeek else 'pipe:1'
+  cmd    = buildConvertCmd(fileFullName, fileExistkbps, fileArtist,
+                           fileTitle, newkbps, output,
+                           profile) # converter command
+  try:
+    with os.fdopen(tempFd, 'wb') as tempFile:
+      start  = time.perf_counter()
+      result = None
+      if nativeCopy is True: # blocking file I/O runs in a thread
+        result = await asyncio.to_thread(rewriteAudioTags, fileFullName,
+                                         fileArtist, fileTitle, tempFile)
+      if result is None: # not copied natively
+        proc = await asyncio.create_subprocess_exec(
+          *cmd, stdin=asyncio.subprocess.DEVNULL,
+          stdout=tempFile if output == 'pipe:1' else
+          asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        try:
+          _, outerr = await proc.communicate()
+        except BaseException: # cancelled, do not leave the converter running
+          if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+          raise
+        result = proc.returncode, outerr
+      encoded = time.perf_counter()
+      nBytes  = os.fstat(tempFile.fileno()).st_size
+    returncode, outerr = result[0], result[1][-errTailLength:]
+
+    if returncode == 0 and nBytes > 0: # converted file stream
+      os.replace(tempFullName, outputFullName)
+    else: # no converted file stream (error)
+      os.remove(tempFullName)
+      nBytes = 0
+
+    if timings is not None:
+      timings['encode'] = encoded - start
+      timings['write']  = time.perf_counter() - encoded
+  except BaseException:
+    if os.path.exists(tempFullName):
+      os.remove(tempFullName)
+    raise
+
+  return fileFullName, outputFullName, nBytes, outerr
+
+async def convertAudioJobAsync(job: tp.Tuple[str, float, str, str, str, str,
+                                             int, bool, str]) -> \
+    tp.Tuple[str, str, int, bytes, tp.Dict[str, float]]:
+  """
+  Converts an audio file like "convertAudioJob" without blocking the event
+      loop.
 
-  mOutput.append((fileFullName, outputFullName, output, outerr))
+  job : Tuple[str, float, str, str, str, str, int, bool, str]
+    "convertAudioFile" arguments.
 
-  return None
+  Returns:
+    See "convertAudioJob".
+  """
+
+  timings = {}
+  start   = time.perf_counter()
+  result  = await convertAudioFileAsync(*job, timings=timings)
+  timings['seconds'] = time.perf_counter() - start
+
+  return (*result, timings)
+
+async def convertAudioJobsAsync(jobs   : tp.List[tp.Tuple[str,
+                                                          tp.Tuple[tp.Any,
+                                                                   ...]]],
+                                window : tp.Callable[[], int]) -> \
+    tp.AsyncIterator[tp.Tuple[str, tp.Tuple[tp.Any, ...]]]:
+  """
+  Runs conversion jobs with at most "window()" concurrent converters
+      driven by the event loop (no worker processes). Running conversions
+      are cancelled if the iteration is stopped.
+
+  jobs : List[Tuple[str, Tuple[Any, ...]]]
+    Jobs (see "runJob"), started in order.
+
+  window : Callable[[], int]
+    Returns the current number of concurrent conversions, read before each
+        start.
+
+  Yields:
+    "runJob" results in completion order : Tuple[str, Tuple[Any, ...]].
+  """
+
+  running = set()
+  nextJob = 0
+  try:
+    while nextJob < len(jobs) or running:
+      while len(running) < window() and nextJob < len(jobs):
+        running.add(asyncio.ensure_future(runJobAsync(jobs[nextJob])))
+        nextJob += 1
+
+      done, running = await asyncio.wait(running,
+                                         return_when=asyncio.FIRST_COMPLETED)
+      for task in done:
+        yield task.result()
+  finally:
+    for task in running:
+      task.cancel()
+    if running:
+      await asyncio.gather(*running, return_exceptions=True)
+
+class LoopBridge:
+  """
+  Steps asynchronous iterators consumed by a worker thread on the event loop
+      of an awaiting coroutine (see "convertAudioFilesAsync"), so that
+      the coroutine can cancel them.
+
+  loop : AbstractEventLoop
+    Event loop of the awaiting coroutine.
+  """
+
+  def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+    self.loop      = loop
+    self.task      = None  # task stepping an iterator
+    self.cancelled = False # accessed on the event loop only
+
+  async def step(self, items: tp.AsyncIterator[tp.Any]) -> tp.Any:
+    if self.cancelled:
+      raise asyncio.CancelledError()
+    self.task = asyncio.current_task()
+
+    return await items.__anext__()
+
+  def iterate(self, items: tp.AsyncIterator[tp.Any]) -> tp.Iterator[tp.Any]:
+    """
+    Iterates over an asynchronous iterator from a worker thread.
+
+    items : AsyncIterator[Any]
+      Asynchronous iterator.
+
+    Yields:
+      Items : Any.
+    """
+
+    try:
+      while True:
+        try:
+          item = asyncio.run_coroutine_threadsafe(self.step(items),
+                                                  self.loop).result()
+        except StopAsyncIteration:
+          break
+        yield item
+    finally:
+      asyncio.run_coroutine_threadsafe(items.aclose(), self.loop).result()
+
+  def cancel(self) -> None:
+    """
+    Cancels the iteration, a running step is cancelled (must be called
+        on the event loop).
+
+    Returns None.
+    """
+
+    self.cancelled = True
+    if self.task is not None:
+      self.task.cancel()
+
+    return None
+
+# bridge to the event loop of "convertAudioFilesAsync" (None if not awaited)
+LOOP_BRIDGE = contextvars.ContextVar('LOOP_BRIDGE', default=None)
+
+def iterAsync(items: tp.AsyncIterator[tp.Any]) -> tp.Iterator[tp.Any]:
+  """
+  Iterates over an asynchronous iterator in a new event loop, or on
+      the event loop of an awaiting "convertAudioFilesAsync" caller,
+      so that synchronous code can consume it.
+
+  items : AsyncIterator[Any]
+    Asynchronous iterator (e.g. "convertAudioJobsAsync").
+
+  Yields:
+    Items : Any.
+  """
+
+  bridge = LOOP_BRIDGE.get()
+  if bridge is not None:
+    yield from bridge.iterate(items)
+    return
+
+  loop = asyncio.new_event_loop()
+  try:
+    while True:
+      try:
+        item = loop.run_until_complete(items.__anext__())
+      except StopAsyncIteration:
+        break
+      yield item
+  finally:
+    loop.run_until_complete(items.aclose())
+    loop.close()
+
+def imapWindow(pool   : mp.pool.Pool,
+               func   : tp.Callable[[tp.Any], tp.Any],
+               jobs   : tp.List[tp.Any],
+               window : tp.Callable[[], int]) -> tp.Iterator[tp.Any]:
+  """
+  Runs jobs in a pool keeping at most "window()" jobs in flight, so that
+      the number of concurrent jobs can change while the pool is running.
+
+  pool : multiprocessing.pool.Pool
+    Pool with at least as many workers as the largest window.
+
+  func : Callable[[Any], Any]
+    Job function.
+
+  jobs : List[Any]
+    Job arguments, submitted in order.
+
+  window : Callable[[], int]
+    Returns the current number of concurrent jobs, read before each
+        submission.
+
+  Yields:
+    Job results in completion order : Any.
+  """
+
+  done     = queue.Queue() # results put by the pool result thread
+  nextJob  = 0
+  inFlight = 0
+  for _ in range(len(jobs)):
+    while inFlight < window() and nextJob < len(jobs):
+      pool.apply_async(func, (jobs[nextJob],),
+                       callback=lambda result: done.put((result, None)),
+                       error_callback=lambda err: done.put((None, err)))
+      nextJob  += 1
+      inFlight += 1
+
+    result, err = done.get()
+    inFlight -= 1
+    if err is not None:
+      raise err
+
+    yield result
+
+def selectProfileJob(job: tp.Tuple[str, float, tp.List[str], int,
+                                   tp.Optional[float], float]) -> int:
+  """
+  Selects the output profile giving the smallest converted file by trial
+      encodes (see "profileFunctions.selectProfile").
+
+  job : Tuple[str, float, List[str], int, Optional[float], float]
+    Input file name, input file kbps (0 if unknown), candidate profile
+        names, converted file kbps, bitrate budget (kbps), sample duration
+        (seconds).
 
-def writeConvertedFiles(logFile: str, fullName_Data:
-                        tp.List[tp.Tuple[str, str, bytes, bytes]]) -> None:
+  Returns:
+    Index of the selected profile : int.
+  """
+
+  fileFullName, fileExistkbps, profiles, newkbps, maxkbps, seconds = job
+
+  candidates = [(pf.getProfile(profile, newkbps),
+                 getEncodekbps(fileFullName, fileExistkbps, newkbps,
+                               profile)) for profile in profiles]
+
+  return pf.selectProfile(fileFullName, fileExistkbps, candidates, maxkbps,
+                          seconds)
+
+def writeConversionLog(logFile: tp.Optional[str], results:
+                       tp.List[tp.Tuple[str, str, int, bytes]]) -> None:
   """
-  Writes converted files to disk and creates a LOG file with errors.
+  Writes errors of not converted files to a LOG file.
 
   logFile : str
-    LOG file full path.
+    LOG file full path (None only prints not converted files).
 
-  fullName_Data : multiprocessing manager
-    Manager storying input file name, converted file name,
-        converted binary output, binary output error.
+  results : List[Tuple[str, str, int, bytes]]
+    List of input file name, converted file name, converted file size
+        in bytes, tail of the converter error output.
 
   Returns None.
   """
 
-  for oldFullName, fullName, data, err in fullName_Data:
-    if len(data) == 0: # no converted file stream (error)
+  for oldFullName, _, nBytes, err in results:
+    if nBytes == 0: # no converted file (error)
       print(f'"{oldFullName}" was not converted!')
+      if logFile is None:
+        continue
       with open(logFile, 'a') as log:
         log.write('\t')
         log.write(oldFullName)
         log.write('\n')
-        log.write(err.decode('utf-8'))
+        log.write(err.decode('utf-8', errors='replace'))
         log.write('\n'*2)
-    else: # converted file stream
-      with open(fullName, 'wb') as outFile:
-        outFile.write(data)
 
   return None
 
-def convertAudioFiles(infoFile: str, outFolder: str, outkbps: int) -> None:
+def writeConvertedData(rootFolder  : str, folderOut: str,
+                       fullNames   : tp.List[str],
+                       bitrates    : tp.List[tp.Tuple[str, str]],
+                       titles      : tp.List[str],
+                       artists     : tp.List[str],
+                       sizeBytes   : tp.List[int],
+                       isNew       : tp.List[bool],
+                       probeOutput : bool=False) -> None:
+  """
+  Writes converted files data into a CSV file without rescanning
+      the output folder.
+
+  rootFolder : str
+    Output root folder.
+
+  folderOut : str
+    The folder to which save the output CSV file.
+
+  fullNames : List[str]
+    List of converted files with their full paths.
+
+  bitrates : List[Tuple[str, str]]
+    List of converted file Bitrate Types and Bitrates (kbps).
+
+  titles : List[str]
+    List of converted file titles.
+
+  artists : List[str]
+    List of converted file artists.
+
+  sizeBytes : List[int]
+    List of converted file sizes in bytes.
+
+  isNew : List[bool]
+    Specifies whether a file was converted by the current run.
+
+  probeOutput : bool
+    Specifies whether to probe metadata of the files converted by
+        the current run. Defaults to False (use conversion parameters).
+
+  Returns None.
+  """
+
+  bitrateTypes = [bitrate[0] for bitrate in bitrates]
+  kbps         = [bitrate[1] for bitrate in bitrates]
+  titles       = list(titles)
+  artists      = list(artists)
+
+  # replace conversion parameters with probed metadata of new files
+  if probeOutput is True:
+    newIdx = [i for i in range(len(fullNames)) if isNew[i]]
+    probed = ff.getMetadata([fullNames[i] for i in newIdx],
+                            nWorkers=sf.nPhysicalCores())
+    for j, i in enumerate(newIdx):
+      bitrateTypes[i] = probed[0][j]
+      kbps[i]         = probed[1][j]
+      titles[i]       = probed[2][j]
+      artists[i]      = probed[3][j]
+
+  fileNames = [os.path.basename(fullName) for fullName in fullNames]
+  ff.writeData(rootFolder, fullNames, fileNames,
+               ff.getFileExtension(fileNames), bitrateTypes, kbps,
+               titles, artists, sizeBytes, folderOut)
+
+  return None
+
+def convertAudioFiles(infoFile     : tp.Union[str, tf.TrackTable],
+                      outFolder    : str, outkbps: int,
+                      nProcs       : tp.Optional[int]=None,
+                      manifestFile : tp.Optional[str]='',
+                      probeOutput  : bool=False,
+                      metricsFile  : tp.Optional[str]='',
+                      adaptive     : bool=False,
+                      minProcs     : int=1,
+                      maxProcs     : tp.Optional[int]=None,
+                      engine       : str='process',
+                      nativeCopy   : bool=False,
+                      splitSize    : tp.Optional[int]=None,
+                      splitSeconds : tp.Optional[float]=None,
+                      minSegment   : float=60.0,
+                      profile      : tp.Union[str, tp.Sequence[str]]='mp3',
+                      maxkbps      : tp.Optional[float]=None,
+                      trialSeconds : float=20.0,
+                      cacheFolder  : tp.Optional[str]=None,
+                      cacheBytes   : int=10 * 2**30,
+                      locality     : bool=False,
+                      maxReaders   : tp.Optional[int]=None,
+                      readAhead    : tp.Optional[int]=None,
+                      archive      : tp.Optional[str]=None,
+                      archiveSize  : tp.Optional[int]=None,
+                      reports      : bool=True) -> int:
   """
   Converts audio files and write a CSV file with information
       about converted files.
 
-  infoFile: str
-    Input CSV file full path.
+  infoFile: str or TrackTable
+    Input CSV file (or binary track file) full path, or a table of tracks
+        (e.g. named by "namingFunctions.applyNamingRules").
 
   outFolder: str
     Output folder.
@@ -228,11 +1365,149 @@ def convertAudioFiles(infoFile: str, outFolder: str, outkbps: int) -> None:
   outkbps: int
     Output kbps.
 
+  nProcs: int
+    Number of concurrent conversions.
+    Defaults to None (number of CPU physical cores).
+
+  manifestFile: str
+    Full name of a job manifest (SQLite) file recording the state of each
+        job. Jobs done by previous runs are skipped if their input, encode
+        parameters and output have not changed.
+    Defaults to '' ("manifest.sqlite" in "outFolder"),
+        None disables the manifest.
+
+  probeOutput: bool
+    Specifies whether to probe the files converted by this run for the
+        output CSV file.
+    Defaults to False (the output CSV file is built from the conversion
+        parameters).
+
+  metricsFile: str
+    Full name of a JSON file to which time spent in the stages, throughput
+        and per-file records (wall time, input and output bytes,
+        compression ratio) are written.
+    Defaults to '' ("metrics_<timestamp>.json" in "outFolder"),
+        None disables the file (progress is still printed).
+
+  adaptive: bool
+    Specifies whether to adapt the number of concurrent conversions to
+        CPU utilisation, available memory, I/O wait and observed per-job
+        throughput, starting with "nProcs".
+    Defaults to False (always run "nProcs" conversions).
+
+  minProcs: int
+    Minimum number of concurrent conversions of the adaptive mode.
+    Defaults to 1.
+
+  maxProcs: int
+    Maximum number of concurrent conversions of the adaptive mode.
+    Defaults to None (number of CPU logical cores).
+
+  engine: str
+    'process' runs each conversion in a worker process, 'async' runs the
+        converters from an event loop in the current process.
+    Defaults to 'process'.
+
+  nativeCopy: bool
+    Specifies whether to rewrite tags of MP3 files which are not
+        re-encoded (input kbps is smaller than "outkbps") without ffmpeg,
+        copying their audio frames at disk speed.
+    Defaults to False (copy audio with ffmpeg).
+
+  splitSize: int
+    Re-encoded files larger than this size (bytes) are split into segments
+        which are encoded in parallel and joined without gaps.
+    Defaults to None (do not split by size).
+
+  splitSeconds: float
+    Re-encoded files longer than this duration (seconds) are split into
+        segments (durations are probed with ffprobe).
+    Defaults to None (do not split by duration).
+
+  minSegment: float
+    Minimum segment duration, seconds. A file is split into at most
+        "nProcs" segments.
+    Defaults to 60.0.
+
+  profile: str or Sequence[str]
+    Output profile name: 'mp3' (constant bitrate MP3 at "outkbps"),
+        'mp3-v0' ... 'mp3-v9' (LAME VBR), 'opus-24' ... 'opus-128' (Opus)
+        or 'aac-64' ... 'aac-192' (AAC in M4A). Converted file extensions
+        follow the profile. With several profiles (of acceptable quality),
+        a sample of each file is encoded with each of them and the profile
+        giving the smallest file (see "maxkbps") is used (ffprobe is
+        required).
+        Only 'mp3' files are split into segments.
+    Defaults to 'mp3'.
+
+  maxkbps: float
+    Bitrate budget of the profile selection, kbps: the profile with
+        the highest sample bitrate within the budget is used, the smallest
+        one if none fits.
+    Defaults to None (the smallest profile is used).
+
+  trialSeconds: float
+    Duration of the samples encoded to select a profile, seconds.
+    Defaults to 20.0.
+
+  cacheFolder: str
+    Folder of a conversion cache keyed by the input file content and
+        the encode parameters. Files with the same audio are encoded once
+        (within a run and across runs), each converted file gets its own
+        tags. Audio which is copied is not cached.
+    Defaults to None (no cache).
+
+  cacheBytes: int
+    Cache size limit in bytes, the least recently used files are removed
+        at the end of a run.
+    Defaults to 10 GiB.
+
+  locality: bool
+    Specifies whether to convert files in the order of their physical
+        location (extent offsets where the file system reports them,
+        inode numbers otherwise), taking files of several devices in turn,
+        instead of the largest files first.
+    Defaults to False.
+
+  maxReaders: int
+    Maximum number of conversions reading their input files from the same
+        device at once (e.g. 1 for a hard disk drive).
+    Defaults to None (no limit).
+
+  readAhead: int
+    Read-ahead buffer size in bytes. Input files (except MP4-family
+        files) are read sequentially, hinted by "posix_fadvise", and
+        streamed to the converter standard input, so a reader releases
+        the device once a file is buffered.
+    Defaults to None (the converter reads the input file).
+
+  archive: str
+    'tar' or 'zip' writes converted files to archives
+        ("<root folder>_<timestamp>.<archive>" in "outFolder") instead of
+        folders, entry paths follow the output folders. Each file is added
+        to the archive as soon as it is converted (from a flat staging
+        folder) and removed. The converted files CSV file lists them as
+        "<archive volume>/<entry path>". The manifest is not used and
+        outputs are not probed.
+    Defaults to None (write converted files to folders).
+
+  archiveSize: int
+    Maximum archive size in bytes, the archive is split into numbered
+        volumes which are complete archives.
+    Defaults to None (a single archive).
+
+  reports: bool
+    Specifies whether to write the converted files CSV file and the LOG
+        file (not converted files are printed either way), e.g. callers
+        keeping a library file of their own turn them off.
+    Defaults to True.
+
   Returns 0.
   """
 
   sf.limitTracebackInfo(0) # limit traceback info
-  ff.fileCheck(infoFile)   # check "infoFile" correctness
+  if not isinstance(infoFile, tf.TrackTable):
+    ff.fileCheck(infoFile) # check "infoFile" correctness
   ff.dirCheck(outFolder)   # check "outFolder" correctness
 
   # check "outkbps" argument type provided
@@ -245,70 +1520,721 @@ def convertAudioFiles(infoFile: str, outFolder: str, outkbps: int) -> None:
     raise TypeError('"outkbps" must be positive ' +
                     f'("{outkbps}" was provided)!')
 
+  # check "profile" argument value provided
+  profiles = [profile] if isinstance(profile, str) else list(profile)
+  if profiles == []:
+    raise ValueError('"profile" must name at least one profile!')
+  outProfiles = [pf.getProfile(name, outkbps) for name in profiles]
+
+  # check "archive" and "archiveSize" argument values provided
+  if archive is not None and archive not in ar.ARCHIVE_FORMATS:
+    raise ValueError('"archive" must be "tar" or "zip" ' +
+                     f'("{archive}" was provided)!')
+  if archiveSize is not None and archive is None:
+    raise ValueError('"archiveSize" requires "archive"!')
+  if archive is not None and probeOutput is True:
+    raise ValueError('"probeOutput" is not supported with "archive"!')
+
   ffmpeg = 'ffmpeg'       # converter command
   sf.cmdInstalled(ffmpeg) # check if command is installed
 
   # extract data from a csv file
   rootPath, rootFolder, fullName, existFileName, kbps, \
-      newFileName, title, artist = readFileListData(infoFile)
+      newFileName, title, artist, sizeBytes, bitrateType = \
+      readFileListData(infoFile)
 
-  # create output folders
-  outFolders = createFolders(rootPath, rootFolder, outFolder, fullName,
+  # get output folders
+  outFolders = getOutFolders(rootPath, rootFolder, outFolder, fullName,
                              existFileName)
 
-  # get number of CPU physical cores
-  nPhysCores = sf.nPhysicalCores()
+  # set a default manifest file in the output folder, archives are
+  # written as a whole
+  if manifestFile == '':
+    manifestFile = os.path.join(outFolder, 'manifest.sqlite')
+  if archive is not None:
+    manifestFile = None
+
+  # open the job manifest
+  connection = None
+  if manifestFile is not None:
+    connection = mf.openManifest(manifestFile)
+
+  # the profile list is a parameter of a job unless it is the default one
+  profileParams = [] if profiles == ['mp3'] else [profiles]
+
+  # skip jobs done by previous runs (with any of the profiles)
+  pending     = [] # indices of jobs to do
+  outSizes    = {} # output file sizes by job index
+  outNames    = [] # output file full names
+  fileProfile = [] # output profile names
+  inStats     = [] # input files stat information
+  params      = [] # encode parameters
+  for i in range(len(fullName)):
+    names = [os.path.join(outFolders[i],
+                          newFileName[i] + '.' + outProfile.extension)
+             for outProfile in outProfiles]
+    outNames.append(names[0])
+    fileProfile.append(profiles[0])
+    inStats.append(ff.statFile(fullName[i]))
+    params.append(mf.jobParams(tf.kbpsText(kbps[i]), artist[i], title[i],
+                               outkbps, *profileParams))
+
+    if connection is not None:
+      done = [k for k, name in enumerate(names)
+              if mf.isJobDone(connection, fullName[i], name, inStats[i],
+                              params[i])]
+      if done != []:
+        outNames[i]    = names[done[0]]
+        fileProfile[i] = profiles[done[0]]
+        outSizes[i]    = ff.statFile(outNames[i]).st_size
+        continue
+
+    pending.append(i)
+
+  nSkipped = len(fullName) - len(pending)
+  if nSkipped > 0:
+    print(f'Skipped {nSkipped} files converted by previous runs.')
+
+  # create output folders of pending jobs
+  if archive is None:
+    createFolders(rootPath, rootFolder, outFolder,
+                  [fullName[i] for i in pending],
+                  [existFileName[i] for i in pending])
 
   # set number of processes
-  nProcs = nPhysCores
-
-  mOutput = mp.Manager().list() # store outputs
+  if nProcs is None:
+    nProcs = sf.nPhysicalCores() # number of CPU physical cores
+
+  # check "nProcs" argument type and value provided
+  if not isinstance(nProcs, int):
+    raise TypeError('"nProcs" must be an integer ' +
+                    f'("{type(nProcs)}" was provided)!')
+  if nProcs < 1:
+    raise ValueError('"nProcs" must be positive ' +
+                     f'("{nProcs}" was provided)!')
+
+  # check "adaptive" argument type provided
+  if not isinstance(adaptive, bool):
+    raise TypeError('"adaptive" must be a boolean ' +
+                    f'("{type(adaptive)}" was provided)!')
+
+  # check "nativeCopy" argument type provided
+  if not isinstance(nativeCopy, bool):
+    raise TypeError('"nativeCopy" must be a boolean ' +
+                    f'("{type(nativeCopy)}" was provided)!')
+
+  # check "engine" argument value provided
+  if engine not in ('process', 'async'):
+    raise ValueError('"engine" must be "process" or "async" ' +
+                     f'("{engine}" was provided)!')
+
+  # check "cacheBytes" argument type and value provided
+  if not isinstance(cacheBytes, int):
+    raise TypeError('"cacheBytes" must be an integer ' +
+                    f'("{type(cacheBytes)}" was provided)!')
+  if cacheBytes < 0:
+    raise ValueError('"cacheBytes" must not be negative ' +
+                     f'("{cacheBytes}" was provided)!')
+
+  # check "locality" argument type provided
+  if not isinstance(locality, bool):
+    raise TypeError('"locality" must be a boolean ' +
+                    f'("{type(locality)}" was provided)!')
+
+  # check "maxReaders" and "readAhead" argument types and values provided
+  for name, value in (('maxReaders', maxReaders), ('readAhead', readAhead)):
+    if value is None:
+      continue
+    if not isinstance(value, int):
+      raise TypeError(f'"{name}" must be an integer ' +
+                      f'("{type(value)}" was provided)!')
+    if value < 1:
+      raise ValueError(f'"{name}" must be positive ' +
+                       f'("{value}" was provided)!')
+    if engine == 'async':
+      raise ValueError(f'"{name}" is not supported by the "async" engine!')
+
+  # adapt the number of concurrent conversions to the system load
+  controller = None
+  if adaptive is True:
+    controller = sf.ConcurrencyController(nProcs, minProcs, maxProcs)
+    nProcs     = controller.maxProcs # pool size
+
+  # check "probeOutput" argument type provided
+  if not isinstance(probeOutput, bool):
+    raise TypeError('"probeOutput" must be a boolean ' +
+                    f'("{type(probeOutput)}" was provided)!')
+
+  # check "reports" argument type provided
+  if not isinstance(reports, bool):
+    raise TypeError('"reports" must be a boolean ' +
+                    f'("{type(reports)}" was provided)!')
 
   # create empty log-file for writing errors for not converted files
-  logFile = os.path.join(outFolder, 'LOG'+sf.getTimeStamp())
-  open(logFile, 'wb').close()
-
-  totalFiles = len(fullName) # total number of files
+  logFile = None
+  if reports is True:
+    logFile = os.path.join(outFolder, 'LOG'+sf.getTimeStamp())
+    open(logFile, 'wb').close()
+
+  # set a default metrics file in the output folder
+  if metricsFile == '':
+    metricsFile = os.path.join(outFolder,
+                               'metrics' + sf.getTimeStamp() + '.json')
+
+  totalFiles = len(pending) # total number of files
+
+  # ETA is estimated by input bytes, the files differ in duration
+  metrics = mt.Metrics(totalFiles, sum(sizeBytes[i] for i in pending))
+
+  # select the profile giving the smallest file by trial encodes
+  if len(profiles) > 1 and pending != []:
+    sf.cmdInstalled('ffprobe') # check if command is installed
+    with metrics.stage('select'):
+      selected = ff.mapJobs(selectProfileJob,
+                            [(fullName[i], kbps[i], profiles, outkbps,
+                              maxkbps, trialSeconds) for i in pending],
+                            nProcs)
+    for i, k in zip(pending, selected):
+      fileProfile[i] = profiles[k]
+      outNames[i]    = os.path.join(outFolders[i], newFileName[i] + '.' +
+                                    outProfiles[k].extension)
+
+  # convert files to a flat staging folder, entry paths follow the output
+  # folders
+  writer     = None
+  entryNames = {} # job index -> archive entry path
+  archived   = {} # job index -> archive volume and entry path
+  if archive is not None:
+    writer = ar.ArchiveWriter(os.path.join(outFolder, rootFolder +
+                                           sf.getTimeStamp()),
+                              archive, archiveSize)
+    stageFolder = tempfile.mkdtemp(prefix='staging', dir=outFolder)
+    for i in pending:
+      entryNames[i] = os.path.relpath(outNames[i], outFolder).replace(
+        os.sep, '/')
+      outFolders[i], newFileName[i] = stageFolder, str(i)
+      outNames[i] = os.path.join(stageFolder, str(i) +
+                                 os.path.splitext(outNames[i])[1])
+
+  # record pending jobs
+  if connection is not None:
+    for i in pending:
+      mf.setJobState(connection, fullName[i], outNames[i], inStats[i],
+                     params[i], 'pending', commit=False)
+    connection.commit()
+
+  # look up re-encoded files in the conversion cache by their content,
+  # files with the same content as a previous file are not encoded
+  cacheConn  = None
+  cacheKeys  = {} # job index -> cache key of the first file of each key
+  cached     = {} # job index -> cached converted file full name
+  duplicates = {} # job index -> indices of files with the same key
+  if cacheFolder is not None:
+    cacheConn = cf.openPayloadCache(cacheFolder)
+    encoded   = [(i, getEncodekbps(fullName[i], kbps[i], outkbps,
+                                   fileProfile[i])) for i in pending]
+    encoded   = [(i, encodekbps) for i, encodekbps in encoded
+                 if encodekbps is not None]
+    with metrics.stage('hash'):
+      hashes = ff.hashFiles([fullName[i] for i, _ in encoded], nProcs)
+
+    first = {} # cache key -> job index
+    for (i, encodekbps), contentHash in zip(encoded, hashes):
+      if contentHash is None: # not readable, left to the converter
+        continue
+      key = payloadKey(contentHash, fileProfile[i], encodekbps)
+      if key in first:
+        duplicates[first[key]].append(i)
+        continue
+      path = cf.getCachedPayload(cacheConn, cacheFolder, key)
+      if path is not None:
+        cached[i] = path
+      else:
+        first[key], cacheKeys[i], duplicates[i] = i, key, []
+
+  deferred = set(cached) | {i for dups in duplicates.values() for i in dups}
+
+  # split long files which are re-encoded into segments
+  segmented = {} # job index -> number of samples, segments
+  if splitSize is not None or splitSeconds is not None:
+    sf.cmdInstalled('ffprobe') # check if command is installed
+    encoded = [i for i in pending if fileProfile[i] == 'mp3' and
+               i not in deferred and
+               getEncodekbps(fullName[i], kbps[i], outkbps) is not None]
+    if splitSeconds is None: # only large files are probed
+      encoded = [i for i in encoded if sizeBytes[i] > splitSize]
+    streams = ff.mapJobs(sg.probeAudioStream,
+                         [fullName[i] for i in encoded], nProcs)
+
+    for i, stream in zip(encoded, streams):
+      if stream is None: # duration is unknown
+        continue
+      duration, sampleRate = stream
+      if (splitSize is None or sizeBytes[i] <= splitSize) and \
+          (splitSeconds is None or duration <= splitSeconds):
+        continue
+
+      sampleRate = sg.outputSampleRate(sampleRate)
+      plan = sg.planSegments(duration, sampleRate, nProcs, minSegment)
+      if len(plan) > 1:
+        segmented[i] = (round(duration * sampleRate), sampleRate, plan)
+
+  # create jobs, the largest (longest) files and segments are converted first
+  # so that they do not keep a single core busy at the end of the run
+  # (sources are read in their physical order in the locality mode)
+  order = [i for i in pending if i not in deferred]
+  if locality is True:
+    order = [order[k] for k in df.localityOrder(
+      [fullName[i] for i in order], [inStats[i] for i in order])]
+  jobs = []
+  for i in order:
+    if i in segmented:
+      nSamples, sampleRate, plan = segmented[i]
+      encodekbps = tf.kbpsText(getEncodekbps(fullName[i], kbps[i], outkbps))
+      for startFrame, endFrame in plan:
+        jobs.append((sizeBytes[i] / len(plan),
+                     ('segment', (fullName[i], sampleRate, startFrame,
+                                  endFrame, encodekbps, outNames[i]))))
+    else:
+      jobs.append((sizeBytes[i],
+                   ('file', (fullName[i], kbps[i], outFolders[i],
+                             newFileName[i], artist[i], title[i], outkbps,
+                             nativeCopy, fileProfile[i]))))
+  if locality is False:
+    jobs.sort(key=lambda job: job[0], reverse=True)
+  jobs = [job[1] for job in jobs]
+
+  # limit concurrent readers by input device, the semaphores are shared
+  # by the workers
+  slots = {}
+  if maxReaders is not None:
+    slots = {inStats[i].st_dev: None for i in order
+             if inStats[i] is not None}
+    slots = {device: mp.BoundedSemaphore(maxReaders) for device in slots}
+
+  jobIdx   = {outNames[i]: i for i in pending} # output name to job index
+  segments = {} # job index -> encoded segments
+
+  # number of concurrent conversions
+  if controller is None:
+    window = lambda: nProcs
+  else: # as many as the controller allows
+    window = lambda: controller.nProcs
+
+  def recordResult(j       : int, result: tp.Tuple[str, str, int, bytes],
+                   timings : tp.Dict[str, float]) -> None:
+    # log on errors
+    writeConversionLog(logFile, [result])
+
+    nBytes      = result[2]
+    outSizes[j] = nBytes
+
+    # record file throughput and print the progress
+    metrics.addFile(fullName[j], timings['seconds'], sizeBytes[j], nBytes,
+                    encode=timings.get('encode'),
+                    write=timings.get('write'))
+
+    # record the job state
+    if connection is not None:
+      mf.setJobState(connection, fullName[j], outNames[j], inStats[j],
+                     params[j], 'done' if nBytes > 0 else 'failed',
+                     nBytes)
+
+    # cache the converted file, the cache is an optimisation only
+    if j in cacheKeys and nBytes > 0:
+      try:
+        cf.putCachedPayload(cacheConn, cacheFolder, cacheKeys[j],
+                            outNames[j])
+      except OSError:
+        pass
+
+    # move the converted file to the archive while it is in the page cache
+    # (files with the same audio are written from it later)
+    if writer is not None and nBytes > 0:
+      with metrics.stage('archive'):
+        volume = writer.add(outNames[j], entryNames[j])
+      archived[j] = volume + '/' + entryNames[j]
+      if duplicates.get(j, []) == []:
+        os.remove(outNames[j])
+
+  def retagFiles(sources: tp.Dict[int, str]) -> None:
+    results = ff.mapJobs(retagAudioJob,
+                         [(sources[j], fullName[j], outNames[j], artist[j],
+                           title[j], outkbps, fileProfile[j])
+                          for j in sources], nProcs)
+    for j, result in zip(sources, results):
+      metrics.addStageTime('write', result[4]['write'])
+      recordResult(j, result[:4], result[4])
+
+  # write cached files with their own tags
+  retagFiles(cached)
+
+  # start processing, a worker takes the next job as soon as it is free
+  with contextlib.ExitStack() as stack:
+    if engine == 'async': # converters are awaited by an event loop
+      results = stack.enter_context(contextlib.closing(
+        iterAsync(convertAudioJobsAsync(jobs, window))))
+    else:
+      pool = stack.enter_context(mp.Pool(min(nProcs, max(len(jobs), 1)),
+                                         df.initReaders, (slots, readAhead)))
+      if controller is None:
+        results = pool.imap_unordered(runJob, jobs)
+      else:
+        results = imapWindow(pool, runJob, jobs, window)
+    for kind, result in results:
+      timings = result[4]
+
+      if kind == 'segment': # join segments when all of them are encoded
+        j = jobIdx[result[0]]
+        nSamples, sampleRate, plan = segmented[j]
+        segments.setdefault(j, []).append(result)
+
+        metrics.addStageTime('encode', timings['encode'])
+        if controller is not None:
+          controller.jobDone(sizeBytes[j] // len(plan), timings['seconds'])
+        if len(segments[j]) < len(plan):
+          continue
+
+        parts   = sorted(segments.pop(j), key=lambda part: part[1])
+        outerr  = b''.join(part[3] for part in parts)
+        timings = {'encode': sum(part[4]['encode'] for part in parts)}
+        if all(part[2] is not None for part in parts):
+          start = time.perf_counter()
+          nBytes, joinerr = joinAudioSegments(
+            outNames[j], [(part[2], *plan[k]) for k, part in
+                          enumerate(parts)], nSamples, artist[j], title[j])
+          outerr += joinerr
+          timings['write'] = time.perf_counter() - start
+        else: # a segment was not encoded
+          for part in parts:
+            if part[2] is not None:
+              os.remove(part[2])
+          nBytes = 0
+          timings['write'] = 0.0
+        timings['seconds'] = timings['encode'] + timings['write']
+        metrics.addStageTime('write', timings['write'])
+        result = fullName[j], outNames[j], nBytes, outerr
+      else:
+        result = result[:4]
+        j      = jobIdx[result[1]]
+
+        metrics.addStageTime('encode', timings.get('encode', 0.0))
+        metrics.addStageTime('write', timings.get('write', 0.0))
+
+        # adjust the number of concurrent conversions
+        if controller is not None:
+          controller.jobDone(sizeBytes[j], timings['seconds'])
+
+      recordResult(j, result, timings)
+
+  # write files with the same audio as converted files with their own tags
+  retagFiles({i: outNames[j] for j in duplicates for i in duplicates[j]
+              if outSizes[j] > 0})
+  for j in duplicates:
+    if outSizes[j] == 0:
+      err = f'"{fullName[j]}" with the same audio was not converted'
+      for i in duplicates[j]:
+        recordResult(i, (fullName[i], outNames[i], 0, err.encode('utf-8')),
+                     {'seconds': 0.0})
+
+  if writer is not None:
+    volumes = writer.close()
+    shutil.rmtree(stageFolder, ignore_errors=True)
+    print(f'Archived {len([i for i in outSizes if outSizes[i] > 0])} ' +
+          f'files to {len(volumes)} archives.')
+
+  if cacheConn is not None:
+    cf.evictCachedPayloads(cacheConn, cacheFolder, cacheBytes)
+    cacheConn.close()
+
+  metrics.finish()
+  if controller is not None:
+    metrics.setValue('concurrency',
+                     [{'seconds': t - metrics.start, 'nProcs': n,
+                       'reason': reason}
+                      for t, n, reason in controller.history])
+
+  if connection is not None:
+    connection.close()
+
+  # converted files, jobs done by previous runs included (archived files
+  # are listed by their archive volumes and entry paths)
+  csvRoot = os.path.join(outFolder, rootFolder)
+  if writer is not None:
+    csvRoot  = outFolder
+    outNames = [archived.get(i, '') for i in range(len(outNames))]
+  done = sorted((i for i in outSizes if outSizes[i] > 0),
+                key=lambda i: outNames[i])
+  outBitrates = [getOutputBitrate(fullName[i], kbps[i], bitrateType[i],
+                                  outkbps, fileProfile[i])
+                 for i in range(len(fullName))]
+
+  # write a CSV output with converted files info
+  if reports is True:
+    with metrics.stage('csvWrite'):
+      writeConvertedData(csvRoot, outFolder,
+                         [outNames[i] for i in done],
+                         [outBitrates[i] for i in done],
+                         [title[i] for i in done],
+                         [artist[i] for i in done],
+                         [outSizes[i] for i in done],
+                         [i in jobIdx for i in done], probeOutput)
+
+  if metricsFile is not None:
+    metrics.writeJSON(metricsFile)
 
-  # start processing
-  for i in range(0, totalFiles, nProcs):
-    chunkSlice = slice(i, i+nProcs) # chunk range
+  return 0
 
-    # create chunks
-    chunkFullName    = fullName[chunkSlice]
-    chunkkbps        = kbps[chunkSlice]
-    chunkOutFolders  = outFolders[chunkSlice]
-    chunkNewFileName = newFileName[chunkSlice]
-    chunkTitle       = title[chunkSlice]
-    chunkArtist      = artist[chunkSlice]
+async def convertAudioFilesAsync(*args, **kwargs) -> int:
+  """
+  Converts audio files like "convertAudioFiles" with the 'async' engine
+      without blocking the calling event loop. The converters run on
+      the calling event loop, while reading the CSV file, planning jobs,
+      the manifest and writing the output CSV file run in a worker thread.
+  If the awaiting task is cancelled, running converters are killed (their
+      temporary files are removed) and no further conversions are started;
+      the cancellation completes when the worker thread has finished its
+      current step (planning steps such as hashing are not interrupted).
+
+  args, kwargs
+    "convertAudioFiles" arguments ("engine" is always 'async').
 
-    print(f'Processing files {i+1}-{i+len(chunkkbps)} of {totalFiles}.')
+  Returns 0.
+  """
 
-    mOutput[:] = [] # empty output list
+  kwargs['engine'] = 'async'
+
+  # the worker thread task copies the context with the bridge
+  bridge = LoopBridge(asyncio.get_running_loop())
+  token  = LOOP_BRIDGE.set(bridge)
+  try:
+    worker = asyncio.ensure_future(asyncio.to_thread(convertAudioFiles,
+                                                     *args, **kwargs))
+  finally:
+    LOOP_BRIDGE.reset(token)
+
+  try:
+    return await asyncio.shield(worker)
+  except asyncio.CancelledError:
+    bridge.cancel() # stop the converters and wait for the worker thread
+    await asyncio.gather(worker, return_exceptions=True)
+    raise
+
+def convertRenditions(infoFile     : tp.Union[str, tf.TrackTable],
+                      renditions   : tp.Sequence[tp.Tuple[str, int, str]],
+                      nProcs       : tp.Optional[int]=None,
+                      manifestFile : tp.Optional[str]='',
+                      probeOutput  : bool=False,
+                      metricsFile  : tp.Optional[str]='') -> int:
+  """
+  Converts audio files into several renditions (e.g. bitrates published
+      side by side) and writes a CSV file with information about converted
+      files into each output folder. Each input file is read and decoded
+      once by a single converter run for all of its renditions, instead of
+      once per "convertAudioFiles" run.
+
+  infoFile: str or TrackTable
+    Input CSV file (or binary track file) full path, or a table of tracks.
+
+  renditions: Sequence[Tuple[str, int, str]]
+    List of output folder, output kbps and output profile name (see
+        "profileFunctions.getProfile") of each rendition, e.g.
+        [(folder64, 64, 'mp3'), (folder128, 128, 'mp3')]. Each output folder
+        is laid out as by "convertAudioFiles".
+
+  nProcs: int
+    Number of concurrent conversions.
+    Defaults to None (number of CPU physical cores).
+
+  manifestFile: str
+    Full name of a job manifest (SQLite) file, jobs done by previous runs
+        are skipped (renditions of a file are skipped one by one).
+    Defaults to '' ("manifest.sqlite" in each output folder, shared with
+        "convertAudioFiles" runs into the folder), None disables
+        the manifest.
+
+  probeOutput: bool
+    Specifies whether to probe the files converted by this run for the
+        output CSV files.
+    Defaults to False (the output CSV files are built from the conversion
+        parameters).
+
+  metricsFile: str
+    Full name of a JSON file to which conversion metrics are written
+        (output bytes of a file are summed over its renditions).
+    Defaults to '' ("metrics_<timestamp>.json" in the first output folder),
+        None disables the file (progress is still printed).
 
-    # create processes
-    procs = []
-    for j in range(len(chunkFullName)):
-      proc = mp.Process(target=convertAudioFile,
-                        args=(chunkFullName[j],
-                              chunkkbps[j],
-                              chunkOutFolders[j],
-                              chunkNewFileName[j],
-                              chunkArtist[j],
-                              chunkTitle[j],
-                              outkbps,
-                              mOutput))
-      procs.append(proc)
+  Returns 0.
+  """
 
-    for proc in procs: proc.start()
+  sf.limitTracebackInfo(0) # limit traceback info
+  if not isinstance(infoFile, tf.TrackTable):
+    ff.fileCheck(infoFile) # check "infoFile" correctness
+
+  # check "renditions" argument values provided
+  renditions = list(renditions)
+  if renditions == []:
+    raise ValueError('"renditions" must list at least one rendition!')
+  for outFolder, outkbps, profile in renditions:
+    ff.dirCheck(outFolder) # check output folder correctness
+    if not isinstance(outkbps, int):
+      raise TypeError('"outkbps" of a rendition must be an integer ' +
+                      f'("{type(outkbps)}" was provided)!')
+    if outkbps < 1:
+      raise ValueError('"outkbps" of a rendition must be positive ' +
+                       f'("{outkbps}" was provided)!')
+    pf.getProfile(profile, outkbps) # check "profile" value
+  if len({rendition[0] for rendition in renditions}) < len(renditions):
+    raise ValueError('Output folders of renditions must differ!')
+
+  sf.cmdInstalled('ffmpeg') # check if command is installed
 
-    for proc in procs: proc.join()
+  # set number of processes
+  if nProcs is None:
+    nProcs = sf.nPhysicalCores() # number of CPU physical cores
+
+  # check "nProcs" argument type and value provided
+  if not isinstance(nProcs, int):
+    raise TypeError('"nProcs" must be an integer ' +
+                    f'("{type(nProcs)}" was provided)!')
+  if nProcs < 1:
+    raise ValueError('"nProcs" must be positive ' +
+                     f'("{nProcs}" was provided)!')
+
+  # check "probeOutput" argument type provided
+  if not isinstance(probeOutput, bool):
+    raise TypeError('"probeOutput" must be a boolean ' +
+                    f'("{type(probeOutput)}" was provided)!')
+
+  # extract data from a csv file (the tree is walked once for all
+  # renditions)
+  rootPath, rootFolder, fullName, existFileName, kbps, \
+      newFileName, title, artist, sizeBytes, bitrateType = \
+      readFileListData(infoFile)
+
+  # open the job manifests
+  connections = [None] * len(renditions)
+  if manifestFile is not None:
+    opened = {} # manifest file -> connection
+    for r, (outFolder, _, _) in enumerate(renditions):
+      fileName = manifestFile or os.path.join(outFolder, 'manifest.sqlite')
+      if fileName not in opened:
+        opened[fileName] = mf.openManifest(fileName)
+      connections[r] = opened[fileName]
+
+  # skip renditions done by previous runs
+  outFolders = [] # output folders of each rendition
+  outNames   = [] # output file full names of each rendition
+  params     = [] # encode parameters of each rendition
+  outSizes   = [{} for _ in renditions] # output file sizes by job index
+  todo       = [[] for _ in fullName]   # renditions to do by job index
+  inStats    = [ff.statFile(file) for file in fullName]
+  for r, (outFolder, outkbps, profile) in enumerate(renditions):
+    extension = pf.getProfile(profile, outkbps).extension
+    outFolders.append(getOutFolders(rootPath, rootFolder, outFolder,
+                                    fullName, existFileName))
+    outNames.append([os.path.join(outFolders[r][i], newFileName[i] + '.' +
+                                  extension) for i in range(len(fullName))])
+    params.append([mf.jobParams(tf.kbpsText(kbps[i]), artist[i], title[i],
+                                outkbps,
+                                *([] if profile == 'mp3' else [[profile]]))
+                   for i in range(len(fullName))])
+
+    for i in range(len(fullName)):
+      if connections[r] is not None and \
+          mf.isJobDone(connections[r], fullName[i], outNames[r][i],
+                       inStats[i], params[r][i]):
+        outSizes[r][i] = ff.statFile(outNames[r][i]).st_size
+        continue
+      todo[i].append(r)
+
+  pending = [i for i in range(len(fullName)) if todo[i] != []]
+
+  nSkipped = sum(len(renditions) - len(todo[i]) for i in range(len(todo)))
+  if nSkipped > 0:
+    print(f'Skipped {nSkipped} renditions converted by previous runs.')
+
+  # create output folders and record pending jobs
+  for r, (outFolder, _, _) in enumerate(renditions):
+    indices = [i for i in pending if r in todo[i]]
+    createFolders(rootPath, rootFolder, outFolder,
+                  [fullName[i] for i in indices],
+                  [existFileName[i] for i in indices])
+    if connections[r] is not None:
+      for i in indices:
+        mf.setJobState(connections[r], fullName[i], outNames[r][i],
+                       inStats[i], params[r][i], 'pending', commit=False)
+      connections[r].commit()
 
-    # write converted files and log on errors
-    writeConvertedFiles(logFile, list(mOutput))
+  # create empty log-file for writing errors for not converted files
+  logFile = os.path.join(renditions[0][0], 'LOG'+sf.getTimeStamp())
+  open(logFile, 'wb').close()
 
-  # write a CSV output with converted files info in root folder
-  gi.getInfo(os.path.join(outFolder, rootFolder), outFolder)
+  # set a default metrics file in the first output folder
+  if metricsFile == '':
+    metricsFile = os.path.join(renditions[0][0],
+                               'metrics' + sf.getTimeStamp() + '.json')
+
+  # ETA is estimated by input bytes, the files differ in duration
+  metrics = mt.Metrics(len(pending), sum(sizeBytes[i] for i in pending))
+
+  # create jobs, the largest files are converted first
+  jobs   = []
+  jobIdx = {} # first rendition output name to job index
+  for i in sorted(pending, key=lambda i: sizeBytes[i], reverse=True):
+    jobs.append((fullName[i], kbps[i], artist[i], title[i],
+                 [(outFolders[r][i], newFileName[i], renditions[r][1],
+                   renditions[r][2]) for r in todo[i]]))
+    jobIdx[outNames[todo[i][0]][i]] = i
+
+  # start processing, a worker takes the next job as soon as it is free
+  with mp.Pool(min(nProcs, max(len(jobs), 1))) as pool:
+    for results, timings in pool.imap_unordered(convertRenditionsJob, jobs):
+      j = jobIdx[results[0][1]]
+
+      # log on errors (once per file, renditions share the converter run)
+      writeConversionLog(logFile, [result for result in results
+                                   if result[2] == 0][:1])
+
+      for r, result in zip(todo[j], results):
+        outSizes[r][j] = result[2]
+
+        # record the job state
+        if connections[r] is not None:
+          mf.setJobState(connections[r], fullName[j], outNames[r][j],
+                         inStats[j], params[r][j],
+                         'done' if result[2] > 0 else 'failed', result[2])
+
+      # record file throughput and print the progress
+      metrics.addStageTime('encode', timings['encode'])
+      metrics.addStageTime('write', timings['write'])
+      metrics.addFile(fullName[j], timings['seconds'], sizeBytes[j],
+                      sum(result[2] for result in results),
+                      encode=timings['encode'], write=timings['write'])
+
+  metrics.finish()
+
+  for connection in set(connections) - {None}:
+    connection.close()
+
+  # write a CSV output with converted files info into each output folder
+  with metrics.stage('csvWrite'):
+    for r, (outFolder, outkbps, profile) in enumerate(renditions):
+      done = sorted((i for i in outSizes[r] if outSizes[r][i] > 0),
+                    key=lambda i: outNames[r][i])
+      writeConvertedData(os.path.join(outFolder, rootFolder), outFolder,
+                         [outNames[r][i] for i in done],
+                         [getOutputBitrate(fullName[i], kbps[i],
+                                           bitrateType[i], outkbps, profile)
+                          for i in done],
+                         [title[i] for i in done],
+                         [artist[i] for i in done],
+                         [outSizes[r][i] for i in done],
+                         [r in todo[i] for i in done], probeOutput)
+
+  if metricsFile is not None:
+    metrics.writeJSON(metricsFile)
 
   return 0
 
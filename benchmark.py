@@ -0,0 +1,346 @@
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess as sp
+import sys
+import tempfile
+import time
+import typing as tp
+
+import fileFunctions as ff
+import sysFunctions as sf
+import trackFunctions as tf
+
+# synthetic file formats: extension -> encoder arguments
+FORMATS = {
+  'mp3' : ['-codec:a', 'libmp3lame'],
+  'flac': ['-codec:a', 'flac'],
+  'wav' : ['-codec:a', 'pcm_s16le'],
+  'ogg' : ['-codec:a', 'libvorbis'],
+}
+
+def generateLibrary(folder   : str, nFiles: int, seed: int=0,
+                    duration : tp.Tuple[float, float]=(5, 120),
+                    maxDepth : int=3) -> float:
+  """
+  Generates a synthetic audio library with ffmpeg lavfi sources.
+
+  folder : str
+    Library root folder (created if it does not exist).
+
+  nFiles : int
+    Number of audio files.
+
+  seed : int
+    Random seed, the same seed generates the same library. Defaults to 0.
+
+  duration : Tuple[float, float]
+    Minimum and maximum file duration, seconds. Defaults to (5, 120).
+
+  maxDepth : int
+    Maximum folder depth. Defaults to 3.
+
+  Returns:
+    Total audio duration, seconds : float.
+  """
+
+  sf.cmdInstalled('ffmpeg') # check if command is installed
+
+  rng = random.Random(seed)
+  os.makedirs(folder, exist_ok=True)
+
+  totalDuration = 0.0
+  for i in range(nFiles):
+    extension = rng.choice(sorted(FORMATS))
+    seconds   = round(rng.uniform(*duration), 1)
+    kbps      = rng.choice([96, 128, 192, 256, 320])
+    depth     = rng.randint(0, maxDepth)
+
+    # nested folders like "d1/d3/d0"
+    subfolder = os.path.join(folder, *[f'd{rng.randint(0, 3)}'
+                                       for _ in range(depth)])
+    os.makedirs(subfolder, exist_ok=True)
+    fileName = os.path.join(subfolder, f'track{i:05d}.{extension}')
+
+    # sine tones and noise
+    if rng.random() < 0.5:
+      source = f'sine=frequency={rng.randint(110, 1760)}:' + \
+               f'sample_rate=44100:duration={seconds}'
+    else:
+      source = f'anoisesrc=color=pink:sample_rate=44100:' + \
+               f'duration={seconds}:seed={rng.randint(0, 2**31)}'
+
+    cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-y', '-f', 'lavfi',
+           '-i', source, '-ac', '2', *FORMATS[extension]]
+    if extension in ('mp3', 'ogg'):
+      cmd += ['-b:a', f'{kbps}k']
+    cmd += ['-metadata', f'title=Track {i}',
+            '-metadata', f'artist=Artist {i % 17}', fileName]
+    sp.run(cmd, check=True)
+
+    totalDuration += seconds
+
+  return totalDuration
+
+def folderBytes(folder: str) -> tp.Tuple[int, int]:
+  """
+  Gets the number and total size of files in a folder.
+
+  folder : str
+    Folder path.
+
+  Returns:
+    Number of files : int.
+    Total size of files in bytes : int.
+  """
+
+  nFiles = 0
+  nBytes = 0
+  for _, _, fileStat in ff.iterFiles(folder, True):
+    nFiles += 1
+    nBytes += fileStat.st_size
+
+  return nFiles, nBytes
+
+def peakRSS() -> tp.Tuple[int, int]:
+  """
+  Gets peak resident set size of the current process and of the largest
+      of its waited-for children (workers, ffmpeg, mediainfo).
+
+  Returns:
+    Peak RSS of the current process, bytes : int.
+    Peak RSS of the largest child process, bytes : int.
+  """
+
+  # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+  scale = 1 if sys.platform == 'darwin' else 1024
+  selfRSS     = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  childrenRSS = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+  return selfRSS * scale, childrenRSS * scale
+
+def runStage(stage: str, library: str, workFolder: str, nWorkers: int,
+             options: tp.Dict[str, tp.Any]) -> tp.Dict[str, tp.Any]:
+  """
+  Runs a single benchmark stage in the current process.
+
+  stage : str
+    'scan', 'rescan' (warm metadata cache) or 'convert'.
+
+  library : str
+    Library root folder.
+
+  workFolder : str
+    Empty folder for the stage outputs.
+
+  nWorkers : int
+    Number of concurrent probes or conversions.
+
+  options : Dict[str, Any]
+    Stage options: 'nativeParser', 'batchSize', 'outkbps', 'infoFile'.
+
+  Returns:
+    Stage measurements : Dict[str, Any].
+  """
+
+  import audioConverter as ac
+  import getInfo as gi
+
+  start = time.perf_counter()
+  if stage in ('scan', 'rescan'):
+    cacheFile = os.path.join(workFolder, 'metadata.sqlite') \
+                if stage == 'rescan' else None
+    gi.getInfo(library, workFolder, cacheFile, options.get('batchSize'),
+               nWorkers, options.get('nativeParser', False))
+  elif stage == 'convert':
+    ac.convertAudioFiles(options['infoFile'], workFolder,
+                         options.get('outkbps', 128), nWorkers,
+                         manifestFile=None)
+  else:
+    raise ValueError(f'Unknown benchmark stage "{stage}"!')
+  elapsed = time.perf_counter() - start
+
+  _, nBytes = folderBytes(workFolder)
+  selfRSS, childRSS = peakRSS()
+
+  return {'seconds': elapsed, 'bytesWritten': nBytes,
+          'peakRSSBytes': selfRSS, 'peakChildRSSBytes': childRSS}
+
+def runIsolated(stage: str, library: str, workFolder: str, nWorkers: int,
+                options: tp.Dict[str, tp.Any]) -> tp.Dict[str, tp.Any]:
+  """
+  Runs a benchmark stage in a new interpreter, so that peak RSS is
+      measured per run.
+
+  stage, library, workFolder, nWorkers, options
+    See "runStage".
+
+  Returns:
+    Stage measurements : Dict[str, Any].
+  """
+
+  args = json.dumps([stage, library, workFolder, nWorkers, options])
+  cmdout = sp.run([sys.executable, os.path.abspath(__file__),
+                   '--stage', args], stdout=sp.PIPE, check=True,
+                  cwd=os.path.dirname(os.path.abspath(__file__)))
+
+  # the last output line contains the measurements
+  return json.loads(cmdout.stdout.decode('utf-8').strip().splitlines()[-1])
+
+def prepareInfoFile(library: str, workFolder: str) -> str:
+  """
+  Scans a library and marks every audio file for conversion.
+
+  library : str
+    Library root folder.
+
+  workFolder : str
+    Folder to which the CSV file is written.
+
+  Returns:
+    CSV file full name : str.
+  """
+
+  import getInfo as gi
+
+  gi.getInfo(library, workFolder, None, nativeParser=True)
+  csvFile = [name for name in os.listdir(workFolder)
+             if name.startswith('out') and name.endswith('.csv')][0]
+  tracks  = tf.readTracksCSV(os.path.join(workFolder, csvFile))
+
+  for i in range(len(tracks)):
+    if tracks.bitrateType[i] != '' or tracks.kbps[i] > 0:
+      name = os.path.splitext(tracks.fileName[i])[0]
+      tracks.newFileName[i] = name + '_' + tracks.extension[i]
+      tracks.newTitle[i]    = tracks.title[i]
+      tracks.newArtist[i]   = tracks.artist[i]
+
+  infoFile = os.path.join(workFolder, 'convert.csv')
+  tf.writeTracksCSV(tracks, infoFile)
+
+  return infoFile
+
+def benchmark(folder   : str, nFiles: int, workers: tp.List[int],
+              stages   : tp.List[str], seed: int=0,
+              options  : tp.Optional[tp.Dict[str, tp.Any]]=None) -> \
+    tp.Dict[str, tp.Any]:
+  """
+  Generates a synthetic library and measures scan and convert throughput
+      at several worker counts.
+
+  folder : str
+    Benchmark folder (the library is generated in its "library" subfolder
+        and reused by later runs with the same parameters).
+
+  nFiles : int
+    Number of audio files.
+
+  workers : List[int]
+    Worker counts to measure.
+
+  stages : List[str]
+    Stages to measure: 'scan', 'rescan', 'convert'.
+
+  seed : int
+    Library random seed. Defaults to 0.
+
+  options : Dict[str, Any]
+    Stage options, see "runStage". Defaults to None (no options).
+
+  Returns:
+    Benchmark results : Dict[str, Any].
+  """
+
+  options = dict(options or {})
+  library = os.path.join(folder, 'library')
+  params  = {'nFiles': nFiles, 'seed': seed}
+
+  # generate the library once for the same parameters
+  paramsFile = os.path.join(folder, 'library.json')
+  if os.path.isfile(paramsFile):
+    with open(paramsFile) as f:
+      stored = json.load(f)
+  else:
+    stored = {}
+  if stored.get('params') != params:
+    shutil.rmtree(library, ignore_errors=True)
+    audioSeconds = generateLibrary(library, nFiles, seed)
+    with open(paramsFile, 'w') as f:
+      json.dump({'params': params, 'audioSeconds': audioSeconds}, f)
+  else:
+    audioSeconds = stored['audioSeconds']
+
+  nLibFiles, libBytes = folderBytes(library)
+  results = {'library': {**params, 'audioSeconds': audioSeconds,
+                         'bytes': libBytes},
+             'options': options, 'runs': []}
+
+  if 'convert' in stages:
+    prepFolder = os.path.join(folder, 'prepare')
+    shutil.rmtree(prepFolder, ignore_errors=True)
+    os.makedirs(prepFolder)
+    options['infoFile'] = prepareInfoFile(library, prepFolder)
+
+  for stage in stages:
+    for nWorkers in workers:
+      workFolder = os.path.join(folder, f'{stage}_{nWorkers}')
+      shutil.rmtree(workFolder, ignore_errors=True)
+      os.makedirs(workFolder)
+
+      if stage == 'rescan': # warm the metadata cache
+        runIsolated(stage, library, workFolder, nWorkers, options)
+
+      run = runIsolated(stage, library, workFolder, nWorkers, options)
+      run.update({'stage': stage, 'workers': nWorkers,
+                  'filesPerSecond': nLibFiles / run['seconds'],
+                  'audioSecondsPerSecond': audioSeconds / run['seconds']})
+      results['runs'].append(run)
+      print(json.dumps(run), file=sys.stderr)
+
+  return results
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(
+    description='Measures scan and convert throughput on a synthetic library.')
+  parser.add_argument('--folder',
+                      default=os.path.join(tempfile.gettempdir(),
+                                           'audio-optimizer-benchmark'),
+                      help='benchmark folder (default: a temporary folder)')
+  parser.add_argument('--files', type=int, default=100,
+                      help='number of synthetic files (default: 100)')
+  parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                      help='worker counts (default: 1 2 4)')
+  parser.add_argument('--stages', nargs='+', default=['scan', 'convert'],
+                      choices=['scan', 'rescan', 'convert'],
+                      help='stages to measure (default: scan convert)')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='library random seed (default: 0)')
+  parser.add_argument('--native', action='store_true',
+                      help='scan with the in-process header parser')
+  parser.add_argument('--batch', type=int, default=None,
+                      help='files per mediainfo call')
+  parser.add_argument('--kbps', type=int, default=128,
+                      help='output kbps (default: 128)')
+  parser.add_argument('--output', default=None,
+                      help='JSON results file (default: standard output)')
+  parser.add_argument('--stage', default=None, help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.stage is not None: # isolated run of a single stage
+    stage, library, workFolder, nWorkers, options = json.loads(args.stage)
+    print(json.dumps(runStage(stage, library, workFolder, nWorkers, options)))
+    sys.exit(0)
+
+  results = benchmark(os.path.abspath(args.folder), args.files, args.workers,
+                      args.stages, args.seed,
+                      {'nativeParser': args.native, 'batchSize': args.batch,
+                       'outkbps': args.kbps})
+
+  if args.output is None:
+    print(json.dumps(results, indent=2))
+  else:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2)
@@ -0,0 +1,315 @@
+import os
+import shutil
+import sqlite3
+import time
+import typing as tp
+
+def openMetadataCache(cacheFile: str) -> sqlite3.Connection:
+  """
+  Opens (and creates if necessary) a persistent metadata cache.
+
+  cacheFile : str
+    Full name of the SQLite cache file.
+
+  Returns:
+    Connection to the cache database : sqlite3.Connection.
+  """
+
+  # check "cacheFile" argument type provided
+  if not isinstance(cacheFile, str):
+    raise TypeError('"cacheFile" must be a string ' +
+                    f'("{type(cacheFile)}" was provided)!')
+
+  connection = sqlite3.connect(cacheFile)
+  connection.execute('CREATE TABLE IF NOT EXISTS metadata ('
+                     'path        TEXT PRIMARY KEY, '
+                     'size        INTEGER, '
+                     'mtimeNs     INTEGER, '
+                     'inode       INTEGER, '
+                     'audio       INTEGER, '
+                     'bitrateType TEXT, '
+                     'kbps        TEXT, '
+                     'title       TEXT, '
+                     'artist      TEXT, '
+                     'lastSeen    INTEGER)')
+  connection.commit()
+
+  return connection
+
+def getCachedMetadata(connection : sqlite3.Connection, file: str,
+                      fileStat   : os.stat_result) -> \
+    tp.Optional[tp.Tuple[bool, str, str, str, str]]:
+  """
+  Gets cached metadata of a file if the file has not changed since it
+      was cached.
+
+  connection : sqlite3.Connection
+    Connection to the cache database.
+
+  file : str
+    File full name.
+
+  fileStat : os.stat_result
+    Current stat information of the file.
+
+  Returns:
+    Cached metadata : Tuple[bool, str, str, str, str]
+        (audio section found, bitrate type, kbps, title, artist),
+        or None if the file is not cached or has changed.
+  """
+
+  row = connection.execute('SELECT size, mtimeNs, inode, audio, '
+                           'bitrateType, kbps, title, artist '
+                           'FROM metadata WHERE path = ?',
+                           (file,)).fetchone()
+  if row is None: # not cached
+    return None
+
+  # file was changed since it was cached
+  if row[:3] != (fileStat.st_size, fileStat.st_mtime_ns, fileStat.st_ino):
+    return None
+
+  # mark the entry as seen during the current scan
+  connection.execute('UPDATE metadata SET lastSeen = ? WHERE path = ?',
+                     (time.time_ns(), file))
+
+  return bool(row[3]), row[4], row[5], row[6], row[7]
+
+def putCachedMetadata(connection : sqlite3.Connection, file: str,
+                      fileStat   : os.stat_result,
+                      metadata   : tp.Tuple[bool, str, str, str, str]) -> None:
+  """
+  Stores metadata of a file in the cache.
+
+  connection : sqlite3.Connection
+    Connection to the cache database.
+
+  file : str
+    File full name.
+
+  fileStat : os.stat_result
+    Stat information of the file the metadata was retrieved from.
+
+  metadata : Tuple[bool, str, str, str, str]
+    Audio section found, bitrate type, kbps, title, artist.
+
+  Returns None.
+  """
+
+  connection.execute('INSERT OR REPLACE INTO metadata VALUES '
+                     '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     (file, fileStat.st_size, fileStat.st_mtime_ns,
+                      fileStat.st_ino, int(metadata[0]), *metadata[1:],
+                      time.time_ns()))
+
+  return None
+
+def removeCachedMetadata(connection : sqlite3.Connection,
+                         files      : tp.Iterable[str]) -> None:
+  """
+  Removes cache entries of files (e.g. files deleted from the library).
+
+  connection : sqlite3.Connection
+    Connection to the cache database.
+
+  files : Iterable[str]
+    File full names.
+
+  Returns None.
+  """
+
+  connection.executemany('DELETE FROM metadata WHERE path = ?',
+                         ((file,) for file in files))
+  connection.commit()
+
+  return None
+
+def evictCachedMetadata(connection : sqlite3.Connection, rootFolder: str,
+                        scanStart  : int) -> int:
+  """
+  Removes cache entries of files in the root folder that were not seen
+      since the scan start (deleted or moved files).
+
+  connection : sqlite3.Connection
+    Connection to the cache database.
+
+  rootFolder : str
+    Scanned root folder.
+
+  scanStart : int
+    Scan start time, ns (as returned by time.time_ns()).
+
+  Returns:
+    Number of evicted entries : int.
+  """
+
+  prefix = os.path.join(rootFolder, '') # make sure a separator is at the end
+  cursor = connection.execute('DELETE FROM metadata '
+                              'WHERE substr(path, 1, ?) = ? '
+                              'AND lastSeen < ?',
+                              (len(prefix), prefix, scanStart))
+  connection.commit()
+
+  return cursor.rowcount
+
+def openPayloadCache(cacheFolder: str) -> sqlite3.Connection:
+  """
+  Opens (and creates if necessary) a content-addressed cache of converted
+      files. Files are stored in "cacheFolder" by key, their sizes and
+      last use times are indexed in "index.sqlite" there.
+
+  cacheFolder : str
+    Cache folder full name.
+
+  Returns:
+    Connection to the cache index : sqlite3.Connection.
+  """
+
+  # check "cacheFolder" argument type provided
+  if not isinstance(cacheFolder, str):
+    raise TypeError('"cacheFolder" must be a string ' +
+                    f'("{type(cacheFolder)}" was provided)!')
+
+  os.makedirs(cacheFolder, exist_ok=True)
+
+  connection = sqlite3.connect(os.path.join(cacheFolder, 'index.sqlite'))
+  connection.execute('CREATE TABLE IF NOT EXISTS payloads ('
+                     'key      TEXT PRIMARY KEY, '
+                     'size     INTEGER, '
+                     'lastUsed INTEGER)')
+  connection.commit()
+
+  return connection
+
+def payloadPath(cacheFolder: str, key: str) -> str:
+  """
+  Gets the full name of a cached file.
+
+  cacheFolder : str
+    Cache folder full name.
+
+  key : str
+    Cache key (hexadecimal).
+
+  Returns:
+    Cached file full name : str.
+  """
+  return os.path.join(cacheFolder, key[:2], key)
+
+def getCachedPayload(connection : sqlite3.Connection, cacheFolder: str,
+                     key        : str) -> tp.Optional[str]:
+  """
+  Gets a cached file and marks it as used.
+
+  connection : sqlite3.Connection
+    Connection to the cache index.
+
+  cacheFolder : str
+    Cache folder full name.
+
+  key : str
+    Cache key.
+
+  Returns:
+    Cached file full name : str, or None if the key is not cached.
+  """
+
+  row = connection.execute('SELECT size FROM payloads WHERE key = ?',
+                           (key,)).fetchone()
+  if row is None: # not cached
+    return None
+
+  path = payloadPath(cacheFolder, key)
+  try:
+    if os.stat(path).st_size != row[0]: # damaged
+      raise OSError
+  except OSError: # removed or damaged, forget it
+    connection.execute('DELETE FROM payloads WHERE key = ?', (key,))
+    connection.commit()
+    return None
+
+  connection.execute('UPDATE payloads SET lastUsed = ? WHERE key = ?',
+                     (time.time_ns(), key))
+  connection.commit()
+
+  return path
+
+def putCachedPayload(connection : sqlite3.Connection, cacheFolder: str,
+                     key        : str, fileFullName: str) -> str:
+  """
+  Copies a converted file to the cache.
+
+  connection : sqlite3.Connection
+    Connection to the cache index.
+
+  cacheFolder : str
+    Cache folder full name.
+
+  key : str
+    Cache key.
+
+  fileFullName : str
+    Converted file full name.
+
+  Returns:
+    Cached file full name : str.
+  """
+
+  path = payloadPath(cacheFolder, key)
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+
+  # copy to a temporary file (in the kernel where possible) and rename it
+  tempPath = f'{path}.{os.getpid()}.part'
+  try:
+    shutil.copyfile(fileFullName, tempPath)
+    os.replace(tempPath, path)
+  except BaseException:
+    if os.path.exists(tempPath):
+      os.remove(tempPath)
+    raise
+
+  connection.execute('INSERT OR REPLACE INTO payloads VALUES (?, ?, ?)',
+                     (key, os.stat(path).st_size, time.time_ns()))
+  connection.commit()
+
+  return path
+
+def evictCachedPayloads(connection : sqlite3.Connection, cacheFolder: str,
+                        maxBytes   : int) -> int:
+  """
+  Removes the least recently used cached files until the cache size does
+      not exceed a limit.
+
+  connection : sqlite3.Connection
+    Connection to the cache index.
+
+  cacheFolder : str
+    Cache folder full name.
+
+  maxBytes : int
+    Maximum cache size, bytes.
+
+  Returns:
+    Number of removed files : int.
+  """
+
+  total = connection.execute('SELECT TOTAL(size) FROM payloads').fetchone()[0]
+
+  evicted = []
+  for key, size in connection.execute('SELECT key, size FROM payloads '
+                                      'ORDER BY lastUsed'):
+    if total <= maxBytes:
+      break
+    evicted.append(key)
+    total -= size
+
+  for key in evicted:
+    try:
+      os.remove(payloadPath(cacheFolder, key))
+    except OSError: # already removed
+      pass
+  connection.executemany('DELETE FROM payloads WHERE key = ?',
+                         ((key,) for key in evicted))
+  connection.commit()
+
+  return len(evicted)
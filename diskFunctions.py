@@ -0,0 +1,238 @@
+import contextlib
+import itertools
+import os
+import queue
+import struct
+import threading
+import typing as tp
+
+try: # file extent maps are only available on Unix
+  import fcntl
+except ImportError:
+  fcntl = None
+
+FS_IOC_FIEMAP = 0xC020660B # Linux ioctl returning file extents
+
+READ_CHUNK_SIZE = 1 << 20 # bytes read from a source at once
+
+# extensions (lowercase) of containers which cannot be read from a pipe
+# (the index may be at the end of the file)
+SEEKING_EXTENSIONS = frozenset(('m4a', 'm4b', 'mp4', 'mov', '3gp', '3g2'))
+
+# reader slots of the worker process (see "initReaders")
+READER_SLOTS = {} # device -> semaphore limiting concurrent source readers
+READ_AHEAD   = None # read-ahead buffer size in bytes, None disables
+
+def physicalOffset(file: str) -> tp.Optional[int]:
+  """
+  Gets the physical offset of the first extent of a file on its device.
+
+  file : str
+    File full name.
+
+  Returns:
+    Physical offset in bytes : int, or None if the file system does not
+        report extents.
+  """
+
+  if fcntl is None:
+    return None
+
+  # struct fiemap (start, length, flags, mapped extents, extent count)
+  # followed by room for a single struct fiemap_extent
+  request = bytearray(struct.pack('=QQLLLL', 0, 0xFFFFFFFFFFFFFFFF, 0, 0,
+                                  1, 0) + bytes(56))
+  try:
+    with open(file, 'rb', buffering=0) as f:
+      fcntl.ioctl(f.fileno(), FS_IOC_FIEMAP, request)
+  except OSError: # not supported by the file system
+    return None
+
+  if struct.unpack_from('=L', request, 20)[0] == 0: # no extents (empty)
+    return None
+
+  return struct.unpack_from('=Q', request, 40)[0]
+
+def localityOrder(files     : tp.List[str],
+                  fileStats : tp.List[tp.Optional[os.stat_result]]) -> \
+    tp.List[int]:
+  """
+  Orders files by their physical location: files of a device by the offset
+      of their first extent (by inode number if extents are not reported),
+      devices in turn, so that sources of a device are read in one sweep
+      and several devices are read at once.
+
+  files : List[str]
+    List of files with their full paths.
+
+  fileStats : List[os.stat_result]
+    List of stat information of the files (None if not available).
+
+  Returns:
+    Indices of the files in reading order : List[int].
+  """
+
+  byDevice = {} # device -> locality key, file index
+  for i, (file, fileStat) in enumerate(zip(files, fileStats)):
+    device = fileStat.st_dev if fileStat is not None else -1
+    inode  = fileStat.st_ino if fileStat is not None else 0
+    offset = physicalOffset(file)
+    byDevice.setdefault(device, []).append(
+      ((offset is None, offset or 0, inode), i))
+
+  runs = [[i for _, i in sorted(run)] for run in byDevice.values()]
+
+  return [i for group in itertools.zip_longest(*runs) for i in group
+          if i is not None]
+
+def initReaders(slots     : tp.Dict[int, tp.Any],
+                readAhead : tp.Optional[int]) -> None:
+  """
+  Sets reader slots of a worker process (a pool initializer).
+
+  slots : Dict[int, Semaphore]
+    Semaphores (shared by the workers) limiting the number of concurrent
+        source readers by device.
+
+  readAhead : int
+    Read-ahead buffer size in bytes, sources are streamed to converters
+        (see "FileFeeder"). None disables read-ahead.
+
+  Returns None.
+  """
+
+  global READ_AHEAD
+
+  READER_SLOTS.clear()
+  READER_SLOTS.update(slots)
+  READ_AHEAD = readAhead
+
+  return None
+
+@contextlib.contextmanager
+def readerSlot(file: str) -> tp.Iterator[None]:
+  """
+  Holds a reader slot of the device of a file in a "with" block (does
+      nothing if reader slots are not set).
+
+  file : str
+    File full name.
+  """
+
+  slot = None
+  if READER_SLOTS:
+    try:
+      slot = READER_SLOTS.get(os.stat(file).st_dev)
+    except OSError: # errors are left to the reader
+      pass
+
+  if slot is None:
+    yield
+    return
+
+  with slot:
+    yield
+
+def isStreamable(file: str) -> bool:
+  """
+  Checks whether a converter can read a file from a pipe.
+
+  file : str
+    File full name.
+
+  Returns:
+    True if the file can be streamed : bool.
+  """
+
+  extension = os.path.splitext(file)[1][1:].lower()
+
+  return extension not in SEEKING_EXTENSIONS
+
+class FileFeeder(threading.Thread):
+  """
+  Streams a file into a pipe (e.g. converter standard input). A reader
+      thread reads the file sequentially, hinted by "posix_fadvise", into
+      a buffer while holding a reader slot of the file device, so the device
+      is released as soon as the file is read (if it fits in the buffer)
+      while the pipe is consumed at its own pace. The pipe is closed at
+      the end of the file.
+
+  file : str
+    File full name.
+
+  pipe : BinaryIO
+    Pipe opened for writing.
+
+  bufferBytes : int
+    Read-ahead buffer size in bytes.
+
+  chunkSize : int
+    Bytes read at once. Defaults to "READ_CHUNK_SIZE".
+  """
+
+  def __init__(self, file        : str, pipe: tp.BinaryIO,
+                     bufferBytes : int,
+                     chunkSize   : int=READ_CHUNK_SIZE) -> None:
+    super().__init__(daemon=True)
+    self.file      = file
+    self.pipe      = pipe
+    self.window    = max(bufferBytes, chunkSize)
+    self.chunkSize = chunkSize
+
+    self.chunks = queue.Queue(max(bufferBytes // chunkSize, 1))
+    self.stop   = threading.Event()
+    self.error  = None # read error
+
+  def put(self, item: tp.Any) -> bool:
+    # wait for room in the buffer unless the pipe is closed
+    while not self.stop.is_set():
+      try:
+        self.chunks.put(item, timeout=0.1)
+        return True
+      except queue.Full:
+        pass
+
+    return False
+
+  def read(self) -> None:
+    try:
+      with readerSlot(self.file), open(self.file, 'rb', buffering=0) as f:
+        fd     = f.fileno()
+        advise = hasattr(os, 'posix_fadvise')
+        if advise: # larger kernel read-ahead
+          os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        offset = 0
+        while True:
+          if advise and offset % self.window == 0: # prefetch the next window
+            os.posix_fadvise(fd, offset, self.window, os.POSIX_FADV_WILLNEED)
+          chunk = f.read(self.chunkSize)
+          if not chunk or not self.put(chunk):
+            break
+          offset += len(chunk)
+    except OSError as err:
+      self.put(err)
+    finally:
+      self.put(None) # end of the file
+
+  def run(self) -> None:
+    reader = threading.Thread(target=self.read, daemon=True)
+    reader.start()
+    try:
+      while True:
+        chunk = self.chunks.get()
+        if isinstance(chunk, OSError):
+          self.error = chunk
+          break
+        if chunk is None:
+          break
+        self.pipe.write(chunk)
+    except (BrokenPipeError, ValueError): # the consumer exited
+      pass
+    finally:
+      self.stop.set() # unblock the reader
+      try:
+        self.pipe.close()
+      except OSError:
+        pass
+      reader.join()
@@ -1,11 +1,41 @@
+import asyncio
+import concurrent.futures as cfut
+import contextlib
 import csv
+import functools
+import hashlib
+import itertools
+import json
 import os
 import re
-import subprocess as sp
+import time
 import typing as tp
 
+import cacheFunctions as cf
+import headerFunctions as hf
+import metricFunctions as mt
 import sysFunctions as sf
 
+# extensions (lowercase) of audio files and containers which may have audio
+AUDIO_EXTENSIONS = frozenset((
+  'mp3', 'mp2', 'mp1', 'mpa', 'flac', 'wav', 'wave', 'w64', 'aif', 'aiff',
+  'aifc', 'ogg', 'oga', 'opus', 'spx', 'm4a', 'm4b', 'mp4', 'aac', 'adts',
+  'ac3', 'eac3', 'dts', 'wma', 'asf', 'ape', 'wv', 'mpc', 'tta', 'tak',
+  'ofr', 'mka', 'mkv', 'webm', 'amr', 'awb', 'caf', 'dsf', 'dff', 'ra',
+  'rm', 'au', 'snd', 'voc', '3gp', '3g2', 'mov', 'avi', 'flv', 'ts', 'mts',
+  'm2ts', 'vob', 'mpg', 'mpeg'))
+
+# extensions (lowercase) of files found next to audio files without audio
+NON_AUDIO_EXTENSIONS = frozenset((
+  'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tif', 'tiff', 'webp', 'ico', 'heic',
+  'svg', 'cue', 'log', 'nfo', 'm3u', 'm3u8', 'pls', 'txt', 'md', 'pdf',
+  'doc', 'docx', 'rtf', 'htm', 'html', 'xml', 'json', 'ini', 'db', 'sfv',
+  'md5', 'sha1', 'ffp', 'accurip', 'url', 'lnk', 'zip', 'rar', '7z', 'gz',
+  'tar', 'exe', 'dll', 'par2', 'torrent', 'ds_store'))
+
+# file part size (bytes) hashed by a single worker
+HASH_CHUNK_SIZE = 1 << 24
+
 def pathChecks(path: str) -> None:
   """
   Performs correctness checks for the specified path.
@@ -65,6 +95,126 @@ def fileCheck(path: str) -> None:
 
   return None
 
+def createTempFile(fullName: str) -> tp.Tuple[int, str]:
+  """
+  Creates a hidden temporary file next to the specified file, so that
+      the temporary file can be atomically renamed to it.
+
+  fullName : str
+    Full name of the file the temporary file is created for.
+
+  Returns:
+    Temporary file descriptor : int.
+    Temporary file full name : str.
+  """
+
+  folder, name = os.path.split(fullName)
+
+  # file mode respects the umask like a regularly created file
+  flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+  for i in range(100):
+    tempFullName = os.path.join(folder,
+                                f'.{name}.{os.getpid()}.{i}.part')
+    try:
+      return os.open(tempFullName, flags, 0o666), tempFullName
+    except FileExistsError:
+      continue
+
+  raise Exception(f'Temporary file for "{fullName}" cannot be created!')
+
+def iterFiles(path: str, recursive: bool=False) -> \
+    tp.Iterator[tp.Tuple[str, str, os.stat_result]]:
+  """
+  Iterates over files in the specified folder. Files of a folder are
+      yielded sorted by name before files of its subfolders.
+
+  path : str
+    Path to the specified folder.
+
+  recursive : bool
+    Specifies whether to list files recursively.
+    Defaults to False (do not check folders recursively).
+
+  Yields:
+    File name, full path to the file, stat information of the file :
+        Tuple[str, str, os.stat_result].
+  """
+
+  # check "recursive" argument type provided
+  if not isinstance(recursive, bool):
+    raise TypeError('"recursive" must be a boolean ' +
+                    f'("{type(recursive)}" was provided)!')
+
+  folders = [path] # folders to list, depth first
+  while folders != []:
+    folder = folders.pop()
+
+    files      = []
+    subfolders = []
+    try:
+      with os.scandir(folder) as entries:
+        for entry in entries:
+          try:
+            if entry.is_dir(follow_symlinks=False):
+              subfolders.append(entry.path)
+            elif entry.is_file():
+              files.append((entry.name, entry.path, entry.stat()))
+          except OSError: # entry was removed or cannot be accessed
+            continue
+    except OSError: # folder was removed or cannot be accessed
+      if folder == path:
+        raise
+      continue
+
+    files.sort() # sort the files in a folder by name
+    yield from files
+
+    if recursive is True:
+      subfolders.sort(reverse=True) # the first subfolder is popped first
+      folders.extend(subfolders)
+
+def takeSnapshot(path: str) -> tp.Dict[str, tp.Tuple[str, os.stat_result]]:
+  """
+  Takes a snapshot of the files in the specified folder and its subfolders.
+
+  path : str
+    Path to the specified folder.
+
+  Returns:
+    File name and stat information by file full name :
+        Dict[str, Tuple[str, os.stat_result]].
+  """
+  return {fullName: (fileName, fileStat)
+          for fileName, fullName, fileStat in iterFiles(path, True)}
+
+def diffSnapshots(old : tp.Dict[str, tp.Tuple[str, os.stat_result]],
+                  new : tp.Dict[str, tp.Tuple[str, os.stat_result]]) -> \
+    tp.Tuple[tp.List[str], tp.List[str], tp.List[str]]:
+  """
+  Finds files added, changed (by size, modification time and inode) and
+      removed between two snapshots.
+
+  old : Dict[str, Tuple[str, os.stat_result]]
+    Previous snapshot (as returned by "takeSnapshot").
+
+  new : Dict[str, Tuple[str, os.stat_result]]
+    Current snapshot.
+
+  Returns:
+    Sorted lists of added, changed and removed file full names :
+        Tuple[List[str], List[str], List[str]].
+  """
+
+  def key(fileStat: os.stat_result) -> tp.Tuple[int, int, int]:
+    return fileStat.st_size, fileStat.st_mtime_ns, fileStat.st_ino
+
+  added   = sorted(name for name in new if name not in old)
+  removed = sorted(name for name in old if name not in new)
+  changed = sorted(name for name in new if name in old and
+                   key(new[name][1]) != key(old[name][1]))
+
+  return added, changed, removed
+
 def listFiles(path: str, recursive: bool=False) -> \
     tp.Tuple[tp.List[str], tp.List[str]]:
   """
@@ -82,38 +232,607 @@ def listFiles(path: str, recursive: bool=False) -> \
     List of full path to the files : List[str].
   """
 
-  # check "recursive" argument type provided
-  if not isinstance(recursive, bool):
-    raise TypeError('"recursive" must be a boolean ' +
-                    f'("{type(recursive)}" was provided)!')
-
   fileName = [] # file names only
   fullName = [] # file full names
-  if recursive is True: # list files in the dir and subdirs
-    for root, dirs, files in os.walk(path):
-      files.sort() # sort the files in a folder by name
-      for file in files:
-        fileName.append(file)
-        fullName.append(os.path.join(root, file))
-  else: # list files in the dir only
-    files = os.listdir(path)
-    files.sort() # sort the files in a folder by name
-    for file in files:
-      fullPath = os.path.join(path, file)
-      if os.path.isfile(fullPath):
-        fileName.append(file)
-        fullName.append(fullPath)
+  for name, fullPath, _ in iterFiles(path, recursive):
+    fileName.append(name)
+    fullName.append(fullPath)
 
   return fileName, fullName
 
-def getMetadata(files: tp.List[str]) -> \
-    tp.Tuple[tp.List[str], tp.List[str], tp.List[str], tp.List[str]]:
+def iterChunks(items: tp.Iterable[tp.Any], chunkSize: int) -> \
+    tp.Iterator[tp.List[tp.Any]]:
+  """
+  Splits items into chunks.
+
+  items : Iterable[Any]
+    Items to split.
+
+  chunkSize : int
+    Maximum number of items in a chunk.
+
+  Yields:
+    Chunk of items : List[Any].
+  """
+
+  items = iter(items)
+  while True:
+    chunk = list(itertools.islice(items, chunkSize))
+    if chunk == []:
+      return
+    yield chunk
+
+def probeFile(file: str) -> tp.Optional[tp.Tuple[str, str, str, str]]:
+  """
+  Retrieve metadata of a single file with mediainfo.
+
+  file : str
+    File full name.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), song title, song artist :
+        Tuple[str, str, str, str], or None if the file does not contain
+        an Audio Section.
+  """
+
+  return probeFileCounted(file)[0]
+
+def probeFileCounted(file       : str,
+                     parseSpeed : tp.Optional[float]=None) -> \
+    tp.Tuple[tp.Optional[tp.Tuple[str, str, str, str]], tp.Optional[int]]:
+  """
+  Retrieve metadata of a single file with mediainfo (see "probeFile") and
+      count bytes read by mediainfo.
+
+  file : str
+    File full name.
+
+  parseSpeed : float
+    mediainfo "--ParseSpeed" (0 reads the least of the file, 1 reads
+        the whole file).
+    Defaults to None (mediainfo default).
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), song title, song artist :
+        Tuple[str, str, str, str], or None if the file does not contain
+        an Audio Section.
+    Number of bytes read : int, or None if it is not reported by
+        the system.
+  """
+
+  fileInfoCmd = 'mediainfo' # file info command
+  speedArgs   = [] if parseSpeed is None else [f'--ParseSpeed={parseSpeed}']
+
+  metadata, bytesRead = sf.runCountingReads([fileInfoCmd, *speedArgs,
+                                             file]) # get metadata
+
+  return parseMediainfoText(metadata.decode('utf-8'), file), bytesRead
+
+def parseMediainfoText(metadata: str, file: str) -> \
+    tp.Optional[tp.Tuple[str, str, str, str]]:
+  """
+  Retrieve metadata from mediainfo text output of a single file.
+
+  metadata : str
+    "mediainfo" output.
+
+  file : str
+    File full name.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), song title, song artist :
+        Tuple[str, str, str, str], or None if the file does not contain
+        an Audio Section.
+  """
+
+  # keywords to find appropriate info
+  keyAudio       = 'audio' # used to check if it is an audio
+  keyBitrateType = 'bit.rate mode'
+  keykbps        = 'bit.rate'
+  keykbpsUnit    = 'kb.s'
+  keyTitle       = 'track name'
+  keyArtist      = 'performer'
+
+  # metadata output contains file name which can contain keywords that
+  # that the script looks for
+  metadata = metadata.replace(file, '')
+
+  if keyAudio not in metadata.lower(): # if not an audio file
+    return None
+
+  # get Audio section
+  audioMetadata = metadata[re.search(f'^{keyAudio}$', metadata,
+                  flags=re.MULTILINE | re.IGNORECASE).start():]
+
+  # get bitrate mode
+  result = re.findall(rf'^.*{keyBitrateType}.*$', audioMetadata,
+                      flags=re.MULTILINE | re.IGNORECASE)
+  if result != []:
+    result = result[0]
+    result = re.findall(r":.*", result)[0]
+    bitrateType = result[1:].strip()
+  else:
+    bitrateType = ''
+
+  # get kbps
+  result = re.findall(rf'^.*{keykbps}.*$', audioMetadata,
+                      flags=re.MULTILINE | re.IGNORECASE)
+
+  # remove bitrate type results
+  recomp = re.compile(rf'^(?!{keyBitrateType})', flags=re.IGNORECASE)
+  result = list(filter(recomp.match, result))
+  del recomp
+
+  if result != []:
+    result = result[0]
+    result = re.findall(rf'\d+[ ,]?\d*[.,]?\d*(?= {keykbpsUnit}$)',
+                        result)[0]
+    kbps = result.replace(' ', '')
+  else:
+    kbps = ''
+
+  # get track name
+  result = re.findall(rf'^{keyTitle} .*$', metadata,
+                      flags=re.MULTILINE | re.IGNORECASE)
+  if result != []:
+    result = result[0]
+    title = re.findall(r'(?<=: ).*$', result,
+                       flags=re.MULTILINE | re.IGNORECASE)[0]
+  else:
+    title = ''
+
+  # get artist
+  result = re.findall(rf'^{keyArtist}.*$', metadata,
+                      flags=re.MULTILINE | re.IGNORECASE)
+  if result != []:
+    result = result[0]
+    artist = re.findall(r'(?<=: ).*$', result,
+                        flags=re.MULTILINE | re.IGNORECASE)[0]
+  else:
+    artist = ''
+
+  return bitrateType, kbps, title, artist
+
+def parseMediainfoJSON(media: tp.Optional[tp.Dict[str, tp.Any]]) -> \
+    tp.Optional[tp.Tuple[str, str, str, str]]:
+  """
+  Retrieve metadata from a "media" object of mediainfo JSON output.
+
+  media : Dict[str, Any]
+    A "media" object of "mediainfo --Output=JSON" output.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), song title, song artist :
+        Tuple[str, str, str, str], or None if the file does not contain
+        an Audio Section.
+  """
+
+  # bitrate mode names as printed by mediainfo text output
+  bitrateTypes = {'CBR': 'Constant', 'VBR': 'Variable'}
+
+  if media is None: # file was not parsed
+    return None
+
+  tracks  = media.get('track', [])
+  general = next((track for track in tracks
+                  if track.get('@type') == 'General'), {})
+  audio   = next((track for track in tracks
+                  if track.get('@type') == 'Audio'), None)
+
+  if audio is None: # if not an audio file
+    return None
+
+  # get bitrate mode
+  bitrateType = audio.get('BitRate_Mode', '')
+  bitrateType = bitrateTypes.get(bitrateType, bitrateType)
+
+  # get kbps (bits per second are provided)
+  bps = audio.get('BitRate', audio.get('BitRate_Nominal',
+                  audio.get('BitRate_Maximum', '')))
+  try:
+    bps  = float(str(bps).split('/')[0]) # first value of multiple ones
+    kbps = hf.formatkbps(bps)
+  except ValueError:
+    kbps = ''
+
+  title  = general.get('Track', '')     # get track name
+  artist = general.get('Performer', '') # get artist
+
+  return bitrateType, kbps, title, artist
+
+def splitBatches(files: tp.List[str], batchSize: int,
+                 fixedLength: int=0) -> tp.List[tp.List[str]]:
+  """
+  Splits files into batches which fit into a single command line.
+
+  files : List[str]
+    List of files with their full paths.
+
+  batchSize : int
+    Maximum number of files in a batch.
+
+  fixedLength : int
+    Length of the command part which is not a file name, bytes.
+    Defaults to 0.
+
+  Returns:
+    List of batches of files : List[List[str]].
+  """
+
+  # leave a margin for pointers to arguments and terminating zeros
+  maxLength = sf.maxCmdLength() // 2 - fixedLength
+
+  batches = []
+  batch   = []
+  length  = 0
+  for file in files:
+    fileLength = len(os.fsencode(file)) + 1
+    if batch != [] and (len(batch) >= batchSize or
+                        length + fileLength > maxLength):
+      batches.append(batch)
+      batch  = []
+      length = 0
+    batch.append(file)
+    length += fileLength
+  if batch != []:
+    batches.append(batch)
+
+  return batches
+
+def probeFilesJSON(files: tp.List[str]) -> \
+    tp.List[tp.Optional[tp.Tuple[str, str, str, str]]]:
+  """
+  Retrieve metadata of several files with a single mediainfo call.
+
+  files : List[str]
+    List of files with their full paths.
+
+  Returns:
+    List of Bitrate Type, Bitrate (kbps), song title, song artist :
+        List[Tuple[str, str, str, str]], None for the files which do not
+        contain an Audio Section.
+  """
+
+  return probeFilesJSONCounted(files)[0]
+
+def probeFilesJSONCounted(files      : tp.List[str],
+                          parseSpeed : tp.Optional[float]=None) -> \
+    tp.Tuple[tp.List[tp.Optional[tp.Tuple[str, str, str, str]]],
+             tp.Optional[int]]:
+  """
+  Retrieve metadata of several files with a single mediainfo call (see
+      "probeFilesJSON") and count bytes read by mediainfo.
+
+  files : List[str]
+    List of files with their full paths.
+
+  parseSpeed : float
+    mediainfo "--ParseSpeed". Defaults to None (mediainfo default).
+
+  Returns:
+    List of Bitrate Type, Bitrate (kbps), song title, song artist :
+        List[Tuple[str, str, str, str]], None for the files which do not
+        contain an Audio Section.
+    Number of bytes read from all the files : int, or None if it is not
+        reported by the system.
+  """
+
+  fileInfoCmd = 'mediainfo' # file info command
+  speedArgs   = [] if parseSpeed is None else [f'--ParseSpeed={parseSpeed}']
+
+  metadata, bytesRead = sf.runCountingReads(
+    [fileInfoCmd, *speedArgs, '--Output=JSON', *files]) # get metadata
+
+  return parseMediainfoOutput(metadata, files), bytesRead
+
+def parseMediainfoOutput(metadata: bytes, files: tp.List[str]) -> \
+    tp.List[tp.Optional[tp.Tuple[str, str, str, str]]]:
+  """
+  Retrieve metadata from "mediainfo --Output=JSON" output of several files.
+
+  metadata : bytes
+    "mediainfo --Output=JSON" output.
+
+  files : List[str]
+    List of the probed files with their full paths.
+
+  Returns:
+    List of Bitrate Type, Bitrate (kbps), song title, song artist :
+        List[Tuple[str, str, str, str]], None for the files which do not
+        contain an Audio Section.
+  """
+
+  try:
+    metadata = json.loads(metadata.decode('utf-8'))
+  except ValueError: # no or broken output
+    metadata = []
+
+  # a single file output is not wrapped into a list
+  if isinstance(metadata, dict):
+    metadata = [metadata]
+
+  # map parsed media to the input files
+  medias = {}
+  for item in metadata:
+    media = item.get('media')
+    if media is not None:
+      medias[media.get('@ref')] = media
+
+  return [parseMediainfoJSON(medias.get(file)) for file in files]
+
+def mapJobs(func        : tp.Callable[[tp.Any], tp.Any],
+            jobs        : tp.List[tp.Any],
+            nWorkers    : int=1,
+            processPool : bool=False) -> tp.List[tp.Any]:
+  """
+  Applies a function to jobs, concurrently if several workers are set.
+
+  func : Callable[[Any], Any]
+    Function applied to each job.
+
+  jobs : List[Any]
+    List of jobs.
+
+  nWorkers : int
+    Number of concurrent workers. Defaults to 1 (run jobs one by one).
+
+  processPool : bool
+    Specifies whether to use a process pool instead of a thread pool.
+    Defaults to False (use a thread pool).
+
+  Returns:
+    List of results in the order of jobs : List[Any].
+  """
+
+  if nWorkers == 1 or len(jobs) < 2: # run serially
+    return list(map(func, jobs))
+
+  # run concurrently, "map" keeps the order of jobs
+  if processPool is True:
+    executor = cfut.ProcessPoolExecutor(nWorkers)
+  else:
+    executor = cfut.ThreadPoolExecutor(nWorkers)
+  with executor:
+    return list(executor.map(func, jobs))
+
+async def probeFileAsync(file      : str,
+                         semaphore : asyncio.Semaphore) -> \
+    tp.Optional[tp.Tuple[str, str, str, str]]:
+  """
+  Retrieve metadata of a single file with mediainfo without blocking
+      the event loop.
+
+  file : str
+    File full name.
+
+  semaphore : asyncio.Semaphore
+    Semaphore limiting the number of concurrent mediainfo calls.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), song title, song artist :
+        Tuple[str, str, str, str], or None if the file does not contain
+        an Audio Section.
+  """
+
+  fileInfoCmd = 'mediainfo' # file info command
+
+  async with semaphore:
+    proc = await asyncio.create_subprocess_exec(
+      fileInfoCmd, file, stdin=asyncio.subprocess.DEVNULL,
+      stdout=asyncio.subprocess.PIPE)
+    metadata, _ = await proc.communicate() # get metadata
+
+  return parseMediainfoText(metadata.decode('utf-8'), file)
+
+async def probeFilesJSONAsync(files     : tp.List[str],
+                              semaphore : asyncio.Semaphore) -> \
+    tp.List[tp.Optional[tp.Tuple[str, str, str, str]]]:
+  """
+  Retrieve metadata of several files with a single mediainfo call without
+      blocking the event loop.
+
+  files : List[str]
+    List of files with their full paths.
+
+  semaphore : asyncio.Semaphore
+    Semaphore limiting the number of concurrent mediainfo calls.
+
+  Returns:
+    List of Bitrate Type, Bitrate (kbps), song title, song artist :
+        List[Tuple[str, str, str, str]], None for the files which do not
+        contain an Audio Section.
+  """
+
+  fileInfoCmd = 'mediainfo' # file info command
+
+  async with semaphore:
+    proc = await asyncio.create_subprocess_exec(
+      fileInfoCmd, '--Output=JSON', *files,
+      stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE)
+    metadata, _ = await proc.communicate() # get metadata
+
+  return parseMediainfoOutput(metadata, files)
+
+async def probeFilesAsync(files     : tp.List[str],
+                          nWorkers  : int=1,
+                          batchSize : tp.Optional[int]=None) -> \
+    tp.List[tp.Optional[tp.Tuple[str, str, str, str]]]:
+  """
+  Retrieve metadata of files with concurrent mediainfo calls driven by
+      the event loop (no worker threads or processes).
+
+  files : List[str]
+    List of files with their full paths.
+
+  nWorkers : int
+    Number of concurrent mediainfo calls.
+    Defaults to 1 (probe files one by one).
+
+  batchSize : int
+    Maximum number of files passed to a single "mediainfo --Output=JSON"
+        call (bounded by the command line length limit).
+    Defaults to None (one mediainfo call per file, text output).
+
+  Returns:
+    List of Bitrate Type, Bitrate (kbps), song title, song artist in the
+        order of files : List[Tuple[str, str, str, str]], None for the files
+        which do not contain an Audio Section.
+  """
+
+  # check "batchSize" argument type and value provided
+  if batchSize is not None:
+    if not isinstance(batchSize, int):
+      raise TypeError('"batchSize" must be an integer ' +
+                      f'("{type(batchSize)}" was provided)!')
+    if batchSize < 1:
+      raise ValueError('"batchSize" must be positive ' +
+                       f'("{batchSize}" was provided)!')
+
+  # check "nWorkers" argument type and value provided
+  if not isinstance(nWorkers, int):
+    raise TypeError('"nWorkers" must be an integer ' +
+                    f'("{type(nWorkers)}" was provided)!')
+  if nWorkers < 1:
+    raise ValueError('"nWorkers" must be positive ' +
+                     f'("{nWorkers}" was provided)!')
+
+  fileInfoCmd = 'mediainfo' # file info command
+  if files != []:
+    sf.cmdInstalled(fileInfoCmd) # check if command is installed
+
+  semaphore = asyncio.Semaphore(nWorkers)
+
+  if batchSize is None: # one call per file
+    return list(await asyncio.gather(*[probeFileAsync(file, semaphore)
+                                       for file in files]))
+
+  # one call per batch
+  batches = splitBatches(files, batchSize,
+                         len(fileInfoCmd) + len('--Output=JSON') + 2)
+  results = await asyncio.gather(*[probeFilesJSONAsync(batch, semaphore)
+                                   for batch in batches])
+
+  return [result for batch in results for result in batch]
+
+def sniffFile(file: str) -> tp.Optional[bool]:
+  """
+  Recognises an audio file by its first bytes (see "sniffAudio").
+
+  file : str
+    File full name.
+
+  Returns:
+    True for an audio file, False for a file without audio, None if
+        the format is not recognised or the file cannot be read :
+        Optional[bool].
+  """
+
+  try:
+    with open(file, 'rb', buffering=0) as f: # read only the bytes needed
+      return hf.sniffAudio(f.read(hf.SNIFF_SIZE))
+  except OSError: # errors are left to the probe
+    return None
+
+def isPlausibleAudio(extension       : str, sniffed: tp.Optional[bool],
+                     allowExtensions : tp.Collection[str]) -> bool:
+  """
+  Decides whether a file should be probed by the result of sniffing.
+
+  extension : str
+    File extension.
+
+  sniffed : bool
+    Result of "sniffFile".
+
+  allowExtensions : Collection[str]
+    Extensions (lowercase) of files probed if their format is not
+        recognised.
+
+  Returns:
+    True if the file may contain audio : bool.
+  """
+
+  if sniffed is None: # unknown format, trust the extension
+    return extension.lower() in allowExtensions
+
+  return sniffed
+
+def getMetadata(files           : tp.List[str],
+                cacheFile       : tp.Optional[str]=None,
+                batchSize       : tp.Optional[int]=None,
+                nWorkers        : int=1,
+                processPool     : bool=False,
+                nativeParser    : bool=False,
+                fileStats       : tp.Optional[tp.List[os.stat_result]]=None,
+                metrics         : tp.Optional[mt.Metrics]=None,
+                prefilter       : bool=False,
+                allowExtensions : tp.Collection[str]=AUDIO_EXTENSIONS,
+                denyExtensions  : tp.Collection[str]=NON_AUDIO_EXTENSIONS,
+                readBudget      : tp.Optional[int]=None) \
+    -> tp.Tuple[tp.List[str], tp.List[str], tp.List[str], tp.List[str]]:
   """
   Retrieve metadata from the list of files.
 
   files : List[str]
     List of files with their full paths.
 
+  cacheFile : str
+    Full name of a persistent metadata cache (SQLite) file. Only new or
+        changed files (by size, modification time and inode) are probed.
+    Defaults to None (do not use a cache).
+
+  batchSize : int
+    Maximum number of files passed to a single "mediainfo --Output=JSON"
+        call (bounded by the command line length limit).
+    Defaults to None (one mediainfo call per file, text output).
+
+  nWorkers : int
+    Number of concurrent probes. Results keep the order of "files".
+    Defaults to 1 (probe files one by one).
+
+  processPool : bool
+    Specifies whether to probe in a process pool instead of a thread pool.
+    Defaults to False (use a thread pool).
+
+  nativeParser : bool
+    Specifies whether to read MP3, FLAC, WAV and Ogg Vorbis headers
+        in-process, mediainfo is only used for other formats.
+    Defaults to False (probe all files with mediainfo).
+
+  fileStats : List[os.stat_result]
+    List of stat information of the files (e.g. from "iterFiles").
+    Defaults to None (stat information is retrieved for each file).
+
+  metrics : Metrics
+    Run metrics collecting time spent in the "prefilter", "cache", "parse"
+        (in-process header parser) and "probe" (mediainfo) stages.
+    Defaults to None (do not collect metrics).
+
+  prefilter : bool
+    Specifies whether to skip files which are not audio before probing
+        them: files with a denied extension are skipped without reading,
+        other new or changed files are recognised by their first bytes,
+        files of an unknown format are probed if their extension is
+        allowed. Skipped files get empty metadata and are not cached.
+    Defaults to False (probe all files).
+
+  allowExtensions : Collection[str]
+    Extensions (lowercase) probed if the format is not recognised.
+    Defaults to "AUDIO_EXTENSIONS".
+
+  denyExtensions : Collection[str]
+    Extensions (lowercase) never probed.
+    Defaults to "NON_AUDIO_EXTENSIONS".
+
+  readBudget : int
+    Maximum number of bytes the header parser reads from a file (blocks of
+        the head, of the audio start and of the tail are read on demand),
+        files needing more are probed by mediainfo. mediainfo is then run
+        with "--ParseSpeed=0" (reads the least of a file). Bytes read
+        per file by the parser and mediainfo are reported to "metrics"
+        (the bytes of a batch are split evenly between its files).
+    Defaults to None (no budget, mediainfo default parse speed).
+
   Returns:
     List of Bitrate Types : List[str].
     List of Bitrates (kbps) : List[str].
@@ -121,115 +840,352 @@ def getMetadata(files: tp.List[str]) -> \
     List of song artists : List[str].
   """
 
-  fileInfoCmd = 'mediainfo'              # file info command
-  sf.cmdInstalled(fileInfoCmd) # check if command is installed
+  # check "batchSize" argument type and value provided
+  if batchSize is not None:
+    if not isinstance(batchSize, int):
+      raise TypeError('"batchSize" must be an integer ' +
+                      f'("{type(batchSize)}" was provided)!')
+    if batchSize < 1:
+      raise ValueError('"batchSize" must be positive ' +
+                       f'("{batchSize}" was provided)!')
+
+  # check "nWorkers" argument type and value provided
+  if not isinstance(nWorkers, int):
+    raise TypeError('"nWorkers" must be an integer ' +
+                    f'("{type(nWorkers)}" was provided)!')
+  if nWorkers < 1:
+    raise ValueError('"nWorkers" must be positive ' +
+                     f'("{nWorkers}" was provided)!')
+
+  # check "processPool" argument type provided
+  if not isinstance(processPool, bool):
+    raise TypeError('"processPool" must be a boolean ' +
+                    f'("{type(processPool)}" was provided)!')
+
+  # check "nativeParser" argument type provided
+  if not isinstance(nativeParser, bool):
+    raise TypeError('"nativeParser" must be a boolean ' +
+                    f'("{type(nativeParser)}" was provided)!')
+
+  # check "prefilter" argument type provided
+  if not isinstance(prefilter, bool):
+    raise TypeError('"prefilter" must be a boolean ' +
+                    f'("{type(prefilter)}" was provided)!')
+
+  # check "readBudget" argument type and value provided
+  if readBudget is not None:
+    if not isinstance(readBudget, int):
+      raise TypeError('"readBudget" must be an integer ' +
+                      f'("{type(readBudget)}" was provided)!')
+    if readBudget < 1:
+      raise ValueError('"readBudget" must be positive ' +
+                       f'("{readBudget}" was provided)!')
+
+  fileInfoCmd = 'mediainfo' # file info command
+  parseSpeed  = None if readBudget is None else 0 # mediainfo parse speed
 
   bitrateType = []
   kbps        = []
   title       = []
   artist      = []
 
-  # keywords to find appropriate info
-  keyAudio       = 'audio' # used to check if it is an audio
-  keyBitrateType = 'bit.rate mode'
-  keykbps        = 'bit.rate'
-  keykbpsUnit    = 'kb.s'
-  keyTitle       = 'track name'
-  keyArtist      = 'performer'
+  # open metadata cache
+  connection = None
+  if cacheFile is not None:
+    connection = cf.openMetadataCache(cacheFile)
 
-  nNP = 0 # count not processed files
+  # check if the files exist
+  if fileStats is None:
+    for file in files:
+      fileCheck(file)
+    if connection is not None:
+      fileStats = [os.stat(file) for file in files]
+
+  # measure stages if metrics are collected
+  def stage(name: str) -> tp.ContextManager[None]:
+    return contextlib.nullcontext() if metrics is None else \
+        metrics.stage(name)
+
+  metadata = [None]*len(files)
+  skipped  = set() # indices of files which are not audio by the prefilter
+  noAudio  = (False, '', '', '', '')
+
+  # skip files with a denied extension without reading them
+  extensions = getFileExtension([os.path.basename(file) for file in files])
+  if prefilter is True:
+    for i, extension in enumerate(extensions):
+      if extension.lower() in denyExtensions:
+        metadata[i] = noAudio
+        skipped.add(i)
+
+  # get cached metadata of unchanged files
+  if connection is not None:
+    with stage('cache'):
+      for i in range(len(files)):
+        if i not in skipped:
+          metadata[i] = cf.getCachedMetadata(connection, files[i],
+                                             fileStats[i])
+
+  notCached = [i for i in range(len(files)) if metadata[i] is None]
+
+  # recognise new or changed files which are not audio by their first bytes
+  if prefilter is True:
+    with stage('prefilter'):
+      sniffed = mapJobs(sniffFile, [files[i] for i in notCached], nWorkers,
+                        processPool)
+    for i, result in zip(notCached, sniffed):
+      if not isPlausibleAudio(extensions[i], result, allowExtensions):
+        metadata[i] = noAudio
+        skipped.add(i)
+    notCached = [i for i in notCached if i not in skipped]
+
+  # count bytes read by probes
+  def addBytesRead(i: int, nBytes: tp.Optional[int]) -> None:
+    if metrics is not None:
+      metrics.addBytesRead(files[i], nBytes)
+
+  # parse headers of supported formats in-process
+  notProbed = notCached
+  if nativeParser is True:
+    parse = functools.partial(hf.parseHeaderBounded, readBudget=readBudget)
+    with stage('parse'):
+      results = mapJobs(parse, [files[i] for i in notCached], nWorkers,
+                        processPool)
+    for i, (result, nBytes) in zip(notCached, results):
+      addBytesRead(i, nBytes)
+      if result is not None:
+        metadata[i] = (True, *result)
+    notProbed = [i for i in notCached if metadata[i] is None]
+
+  # probe other new or changed files
+  if notProbed != []:
+    sf.cmdInstalled(fileInfoCmd) # check if command is installed
+
+  if batchSize is None: # one call per file
+    probe = functools.partial(probeFileCounted, parseSpeed=parseSpeed)
+    jobs  = [files[i] for i in notProbed]
+  else: # one call per batch
+    probe = functools.partial(probeFilesJSONCounted, parseSpeed=parseSpeed)
+    jobs  = splitBatches([files[i] for i in notProbed], batchSize,
+                         len(fileInfoCmd) + len('--Output=JSON') + 2 +
+                         len('--ParseSpeed=0') + 1)
+
+  with stage('probe'):
+    results = mapJobs(probe, jobs, nWorkers, processPool)
+
+  if batchSize is None:
+    nBytes  = [result[1] for result in results]
+    results = [result[0] for result in results]
+  else: # flatten batch results
+    nBytes  = [None if bytesRead is None else bytesRead // len(batch)
+               for batch, (_, bytesRead) in zip(jobs, results)
+               for _ in batch]
+    results = [result for batch in results for result in batch[0]]
+
+  for i, bytesRead in zip(notProbed, nBytes):
+    addBytesRead(i, bytesRead)
+
+  for i, result in zip(notProbed, results):
+    if result is None:
+      metadata[i] = (False, '', '', '', '')
+    else:
+      metadata[i] = (True, *result)
 
-  for file in files:
-    fileCheck(file) # check if the file exists
-    metadata = sp.run([fileInfoCmd, file], stdout=sp.PIPE) # get metadata
-    metadata = metadata.stdout.decode('utf-8')
+  # store metadata of new or changed files
+  if connection is not None:
+    with stage('cache'):
+      for i in notCached:
+        cf.putCachedMetadata(connection, files[i], fileStats[i],
+                             metadata[i])
+      connection.commit()
+    connection.close()
 
-    # metadata output contains file name which can contain keywords that
-    # that the script looks for
-    metadata = metadata.replace(file, '')
+  nNP = 0 # count not processed files
 
-    if keyAudio not in metadata.lower(): # if not an audio file
+  for i, (file, result) in enumerate(zip(files, metadata)):
+    if result[0] is False and i not in skipped: # if not an audio file
       nNP += 1
       print(f'{(str(nNP)+":").ljust(5)} "{file}" does not contain' +
             ' an Audio Section!')
 
-      bitrateType.append('')
-      kbps.append('')
-      title.append('')
-      artist.append('')
-
-    else: # if an audio file
-      # get Audio section
-      audioMetadata = metadata[re.search(f'^{keyAudio}$', metadata,
-                      flags=re.MULTILINE | re.IGNORECASE).start():]
-
-      # get bitrate mode
-      result = re.findall(rf'^.*{keyBitrateType}.*$', audioMetadata,
-                          flags=re.MULTILINE | re.IGNORECASE)
-      if result != []:
-        result = result[0]
-        result = re.findall(r":.*", result)[0]
-        result = result[1:].strip()
-        bitrateType.append(result)
-      else:
-        bitrateType.append('')
-
-      # get kbps
-      result = re.findall(rf'^.*{keykbps}.*$', audioMetadata,
-                          flags=re.MULTILINE | re.IGNORECASE)
-
-      # remove bitrate type results
-      recomp = re.compile(rf'^(?!{keyBitrateType})', flags=re.IGNORECASE)
-      result = list(filter(recomp.match, result))
-      del recomp
-
-      if result != []:
-        result = result[0]
-        result = re.findall(rf'\d+[ ,]?\d*[.,]?\d*(?= {keykbpsUnit}$)',
-                            result)[0]
-        result = result.replace(' ', '')
-        kbps.append(result)
-      else:
-        kbps.append('')
-
-      # get track name
-      result = re.findall(rf'^{keyTitle} .*$', metadata,
-                          flags=re.MULTILINE | re.IGNORECASE)
-      if result != []:
-        result = result[0]
-        result = re.findall(r'(?<=: ).*$', result,
-                            flags=re.MULTILINE | re.IGNORECASE)[0]
-        title.append(result)
-      else:
-        title.append('')
-
-      # get artist
-      result = re.findall(rf'^{keyArtist}.*$', metadata,
-                          flags=re.MULTILINE | re.IGNORECASE)
-      if result != []:
-        result = result[0]
-        result = re.findall(r'(?<=: ).*$', result,
-                            flags=re.MULTILINE | re.IGNORECASE)[0]
-        artist.append(result)
-      else:
-        artist.append('')
+    bitrateType.append(result[1])
+    kbps.append(result[2])
+    title.append(result[3])
+    artist.append(result[4])
 
   return bitrateType, kbps, title, artist
 
-def getFileSize(files: tp.List[str]) -> tp.List[int]:
+def iterFileData(entries   : tp.Iterable[tp.Tuple[str, str, os.stat_result]],
+                 chunkSize : int=1000,
+                 **kwargs) -> \
+    tp.Iterator[tp.Tuple[str, str, str, str, str, str, str, int]]:
+  """
+  Enriches file entries with metadata chunk by chunk.
+
+  entries : Iterable[Tuple[str, str, os.stat_result]]
+    File name, full path to the file, stat information of the file
+        (e.g. from "iterFiles").
+
+  chunkSize : int
+    Number of files probed together. Defaults to 1000.
+
+  kwargs
+    "getMetadata" keyword arguments. Processed files and bytes are
+        reported to "metrics" chunk by chunk.
+
+  Yields:
+    File full name, file name, extension, Bitrate Type, Bitrate (kbps),
+        song title, song artist, file size in bytes :
+        Tuple[str, str, str, str, str, str, str, int].
+  """
+
+  # check "chunkSize" argument type and value provided
+  if not isinstance(chunkSize, int):
+    raise TypeError('"chunkSize" must be an integer ' +
+                    f'("{type(chunkSize)}" was provided)!')
+  if chunkSize < 1:
+    raise ValueError('"chunkSize" must be positive ' +
+                     f'("{chunkSize}" was provided)!')
+
+  for chunk in iterChunks(entries, chunkSize):
+    fileName  = [entry[0] for entry in chunk]
+    fullName  = [entry[1] for entry in chunk]
+    fileStats = [entry[2] for entry in chunk]
+
+    bitrateType, kbps, title, artist = \
+        getMetadata(fullName, fileStats=fileStats, **kwargs) # get metadata
+
+    fileSize   = getFileSize(fullName, fileStats) # get the size of the files
+    extensions = getFileExtension(fileName)       # get files extensions
+
+    if kwargs.get('metrics') is not None: # update progress
+      kwargs['metrics'].progress(len(chunk), sum(fileSize))
+
+    yield from zip(fullName, fileName, extensions, bitrateType, kbps, title,
+                   artist, fileSize)
+
+def statFile(path: str) -> tp.Optional[os.stat_result]:
+  """
+  Gets stat information of a file.
+
+  path : str
+    File full name.
+
+  Returns:
+    Stat information : os.stat_result, or None if the file does not exist.
+  """
+
+  try:
+    return os.stat(path)
+  except OSError:
+    return None
+
+def hashChunk(job: tp.Tuple[str, int, int]) -> tp.Optional[bytes]:
+  """
+  Hashes a part of a file.
+
+  job : Tuple[str, int, int]
+    File full name, part offset and part size in bytes.
+
+  Returns:
+    Part digest : bytes, or None if the file cannot be read.
+  """
+
+  file, offset, size = job
+
+  digest = hashlib.blake2b(digest_size=32)
+  try:
+    with open(file, 'rb') as f:
+      f.seek(offset)
+      while size > 0:
+        data = f.read(min(size, 1 << 20))
+        if data == b'': # truncated meanwhile
+          return None
+        digest.update(data) # releases the GIL, so threads hash in parallel
+        size -= len(data)
+  except OSError:
+    return None
+
+  return digest.digest()
+
+def hashFiles(files     : tp.List[str],
+              nWorkers  : int=1,
+              chunkSize : int=HASH_CHUNK_SIZE) -> tp.List[tp.Optional[str]]:
+  """
+  Hashes file contents (BLAKE2b of the digests of file parts): parts of
+      all files are hashed concurrently, so a few large files are hashed by
+      all workers as well.
+
+  files : List[str]
+    List of files with their full paths.
+
+  nWorkers : int
+    Number of concurrent workers (threads). Defaults to 1.
+
+  chunkSize : int
+    File part size in bytes. Defaults to "HASH_CHUNK_SIZE".
+
+  Returns:
+    List of the file hashes (hexadecimal), None if a file cannot be read :
+        List[Optional[str]].
+  """
+
+  # check "chunkSize" argument type and value provided
+  if not isinstance(chunkSize, int):
+    raise TypeError('"chunkSize" must be an integer ' +
+                    f'("{type(chunkSize)}" was provided)!')
+  if chunkSize < 1:
+    raise ValueError('"chunkSize" must be positive ' +
+                     f'("{chunkSize}" was provided)!')
+
+  sizes = [statFile(file) for file in files]
+  sizes = [fileStat.st_size if fileStat is not None else None
+           for fileStat in sizes]
+
+  jobs  = [] # file part jobs
+  parts = [] # number of parts of each file
+  for file, size in zip(files, sizes):
+    offsets = range(0, size, chunkSize) if size is not None else range(0)
+    jobs.extend((file, offset, min(chunkSize, size - offset))
+                for offset in offsets)
+    parts.append(len(offsets))
+
+  digests = iter(mapJobs(hashChunk, jobs, nWorkers))
+
+  hashes = []
+  for size, nParts in zip(sizes, parts):
+    fileDigests = list(itertools.islice(digests, nParts))
+    if size is None or None in fileDigests:
+      hashes.append(None)
+      continue
+    digest = hashlib.blake2b(size.to_bytes(8, 'little'), digest_size=32)
+    for fileDigest in fileDigests:
+      digest.update(fileDigest)
+    hashes.append(digest.hexdigest())
+
+  return hashes
+
+def getFileSize(files     : tp.List[str],
+                fileStats : tp.Optional[tp.List[os.stat_result]]=None) -> \
+    tp.List[int]:
   """
   Get file size in bytes.
 
   files : List[str]
     List of files with their full paths.
 
+  fileStats : List[os.stat_result]
+    List of stat information of the files (e.g. from "iterFiles").
+    Defaults to None (stat information is retrieved for each file).
+
   Returns:
     List of the file size in bytes : List[int].
   """
 
-  sizeBytes = []
-  for file in files:
-    sizeBytes.append(os.stat(file).st_size)
+  if fileStats is None:
+    fileStats = [os.stat(file) for file in files]
+
+  sizeBytes = [fileStat.st_size for fileStat in fileStats]
 
   return sizeBytes
 
@@ -301,10 +1257,48 @@ def writeData(rootFolder   : str,
   Returns None.
   """
 
+  rows = zip(fullNames, fileNames, extensions, bitrateTypes, kbps, titles,
+             artists, sizeBytes) # join info into rows
+  writeDataRows(rootFolder, rows, folderOut)
+
+  return None
+
+def writeDataRows(rootFolder : str,
+                  rows       : tp.Iterable[tp.Tuple[str, str, str, str, str,
+                                                    str, str, int]],
+                  folderOut  : str,
+                  flushEvery : int=1000,
+                  metrics    : tp.Optional[mt.Metrics]=None) -> str:
+  """
+  Write file data into a CSV file as the rows arrive.
+
+  rootFolder : str
+    A root folder
+
+  rows : Iterable[Tuple[str, str, str, str, str, str, str, int]]
+    Rows of file full name, file name, extension, Bitrate Type,
+        Bitrate (kbps), song title, song artist, file size in bytes.
+
+  folderOut : str
+    The folder to which save the output CSV file.
+
+  flushEvery : int
+    Number of rows after which the written rows are flushed to disk.
+    Defaults to 1000.
+
+  metrics : Metrics
+    Run metrics collecting time spent in the "csvWrite" stage.
+    Defaults to None (do not collect metrics).
+
+  Returns:
+    Output CSV file full name : str.
+  """
+
   outFileName = 'out' + sf.getTimeStamp() + '.csv'
+  outFullName = os.path.join(folderOut, outFileName)
 
   # write data to the file
-  with open(os.path.join(folderOut, outFileName), mode='w') as outcsv:
+  with open(outFullName, mode='w') as outcsv:
     writer = csv.writer(outcsv, dialect='excel')
 
     # write a header
@@ -313,19 +1307,15 @@ def writeData(rootFolder   : str,
                      'Size, bytes', 'File Name (no extension, new)',
                      'Title (new)', 'Artist (new)'])
 
-    for i in range(len(fileNames)):
-      row = [] # join info into a row
-      row.append(fullNames[i])
-      row.append(fileNames[i])
-      row.append(extensions[i])
-      row.append(bitrateTypes[i])
-      row.append(kbps[i])
-      row.append(titles[i])
-      row.append(artists[i])
-      row.append(sizeBytes[i])
-      row.extend(['']*3)
+    for i, row in enumerate(rows):
+      start = time.perf_counter()
+      writer.writerow([*row, *['']*3])
 
-      writer.writerow(row)
+      # partial results are kept on disk if the scan fails
+      if (i + 1) % flushEvery == 0:
+        outcsv.flush()
 
-  return None
+      if metrics is not None:
+        metrics.addStageTime('csvWrite', time.perf_counter() - start)
 
+  return outFullName
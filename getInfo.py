@@ -1,7 +1,23 @@
+import os
+import time
+import typing as tp
+
+import cacheFunctions as cf
 import fileFunctions as ff
+import metricFunctions as mt
 import sysFunctions as sf
 
-def getInfo(folderIn: str, folderOut: str) -> int:
+def getInfo(folderIn        : str, folderOut : str,
+            cacheFile       : tp.Optional[str]='',
+            batchSize       : tp.Optional[int]=None,
+            nWorkers        : tp.Optional[int]=None,
+            nativeParser    : bool=False,
+            chunkSize       : int=1000,
+            metricsFile     : tp.Optional[str]='',
+            prefilter       : bool=True,
+            allowExtensions : tp.Collection[str]=ff.AUDIO_EXTENSIONS,
+            denyExtensions  : tp.Collection[str]=ff.NON_AUDIO_EXTENSIONS,
+            readBudget      : tp.Optional[int]=None) -> int:
   """
   Gets file info and writes it to a file.
 
@@ -11,6 +27,58 @@ def getInfo(folderIn: str, folderOut: str) -> int:
   folderOut: str
     Folder to which an output file is written.
 
+  cacheFile : str
+    Full name of a persistent metadata cache (SQLite) file. Only new or
+        changed files are probed, entries of deleted files are evicted.
+    Defaults to '' ("metadata.sqlite" in "folderOut"),
+        None disables the cache.
+
+  batchSize : int
+    Maximum number of files probed by a single mediainfo call.
+    Defaults to None (one mediainfo call per file).
+
+  nWorkers : int
+    Number of concurrent probes.
+    Defaults to None (number of CPU physical cores).
+
+  nativeParser : bool
+    Specifies whether to read MP3, FLAC, WAV and Ogg Vorbis headers
+        in-process instead of running mediainfo.
+    Defaults to False (probe all files with mediainfo).
+
+  chunkSize : int
+    Number of files probed and written to the output file together.
+    Files are streamed from the folder listing to the output file,
+        so memory use does not depend on the number of files.
+    Defaults to 1000.
+
+  metricsFile : str
+    Full name of a JSON file to which time spent in the "walk",
+        "prefilter", "cache", "parse", "probe" and "csvWrite" stages and
+        throughput are written.
+    Defaults to '' ("metrics_<timestamp>.json" in "folderOut"),
+        None disables the file (progress is still printed).
+
+  prefilter : bool
+    Specifies whether to skip files which are not audio (cover images,
+        CUE sheets, logs, playlists) by extension and first bytes instead
+        of probing them. Their rows are written with empty metadata.
+    Defaults to True.
+
+  allowExtensions : Collection[str]
+    Extensions (lowercase) probed if the format is not recognised.
+    Defaults to "fileFunctions.AUDIO_EXTENSIONS".
+
+  denyExtensions : Collection[str]
+    Extensions (lowercase) never probed.
+    Defaults to "fileFunctions.NON_AUDIO_EXTENSIONS".
+
+  readBudget : int
+    Maximum number of bytes the header parser reads from a file, mediainfo
+        reads the least of a file (see "fileFunctions.getMetadata"). Bytes
+        read per file are written to the metrics ("bytesRead" value).
+    Defaults to None (no budget).
+
   Returns 0.
   """
 
@@ -18,16 +86,48 @@ def getInfo(folderIn: str, folderOut: str) -> int:
   ff.dirCheck(folderIn)    # check "folderIn" correctness
   ff.dirCheck(folderOut)   # check "folderOut" correctness
 
-  fileName, fullName = ff.listFiles(folderIn, True) # list files in directory
+  # set a default cache file next to the output CSV file
+  if cacheFile == '':
+    cacheFile = os.path.join(folderOut, 'metadata.sqlite')
+
+  # set number of concurrent probes
+  if nWorkers is None:
+    nWorkers = sf.nPhysicalCores()
+
+  # set a default metrics file next to the output CSV file
+  if metricsFile == '':
+    metricsFile = os.path.join(folderOut,
+                               'metrics' + sf.getTimeStamp() + '.json')
+
+  # the number of files is unknown while streaming, so no ETA is shown
+  metrics = mt.Metrics(recordFiles=False)
 
-  bitrateType, kbps, title, artist = \
-      ff.getMetadata(fullName) # get metadata from filelist
+  scanStart = time.time_ns() # entries not seen since then are stale
 
-  fileSize   = ff.getFileSize(fullName)      # get the size of the files
-  extensions = ff.getFileExtension(fileName) # get files extensions
+  # list files in directory
+  entries = mt.timedIter(ff.iterFiles(folderIn, True), metrics, 'walk')
 
-  ff.writeData(folderIn, fullName, fileName, extensions, bitrateType, kbps,
-               title, artist, fileSize, folderOut) # write data to a file
+  # get metadata from filelist chunk by chunk
+  rows = ff.iterFileData(entries, chunkSize, cacheFile=cacheFile,
+                         batchSize=batchSize, nWorkers=nWorkers,
+                         nativeParser=nativeParser, metrics=metrics,
+                         prefilter=prefilter,
+                         allowExtensions=allowExtensions,
+                         denyExtensions=denyExtensions,
+                         readBudget=readBudget)
+
+  # write data to a file as it arrives
+  ff.writeDataRows(folderIn, rows, folderOut, chunkSize, metrics)
+  metrics.finish()
+
+  # evict cache entries of deleted files
+  if cacheFile is not None:
+    connection = cf.openMetadataCache(cacheFile)
+    cf.evictCachedMetadata(connection, folderIn, scanStart)
+    connection.close()
+
+  if metricsFile is not None:
+    metrics.writeJSON(metricsFile)
 
   return 0
 
@@ -35,4 +135,3 @@ if __name__ == '__main__':
   folder = r'/mnt/Internal_HDD/0_FROM_EXTERNAL/music/'
   out    = r'/home/linux/Downloads/convert/'
   print(getInfo(folder, out))
-
@@ -0,0 +1,798 @@
+import codecs
+import os
+import struct
+import typing as tp
+
+# MPEG audio bitrates, kbps: [MPEG-1 / MPEG-2(.5)][layer] -> bitrate index
+MPEG_BITRATES = {
+  (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384,
+           416, 448],
+  (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320,
+           384],
+  (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256,
+           320],
+  (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224,
+           256],
+  (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+  (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# MPEG audio sampling rates, Hz: version bits -> sampling rate index
+MPEG_SAMPLE_RATES = {
+  3: [44100, 48000, 32000], # MPEG-1
+  2: [22050, 24000, 16000], # MPEG-2
+  0: [11025, 12000, 8000],  # MPEG-2.5
+}
+
+# WAV format tags of uncompressed audio (PCM, IEEE float, extensible)
+WAV_PCM_FORMATS = (0x0001, 0x0003, 0xFFFE)
+
+HEAD_SIZE = 65536 # maximum number of bytes read from a header region
+
+SNIFF_SIZE = 64 # number of bytes read to recognise a file format
+
+READ_BLOCK_SIZE = 16384 # unit of reads of header parsers
+
+# signatures (offset, bytes) of audio files and containers with audio
+AUDIO_SIGNATURES = (
+  (0, b'ID3'), (0, b'fLaC'), (0, b'OggS'), (0, b'MAC '), (0, b'wvpk'),
+  (0, b'MPCK'), (0, b'MP+'), (0, b'TTA1'), (0, b'tBaK'), (0, b'OFR '),
+  (0, b'\x1aE\xdf\xa3'), (4, b'ftyp'), (0, b'#!AMR'), (0, b'.snd'),
+  (0, b'caff'), (0, b'DSD '), (0, b'FRM8'), (0, b'.ra\xfd'), (0, b'.RMF'),
+  (0, b'FLV'), (0, b'\x00\x00\x01\xba'), (0, b'\x00\x00\x01\xb3'),
+  (0, b'0&\xb2u\x8ef\xcf\x11'), (0, b'Creative Voice File'),
+  (0, b'riff.\x91\xcf\x11'), (0, b'\x0bw'),
+)
+
+# signatures (offset, bytes) of common files without audio
+OTHER_SIGNATURES = (
+  (0, b'\xff\xd8\xff'), (0, b'\x89PNG'), (0, b'GIF8'), (0, b'%PDF'),
+  (0, b'PK\x03\x04'), (0, b'Rar!'), (0, b'7z\xbc\xaf'), (0, b'\x1f\x8b'),
+  (0, b'\x7fELF'), (0, b'MZ'), (0, b'II*\x00'), (0, b'MM\x00*'),
+  (0, b'SQLite format 3'), (0, b'\xd0\xcf\x11\xe0'), (0, b'<?xml'),
+)
+
+class BoundedReader:
+  """
+  Read-only binary file for header parsers: whole blocks are read on demand
+      (consecutive missing blocks by a single read) and kept, so bytes read
+      from storage are counted and can be limited by a budget.
+
+  raw : BinaryIO
+    File opened in binary mode without buffering.
+
+  size : int
+    File size in bytes.
+
+  budget : int
+    Maximum number of bytes read, reads exceeding it raise ValueError.
+    Defaults to None (no budget).
+
+  blockSize : int
+    Read unit in bytes. Defaults to "READ_BLOCK_SIZE".
+  """
+
+  def __init__(self, raw       : tp.BinaryIO, size: int,
+                     budget    : tp.Optional[int]=None,
+                     blockSize : int=READ_BLOCK_SIZE) -> None:
+    self.raw       = raw
+    self.size      = size
+    self.budget    = budget
+    self.blockSize = blockSize
+
+    self.blocks    = {} # block index -> block data
+    self.pos       = 0  # current position
+    self.bytesRead = 0  # bytes read from the file
+
+  def tell(self) -> int:
+    return self.pos
+
+  def seek(self, offset: int, whence: int=os.SEEK_SET) -> int:
+    if whence == os.SEEK_CUR:
+      offset += self.pos
+    elif whence == os.SEEK_END:
+      offset += self.size
+    if offset < 0:
+      raise ValueError('Negative seek position!')
+    self.pos = offset
+
+    return offset
+
+  def fetch(self, first: int, last: int) -> None:
+    """
+    Reads blocks from the file.
+
+    first, last : int
+      Indices of the first and the last block.
+
+    Returns None.
+    """
+
+    start  = first * self.blockSize
+    length = min((last + 1) * self.blockSize, self.size) - start
+    if self.budget is not None and self.bytesRead + length > self.budget:
+      raise ValueError('Read budget exceeded!')
+
+    self.raw.seek(start)
+    chunks = []
+    while length > 0:
+      chunk = self.raw.read(length)
+      if not chunk: # truncated meanwhile
+        break
+      chunks.append(chunk)
+      length -= len(chunk)
+    data = b''.join(chunks)
+    self.bytesRead += len(data)
+
+    for k in range(first, last + 1):
+      offset = (k - first) * self.blockSize
+      self.blocks[k] = data[offset:offset+self.blockSize]
+
+    return None
+
+  def read(self, n: int=-1) -> bytes:
+    end = self.size if n < 0 else min(self.pos + n, self.size)
+    if end <= self.pos:
+      return b''
+
+    first = self.pos // self.blockSize
+    last  = (end - 1) // self.blockSize
+
+    # read runs of missing blocks
+    run = None
+    for k in range(first, last + 2):
+      if k <= last and k not in self.blocks:
+        run = k if run is None else run
+      elif run is not None:
+        self.fetch(run, k - 1)
+        run = None
+
+    data   = b''.join(self.blocks[k] for k in range(first, last + 1))
+    offset = self.pos - first * self.blockSize
+    data   = data[offset:offset+end-self.pos]
+    self.pos += len(data)
+
+    return data
+
+def formatkbps(bps: float) -> str:
+  """
+  Formats a bitrate in kbps like mediainfo does.
+
+  bps : float
+    Bitrate, bits per second.
+
+  Returns:
+    Bitrate (kbps) : str.
+  """
+  return f'{bps/1000:.1f}'.rstrip('0').rstrip('.')
+
+def decodeID3Text(data: bytes) -> str:
+  """
+  Decodes an ID3v2 text frame.
+
+  data : bytes
+    Text frame content (encoding byte and text).
+
+  Returns:
+    Decoded text, multiple values are joined with " / " : str.
+  """
+
+  if data == b'':
+    return ''
+
+  encodings = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}
+  encoding  = encodings.get(data[0], 'latin-1')
+  text      = data[1:].decode(encoding, errors='replace')
+
+  # values are separated by null characters
+  values = [value for value in text.split('\x00') if value != '']
+
+  return ' / '.join(values)
+
+def parseID3v2(f: tp.BinaryIO) -> tp.Tuple[int, tp.Dict[str, str]]:
+  """
+  Parses an ID3v2 tag at the current position of a file.
+
+  f : BinaryIO
+    File opened in binary mode.
+
+  Returns:
+    Audio data offset (tag size, 0 if there is no tag) : int.
+    Title and artist found in the tag : Dict[str, str].
+  """
+
+  start  = f.tell()
+  header = f.read(10)
+  if len(header) < 10 or header[:3] != b'ID3' or header[3] > 4:
+    f.seek(start)
+    return 0, {}
+
+  version = header[3]
+  flags   = header[5]
+  tagSize = ((header[6] & 0x7F) << 21 | (header[7] & 0x7F) << 14 |
+             (header[8] & 0x7F) << 7 | (header[9] & 0x7F))
+  tagEnd  = start + 10 + tagSize + (10 if flags & 0x10 else 0) # footer
+
+  # read frames (the tag may contain large pictures, read only its head)
+  data = f.read(min(tagSize, HEAD_SIZE))
+  if flags & 0x80 and version < 4: # tag level unsynchronisation
+    data = data.replace(b'\xff\x00', b'\xff')
+  if flags & 0x40 and version > 2 and len(data) >= 4: # extended header
+    extSize = struct.unpack('>I', data[:4])[0]
+    if version == 4:
+      extSize = ((extSize >> 3 & 0xFE00000) | (extSize >> 2 & 0x1FC000) |
+                 (extSize >> 1 & 0x3F80) | (extSize & 0x7F))
+    else:
+      extSize += 4 # size does not include itself
+    data = data[extSize:]
+
+  # frame identifiers of title and artist
+  if version == 2:
+    frameIds = {b'TT2': 'title', b'TP1': 'artist'}
+  else:
+    frameIds = {b'TIT2': 'title', b'TPE1': 'artist'}
+  idLength = 3 if version == 2 else 4
+  hdLength = 6 if version == 2 else 10
+
+  tags = {}
+  pos  = 0
+  while pos + hdLength <= len(data) and len(tags) < len(frameIds):
+    frameId = data[pos:pos+idLength]
+    if frameId[:1] == b'\x00': # padding
+      break
+
+    if version == 2:
+      frameSize = int.from_bytes(data[pos+3:pos+6], 'big')
+    elif version == 3:
+      frameSize = struct.unpack('>I', data[pos+4:pos+8])[0]
+    else: # synchsafe integer
+      b = data[pos+4:pos+8]
+      frameSize = ((b[0] & 0x7F) << 21 | (b[1] & 0x7F) << 14 |
+                   (b[2] & 0x7F) << 7 | (b[3] & 0x7F))
+
+    frameData = data[pos+hdLength:pos+hdLength+frameSize]
+    if frameId in frameIds and len(frameData) == frameSize:
+      if version == 4 and data[pos+9] & 0x02: # frame unsynchronisation
+        frameData = frameData.replace(b'\xff\x00', b'\xff')
+      if version < 4 or data[pos+9] & 0x0D == 0: # not compressed etc.
+        tags[frameIds[frameId]] = decodeID3Text(frameData)
+
+    pos += hdLength + frameSize
+
+  f.seek(tagEnd)
+
+  return tagEnd, tags
+
+def parseID3v1(f: tp.BinaryIO) -> tp.Dict[str, str]:
+  """
+  Parses an ID3v1 tag at the end of a file.
+
+  f : BinaryIO
+    File opened in binary mode.
+
+  Returns:
+    Title and artist found in the tag : Dict[str, str].
+  """
+
+  f.seek(0, os.SEEK_END)
+  if f.tell() < 128:
+    return {}
+
+  f.seek(-128, os.SEEK_END)
+  data = f.read(128)
+  if data[:3] != b'TAG':
+    return {}
+
+  tags = {}
+  for key, field in (('title', data[3:33]), ('artist', data[33:63])):
+    value = field.split(b'\x00')[0].decode('latin-1').strip()
+    if value != '':
+      tags[key] = value
+
+  return tags
+
+def parseMPEGFrame(header: bytes) -> tp.Optional[tp.Dict[str, int]]:
+  """
+  Parses an MPEG audio frame header.
+
+  header : bytes
+    First 4 bytes of a frame.
+
+  Returns:
+    Frame parameters : Dict[str, int], or None if the header is invalid.
+  """
+
+  if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+    return None
+
+  versionBits  = header[1] >> 3 & 0x03
+  layerBits    = header[1] >> 1 & 0x03
+  bitrateIdx   = header[2] >> 4
+  sampleIdx    = header[2] >> 2 & 0x03
+  padding      = header[2] >> 1 & 0x01
+  channelMode  = header[3] >> 6
+
+  # reserved or unsupported values
+  if versionBits == 1 or layerBits == 0 or bitrateIdx in (0, 15) or \
+      sampleIdx == 3:
+    return None
+
+  version    = 1 if versionBits == 3 else 2
+  layer      = 4 - layerBits
+  bitrate    = MPEG_BITRATES[(version, layer)][bitrateIdx]
+  sampleRate = MPEG_SAMPLE_RATES[versionBits][sampleIdx]
+
+  # samples per frame and frame length, bytes
+  if layer == 1:
+    samples = 384
+    length  = (12 * bitrate * 1000 // sampleRate + padding) * 4
+  elif layer == 2 or version == 1:
+    samples = 1152
+    length  = 144 * bitrate * 1000 // sampleRate + padding
+  else:
+    samples = 576
+    length  = 72 * bitrate * 1000 // sampleRate + padding
+
+  return {'version': version, 'layer': layer, 'bitrate': bitrate,
+          'sampleRate': sampleRate, 'samples': samples, 'length': length,
+          'mono': int(channelMode == 3)}
+
+def findMPEGFrame(data: bytes) -> \
+    tp.Tuple[int, tp.Optional[tp.Dict[str, int]]]:
+  """
+  Finds the first MPEG audio frame confirmed by the following frame.
+
+  data : bytes
+    Head of the audio data.
+
+  Returns:
+    Frame offset in data (-1 if not found) : int.
+    Frame parameters (see "parseMPEGFrame") : Dict[str, int],
+        or None if no valid frame is found.
+  """
+
+  pos = data.find(b'\xff')
+  while -1 < pos < len(data) - 4:
+    frame = parseMPEGFrame(data[pos:pos+4])
+    if frame is not None:
+      nextPos = pos + frame['length']
+      if nextPos + 4 > len(data) or \
+          parseMPEGFrame(data[nextPos:nextPos+4]) is not None:
+        return pos, frame
+    pos = data.find(b'\xff', pos+1)
+
+  return -1, None
+
+def sniffAudio(head: bytes) -> tp.Optional[bool]:
+  """
+  Recognises audio files by their first bytes.
+
+  head : bytes
+    First "SNIFF_SIZE" bytes of a file.
+
+  Returns:
+    True for an audio file (or a container which may contain audio),
+        False for an empty file, a known format without audio or a text
+        file (e.g. CUE sheets, logs, playlists), None if the format is not
+        recognised : Optional[bool].
+  """
+
+  if head == b'':
+    return False
+
+  for offset, signature in AUDIO_SIGNATURES:
+    if head[offset:offset+len(signature)] == signature:
+      return True
+
+  if head[:4] == b'RIFF': # WAV, AVI, MP3 in RIFF or WebP and other data
+    return head[8:12] in (b'WAVE', b'AVI ', b'RMP3')
+  if head[:4] == b'FORM': # AIFF or IFF images and other data
+    return head[8:12] in (b'AIFF', b'AIFC')
+
+  # UTF-16 text (its byte order mark looks like an MPEG frame sync)
+  if head[:2] in (b'\xff\xfe', b'\xfe\xff'):
+    return False
+
+  # MPEG audio or AAC ADTS frame
+  if parseMPEGFrame(head[:4]) is not None or \
+      (head[0] == 0xFF and head[1:2] != b'' and head[1] & 0xF6 == 0xF0):
+    return True
+
+  for offset, signature in OTHER_SIGNATURES:
+    if head[offset:offset+len(signature)] == signature:
+      return False
+
+  # text files (the head may end within a UTF-8 character)
+  text = head[3:] if head[:3] == b'\xef\xbb\xbf' else head
+  try:
+    text = codecs.getincrementaldecoder('utf-8')().decode(text)
+  except UnicodeDecodeError: # binary data
+    return None
+  if all(char.isprintable() or char in '\t\r\n' for char in text):
+    return False
+
+  return None
+
+def parseMPEG(f: tp.BinaryIO, audioStart: int, fileSize: int) -> \
+    tp.Optional[tp.Tuple[str, str]]:
+  """
+  Gets the bitrate of an MPEG audio stream from its first frame
+      and a Xing/Info or VBRI header.
+
+  f : BinaryIO
+    File opened in binary mode.
+
+  audioStart : int
+    Offset of the audio data.
+
+  fileSize : int
+    File size, bytes.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps) : Tuple[str, str],
+        or None if no valid frame is found.
+  """
+
+  f.seek(audioStart)
+  data = f.read(16384)
+
+  pos, frame = findMPEGFrame(data)
+  if frame is None:
+    return None
+
+  # Xing/Info header follows side information
+  if frame['version'] == 1:
+    xingPos = pos + (21 if frame['mono'] else 36)
+  else:
+    xingPos = pos + (13 if frame['mono'] else 21)
+  vbriPos = pos + 36
+
+  nFrames = None
+  nBytes  = None
+  if data[xingPos:xingPos+4] in (b'Xing', b'Info'):
+    bitrateType = 'Variable' if data[xingPos:xingPos+4] == b'Xing' \
+                  else 'Constant'
+    if len(data) < xingPos + 16: # truncated header
+      return bitrateType, formatkbps(frame['bitrate'] * 1000)
+    flags = struct.unpack('>I', data[xingPos+4:xingPos+8])[0]
+    pos   = xingPos + 8
+    if flags & 0x01:
+      nFrames = struct.unpack('>I', data[pos:pos+4])[0]
+      pos    += 4
+    if flags & 0x02:
+      nBytes = struct.unpack('>I', data[pos:pos+4])[0]
+  elif data[vbriPos:vbriPos+4] == b'VBRI':
+    bitrateType = 'Variable'
+    nBytes, nFrames = struct.unpack('>II', data[vbriPos+10:vbriPos+18])
+  else: # no header, constant bitrate
+    return 'Constant', formatkbps(frame['bitrate'] * 1000)
+
+  if bitrateType == 'Constant' or not nFrames:
+    return bitrateType, formatkbps(frame['bitrate'] * 1000)
+
+  # average bitrate of a variable bitrate stream
+  if not nBytes:
+    nBytes = fileSize - audioStart
+  duration = nFrames * frame['samples'] / frame['sampleRate']
+
+  return bitrateType, formatkbps(nBytes * 8 / duration)
+
+def parseVorbisComments(data: bytes) -> tp.Dict[str, str]:
+  """
+  Parses Vorbis comments (FLAC VORBIS_COMMENT block, Ogg comment header).
+
+  data : bytes
+    Vorbis comments (may be truncated).
+
+  Returns:
+    Title and artist found in the comments : Dict[str, str].
+  """
+
+  keys   = {'TITLE': 'title', 'ARTIST': 'artist'}
+  values = {'title': [], 'artist': []}
+
+  try:
+    vendorLength = struct.unpack('<I', data[:4])[0]
+    pos          = 4 + vendorLength
+    nComments    = struct.unpack('<I', data[pos:pos+4])[0]
+    pos         += 4
+    for _ in range(nComments):
+      length  = struct.unpack('<I', data[pos:pos+4])[0]
+      comment = data[pos+4:pos+4+length]
+      if len(comment) < length: # truncated
+        break
+      pos += 4 + length
+
+      key, _, value = comment.decode('utf-8', errors='replace').partition('=')
+      if key.upper() in keys:
+        values[keys[key.upper()]].append(value)
+  except struct.error: # truncated
+    pass
+
+  return {key: ' / '.join(value) for key, value in values.items()
+          if value != []}
+
+def parseFLAC(f: tp.BinaryIO, audioStart: int, fileSize: int) -> \
+    tp.Optional[tp.Tuple[str, str, tp.Dict[str, str]]]:
+  """
+  Parses FLAC STREAMINFO and VORBIS_COMMENT metadata blocks.
+
+  f : BinaryIO
+    File opened in binary mode.
+
+  audioStart : int
+    Offset of the "fLaC" marker.
+
+  fileSize : int
+    File size, bytes.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), title and artist :
+        Tuple[str, str, Dict[str, str]], or None if the file is invalid.
+  """
+
+  f.seek(audioStart + 4)
+  streamInfo = None
+  tags       = {}
+  isLast     = False
+  while not isLast:
+    header = f.read(4)
+    if len(header) < 4:
+      return None
+    isLast    = bool(header[0] & 0x80)
+    blockType = header[0] & 0x7F
+    length    = int.from_bytes(header[1:], 'big')
+
+    if blockType == 0: # STREAMINFO
+      streamInfo = f.read(length)
+    elif blockType == 4: # VORBIS_COMMENT
+      blockStart = f.tell()
+      tags = parseVorbisComments(f.read(min(length, HEAD_SIZE)))
+      f.seek(blockStart + length)
+    else: # skip other blocks (e.g. pictures)
+      f.seek(length, os.SEEK_CUR)
+
+  if streamInfo is None or len(streamInfo) < 18:
+    return None
+
+  # sampling rate (20 bits) and total samples (36 bits)
+  info       = int.from_bytes(streamInfo[10:18], 'big')
+  sampleRate = info >> 44
+  nSamples   = info & 0xFFFFFFFFF
+  if sampleRate == 0 or nSamples == 0: # unknown duration
+    return None
+
+  duration = nSamples / sampleRate
+  nBytes   = fileSize - f.tell() # audio frames size
+
+  return 'Variable', formatkbps(nBytes * 8 / duration), tags
+
+def parseWAV(f: tp.BinaryIO, audioStart: int) -> \
+    tp.Optional[tp.Tuple[str, str, tp.Dict[str, str]]]:
+  """
+  Parses WAV fmt and LIST/INFO chunks.
+
+  f : BinaryIO
+    File opened in binary mode.
+
+  audioStart : int
+    Offset of the "RIFF" marker.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), title and artist :
+        Tuple[str, str, Dict[str, str]], or None if the file is not
+        an uncompressed WAV file.
+  """
+
+  infoKeys = {b'INAM': 'title', b'IART': 'artist'}
+
+  f.seek(audioStart + 12)
+  byteRate = None
+  tags     = {}
+  for _ in range(64): # bounded number of chunks
+    header = f.read(8)
+    if len(header) < 8:
+      break
+    chunkId = header[:4]
+    length  = struct.unpack('<I', header[4:])[0]
+
+    if chunkId == b'fmt ':
+      fmt = f.read(length)
+      if len(fmt) < 16:
+        return None
+      formatTag, _, _, byteRate = struct.unpack('<HHII', fmt[:12])
+      if formatTag not in WAV_PCM_FORMATS: # compressed audio
+        return None
+    elif chunkId == b'LIST' and length <= HEAD_SIZE:
+      data = f.read(length)
+      if data[:4] == b'INFO':
+        pos = 4
+        while pos + 8 <= len(data):
+          subId     = data[pos:pos+4]
+          subLength = struct.unpack('<I', data[pos+4:pos+8])[0]
+          if subId in infoKeys:
+            value = data[pos+8:pos+8+subLength].split(b'\x00')[0]
+            tags[infoKeys[subId]] = value.decode('latin-1').strip()
+          pos += 8 + subLength + subLength % 2
+    else: # skip other chunks (e.g. audio data)
+      f.seek(length, os.SEEK_CUR)
+
+    if length % 2: # chunks are word aligned
+      f.seek(1, os.SEEK_CUR)
+
+  if not byteRate:
+    return None
+
+  return 'Constant', formatkbps(byteRate * 8), tags
+
+def readOggPackets(f: tp.BinaryIO, audioStart: int,
+                   nPackets: int) -> tp.List[bytes]:
+  """
+  Reads the first packets of the first logical stream of an Ogg file.
+
+  f : BinaryIO
+    File opened in binary mode.
+
+  audioStart : int
+    Offset of the first "OggS" page.
+
+  nPackets : int
+    Number of packets to read.
+
+  Returns:
+    Packets (the last one may be truncated) : List[bytes].
+  """
+
+  f.seek(audioStart)
+  packets = []
+  packet  = b''
+  serial  = None
+  nRead   = 0
+  while len(packets) < nPackets and nRead < HEAD_SIZE:
+    header = f.read(27)
+    if len(header) < 27 or header[:4] != b'OggS':
+      break
+    pageSerial = struct.unpack('<I', header[14:18])[0]
+    segments   = f.read(header[26])
+    page       = f.read(sum(segments))
+    nRead     += 27 + len(segments) + len(page)
+
+    if serial is None:
+      serial = pageSerial
+    if pageSerial != serial: # skip other logical streams
+      continue
+
+    pos = 0
+    for length in segments:
+      packet += page[pos:pos+length]
+      pos    += length
+      if length < 255: # packet end
+        packets.append(packet)
+        packet = b''
+
+  if len(packets) < nPackets and packet != b'':
+    packets.append(packet)
+
+  return packets
+
+def parseOgg(f: tp.BinaryIO, audioStart: int) -> \
+    tp.Optional[tp.Tuple[str, str, tp.Dict[str, str]]]:
+  """
+  Parses Ogg Vorbis identification and comment headers.
+
+  f : BinaryIO
+    File opened in binary mode.
+
+  audioStart : int
+    Offset of the first "OggS" page.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), title and artist :
+        Tuple[str, str, Dict[str, str]], or None if the file is not
+        an Ogg Vorbis file with a nominal bitrate.
+  """
+
+  packets = readOggPackets(f, audioStart, 2)
+  if len(packets) < 1 or packets[0][:7] != b'\x01vorbis' or \
+      len(packets[0]) < 28:
+    return None
+
+  nominal = struct.unpack('<i', packets[0][20:24])[0]
+  if nominal <= 0: # unknown bitrate
+    return None
+
+  tags = {}
+  if len(packets) > 1 and packets[1][:7] == b'\x03vorbis':
+    tags = parseVorbisComments(packets[1][7:])
+
+  return 'Variable', formatkbps(nominal), tags
+
+def parseHeader(file: str) -> tp.Optional[tp.Tuple[str, str, str, str]]:
+  """
+  Retrieve metadata of an MP3, FLAC, WAV or Ogg Vorbis file from its
+      headers without an external process.
+
+  file : str
+    File full name.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), song title, song artist :
+        Tuple[str, str, str, str], or None if the format is not supported.
+  """
+
+  return parseHeaderBounded(file)[0]
+
+def parseHeaderBounded(file       : str,
+                       readBudget : tp.Optional[int]=None) -> \
+    tp.Tuple[tp.Optional[tp.Tuple[str, str, str, str]], int]:
+  """
+  Retrieve metadata of a file from its headers (see "parseHeader") reading
+      at most a number of bytes: blocks of the head, of the audio start and
+      of the tail are read on demand.
+
+  file : str
+    File full name.
+
+  readBudget : int
+    Maximum number of bytes read, files needing more are not parsed.
+    Defaults to None (no budget).
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), song title, song artist :
+        Tuple[str, str, str, str], or None if the format is not supported
+        or the budget is exceeded.
+    Number of bytes read : int.
+  """
+
+  with open(file, 'rb', buffering=0) as raw:
+    f = BoundedReader(raw, os.fstat(raw.fileno()).st_size, readBudget)
+    try:
+      result = parseHeaderData(f, file)
+    except (struct.error, IndexError, ValueError, ZeroDivisionError):
+      result = None # broken headers are left to mediainfo
+
+  return result, f.bytesRead
+
+def parseHeaderData(f    : BoundedReader,
+                    file : str) -> tp.Optional[tp.Tuple[str, str, str, str]]:
+  """
+  Retrieve metadata of a file from its headers (see "parseHeader").
+
+  f : BoundedReader
+    The file.
+
+  file : str
+    File full name.
+
+  Returns:
+    Bitrate Type, Bitrate (kbps), song title, song artist :
+        Tuple[str, str, str, str], or None if the format is not supported.
+  """
+
+  fileSize = f.size
+  audioStart, tags = parseID3v2(f) # tag can precede any format
+  f.seek(audioStart)
+  magic = f.read(12)
+
+  result = None
+  if magic[:4] == b'fLaC':
+    result = parseFLAC(f, audioStart, fileSize)
+  elif magic[:4] == b'RIFF' and magic[8:12] == b'WAVE':
+    result = parseWAV(f, audioStart)
+  elif magic[:4] == b'OggS':
+    result = parseOgg(f, audioStart)
+  elif file.lower().endswith(('.mp3', '.mp2', '.mpa')) or \
+      parseMPEGFrame(magic[:4]) is not None:
+    bitrate = parseMPEG(f, audioStart, fileSize)
+    if bitrate is not None:
+      if 'title' not in tags or 'artist' not in tags:
+        tags = {**parseID3v1(f), **tags}
+      result = *bitrate, {}
+
+  if result is None: # not supported format
+    return None
+
+  bitrateType, kbps, streamTags = result
+  tags = {**tags, **streamTags}
+
+  return bitrateType, kbps, tags.get('title', ''), tags.get('artist', '')
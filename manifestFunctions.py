@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import time
+import typing as tp
+
+import fileFunctions as ff
+
+def openManifest(manifestFile: str) -> sqlite3.Connection:
+  """
+  Opens (and creates if necessary) a conversion job manifest.
+
+  manifestFile : str
+    Full name of the SQLite manifest file.
+
+  Returns:
+    Connection to the manifest database : sqlite3.Connection.
+  """
+
+  # check "manifestFile" argument type provided
+  if not isinstance(manifestFile, str):
+    raise TypeError('"manifestFile" must be a string ' +
+                    f'("{type(manifestFile)}" was provided)!')
+
+  connection = sqlite3.connect(manifestFile)
+  connection.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                     'outPath   TEXT PRIMARY KEY, '
+                     'inPath    TEXT, '
+                     'inSize    INTEGER, '
+                     'inMtimeNs INTEGER, '
+                     'params    TEXT, '
+                     'state     TEXT, '
+                     'outSize   INTEGER, '
+                     'updated   INTEGER)')
+  connection.commit()
+
+  return connection
+
+def jobParams(*params: tp.Any) -> str:
+  """
+  Serializes encode parameters of a job.
+
+  params : Any
+    Encode parameters (JSON serializable).
+
+  Returns:
+    Serialized encode parameters : str.
+  """
+  return json.dumps(params, ensure_ascii=False)
+
+def isJobDone(connection : sqlite3.Connection, inPath: str, outPath: str,
+              inStat     : tp.Optional[os.stat_result], params: str) -> bool:
+  """
+  Checks whether a job was done and its output still matches the input
+      and the encode parameters.
+
+  connection : sqlite3.Connection
+    Connection to the manifest database.
+
+  inPath : str
+    Input file full name.
+
+  outPath : str
+    Output file full name.
+
+  inStat : os.stat_result
+    Current stat information of the input file.
+
+  params : str
+    Serialized encode parameters.
+
+  Returns:
+    True if the job can be skipped : bool.
+  """
+
+  if inStat is None: # input file does not exist
+    return False
+
+  row = connection.execute('SELECT inPath, inSize, inMtimeNs, params, '
+                           'state, outSize FROM jobs WHERE outPath = ?',
+                           (outPath,)).fetchone()
+  if row is None or row[4] != 'done': # job was not done
+    return False
+
+  # input or encode parameters changed
+  if row[:4] != (inPath, inStat.st_size, inStat.st_mtime_ns, params):
+    return False
+
+  # output was deleted or modified
+  outStat = ff.statFile(outPath)
+  return outStat is not None and outStat.st_size == row[5]
+
+def setJobState(connection : sqlite3.Connection, inPath: str, outPath: str,
+                inStat     : tp.Optional[os.stat_result], params: str,
+                state      : str, outSize: int=0,
+                commit     : bool=True) -> None:
+  """
+  Records a job state.
+
+  connection : sqlite3.Connection
+    Connection to the manifest database.
+
+  inPath : str
+    Input file full name.
+
+  outPath : str
+    Output file full name.
+
+  inStat : os.stat_result
+    Stat information of the input file at the job start.
+
+  params : str
+    Serialized encode parameters.
+
+  state : str
+    Job state: 'pending', 'done' or 'failed'.
+
+  outSize : int
+    Output file size in bytes. Defaults to 0.
+
+  commit : bool
+    Specifies whether to commit the state immediately.
+    Defaults to True.
+
+  Returns None.
+  """
+
+  # check "state" argument value provided
+  if state not in ('pending', 'done', 'failed'):
+    raise ValueError('"state" must be "pending", "done" or "failed" ' +
+                     f'("{state}" was provided)!')
+
+  inSize    = None if inStat is None else inStat.st_size
+  inMtimeNs = None if inStat is None else inStat.st_mtime_ns
+
+  connection.execute('INSERT OR REPLACE INTO jobs VALUES '
+                     '(?, ?, ?, ?, ?, ?, ?, ?)',
+                     (outPath, inPath, inSize, inMtimeNs, params, state,
+                      outSize, time.time_ns()))
+  if commit is True:
+    connection.commit()
+
+  return None
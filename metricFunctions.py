@@ -0,0 +1,306 @@
+import contextlib
+import datetime as dt
+import json
+import sys
+import threading
+import time
+import typing as tp
+
+class Metrics:
+  """
+  Run metrics: time spent in stages, per-file records and live
+      throughput/ETA progress. Safe to update from several threads.
+
+  totalFiles : int
+    Number of files to process (0 if unknown).
+
+  totalBytes : int
+    Number of input bytes to process (0 if unknown).
+
+  recordFiles : bool
+    Specifies whether to keep per-file records.
+
+  progressEvery : float
+    Minimum interval between progress lines, seconds.
+  """
+
+  def __init__(self, totalFiles    : int=0, totalBytes: int=0,
+                     recordFiles   : bool=True,
+                     progressEvery : float=1.0) -> None:
+    self.totalFiles    = totalFiles
+    self.totalBytes    = totalBytes
+    self.recordFiles   = recordFiles
+    self.progressEvery = progressEvery
+
+    self.start     = time.perf_counter()
+    self.stages    = {}  # stage name -> {'seconds', 'calls'}
+    self.files     = []  # per-file records
+    self.nFiles    = 0   # processed files
+    self.nBytes    = 0   # processed input bytes
+    self.outBytes  = 0   # written output bytes
+    self.lastPrint = 0.0 # last progress line time
+    self.values    = {}  # other run values by name
+    self.bytesRead = {}  # file -> bytes read by probes
+    self.lock      = threading.Lock()
+
+  def addStageTime(self, stage: str, seconds: float, calls: int=1) -> None:
+    """
+    Adds time spent in a stage.
+
+    stage : str
+      Stage name.
+
+    seconds : float
+      Time spent, seconds.
+
+    calls : int
+      Number of stage calls. Defaults to 1.
+
+    Returns None.
+    """
+
+    with self.lock:
+      record = self.stages.setdefault(stage, {'seconds': 0.0, 'calls': 0})
+      record['seconds'] += seconds
+      record['calls']   += calls
+
+    return None
+
+  @contextlib.contextmanager
+  def stage(self, stage: str) -> tp.Iterator[None]:
+    """
+    Measures time spent in a "with" block as a stage.
+
+    stage : str
+      Stage name.
+    """
+
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.addStageTime(stage, time.perf_counter() - start)
+
+  def addFile(self, file: str, seconds: float, inBytes: int,
+              outBytes: int=0, **fields: tp.Any) -> None:
+    """
+    Records a processed file and updates progress.
+
+    file : str
+      File full name.
+
+    seconds : float
+      Wall time spent on the file, seconds.
+
+    inBytes : int
+      Input file size in bytes.
+
+    outBytes : int
+      Output file size in bytes. Defaults to 0.
+
+    fields : Any
+      Additional fields of the record (e.g. stage timings).
+
+    Returns None.
+    """
+
+    with self.lock:
+      if self.recordFiles is True:
+        self.files.append({'file': file, 'seconds': seconds,
+                           'inBytes': inBytes, 'outBytes': outBytes,
+                           'ratio': outBytes / inBytes if inBytes else None,
+                           **fields})
+      self.outBytes += outBytes
+
+    self.progress(1, inBytes)
+
+    return None
+
+  def addBytesRead(self, file: str, nBytes: tp.Optional[int]) -> None:
+    """
+    Records bytes read from a file by a probe (several probes of a file
+        add up).
+
+    file : str
+      File full name.
+
+    nBytes : int
+      Number of bytes read, None if not measured.
+
+    Returns None.
+    """
+
+    if nBytes is None:
+      return None
+
+    with self.lock:
+      self.bytesRead[file] = self.bytesRead.get(file, 0) + nBytes
+
+    return None
+
+  def setValue(self, name: str, value: tp.Any) -> None:
+    """
+    Sets a run value written with the metrics (e.g. concurrency changes).
+
+    name : str
+      Value name.
+
+    value : Any
+      Value (JSON serializable).
+
+    Returns None.
+    """
+
+    with self.lock:
+      self.values[name] = value
+
+    return None
+
+  def progress(self, nFiles: int=1, nBytes: int=0) -> None:
+    """
+    Updates processed files and bytes and prints a progress line
+        (files/s, MB/s, ETA) at most every "progressEvery" seconds.
+
+    nFiles : int
+      Number of processed files. Defaults to 1.
+
+    nBytes : int
+      Number of processed input bytes. Defaults to 0.
+
+    Returns None.
+    """
+
+    with self.lock:
+      self.nFiles += nFiles
+      self.nBytes += nBytes
+
+      now = time.perf_counter()
+      if now - self.lastPrint < self.progressEvery and \
+          self.nFiles != self.totalFiles:
+        return None
+      self.lastPrint = now
+
+      line = self.progressLine(now - self.start)
+
+    # rewrite the line in a terminal, print lines otherwise
+    if sys.stdout.isatty():
+      print('\r' + line, end='', flush=True)
+    else:
+      print(line, flush=True)
+
+    return None
+
+  def progressLine(self, elapsed: float) -> str:
+    """
+    Formats a progress line.
+
+    elapsed : float
+      Time elapsed since the run start, seconds.
+
+    Returns:
+      Progress line : str.
+    """
+
+    filesRate = self.nFiles / elapsed if elapsed > 0 else 0.0
+    bytesRate = self.nBytes / elapsed if elapsed > 0 else 0.0
+
+    # estimate by bytes if known (files differ in size), by files otherwise
+    eta = None
+    if self.totalBytes > 0 and bytesRate > 0:
+      eta = max(self.totalBytes - self.nBytes, 0) / bytesRate
+    elif self.totalFiles > 0 and filesRate > 0:
+      eta = max(self.totalFiles - self.nFiles, 0) / filesRate
+
+    total = f' of {self.totalFiles}' if self.totalFiles > 0 else ''
+    line  = f'Processed {self.nFiles}{total} files | ' + \
+            f'{filesRate:.1f} files/s | {bytesRate/1e6:.1f} MB/s'
+    if eta is not None:
+      line += f' | ETA {dt.timedelta(seconds=round(eta))}'
+
+    return line
+
+  def finish(self) -> None:
+    """
+    Ends the progress line.
+
+    Returns None.
+    """
+
+    if sys.stdout.isatty() and self.nFiles > 0:
+      print()
+
+    return None
+
+  def summary(self) -> tp.Dict[str, tp.Any]:
+    """
+    Gets run metrics.
+
+    Returns:
+      Run metrics : Dict[str, Any].
+    """
+
+    with self.lock:
+      elapsed = time.perf_counter() - self.start
+      return {'seconds': elapsed,
+              'files': self.nFiles,
+              'inBytes': self.nBytes,
+              'outBytes': self.outBytes,
+              'ratio': self.outBytes / self.nBytes if self.nBytes else None,
+              'filesPerSecond': self.nFiles / elapsed if elapsed else None,
+              'bytesPerSecond': self.nBytes / elapsed if elapsed else None,
+              'stages': {stage: dict(record)
+                         for stage, record in self.stages.items()},
+              **self.values,
+              **({'bytesRead': {'total': sum(self.bytesRead.values()),
+                                'files': dict(self.bytesRead)}}
+                 if self.bytesRead else {}),
+              'fileRecords': list(self.files)}
+
+  def writeJSON(self, outFullName: str) -> None:
+    """
+    Writes run metrics to a JSON file.
+
+    outFullName : str
+      JSON file full name.
+
+    Returns None.
+    """
+
+    with open(outFullName, 'w') as outFile:
+      json.dump(self.summary(), outFile, indent=1)
+
+    return None
+
+def timedIter(items   : tp.Iterable[tp.Any],
+              metrics : tp.Optional[Metrics],
+              stage   : str) -> tp.Iterator[tp.Any]:
+  """
+  Measures time spent producing items of an iterable as a stage.
+
+  items : Iterable[Any]
+    Items (e.g. a generator).
+
+  metrics : Metrics
+    Run metrics, None disables measuring.
+
+  stage : str
+    Stage name.
+
+  Yields:
+    Items : Any.
+  """
+
+  if metrics is None:
+    yield from items
+    return
+
+  items = iter(items)
+  while True:
+    start = time.perf_counter()
+    try:
+      item = next(items)
+    except StopIteration:
+      metrics.addStageTime(stage, time.perf_counter() - start, 0)
+      return
+    metrics.addStageTime(stage, time.perf_counter() - start)
+    yield item
@@ -0,0 +1,159 @@
+import os
+import re
+import string
+import typing as tp
+
+import trackFunctions as tf
+
+# characters which are not allowed in file names on common file systems
+UNSAFE_CHARS = re.compile(r'[\x00-\x1f<>:"/\\|?*]')
+
+class TemplateFormatter(string.Formatter):
+  """
+  Formats naming templates like "{artist} - {title|name}": a field may list
+      alternatives separated by "|", the first non-empty one is used, and
+      missing fields are empty.
+  """
+
+  def get_value(self, key: tp.Union[int, str], args: tp.Sequence[tp.Any],
+                kwargs: tp.Mapping[str, tp.Any]) -> tp.Any:
+    if isinstance(key, int):
+      return super().get_value(key, args, kwargs)
+
+    for name in key.split('|'):
+      value = kwargs.get(name.strip(), '')
+      if value != '':
+        return value
+
+    return ''
+
+FORMATTER = TemplateFormatter()
+
+def sanitizeFileName(name: str) -> str:
+  """
+  Replaces characters which are not allowed in file names.
+
+  name : str
+    File name (no extension).
+
+  Returns:
+    Safe file name, '' if nothing is left : str.
+  """
+
+  name = UNSAFE_CHARS.sub('_', name)
+
+  return name.strip().strip('.').strip()
+
+def trackFields(track   : tf.Track,
+                pattern : tp.Optional[tp.Pattern[str]]=None) -> \
+    tp.Dict[str, str]:
+  """
+  Gets the fields available to naming templates.
+
+  track : Track
+    Track record.
+
+  pattern : Pattern[str]
+    Regular expression applied to the file name (no extension), its named
+        groups are added to the fields.
+    Defaults to None.
+
+  Returns:
+    Fields "name" (file name, no extension), "ext", "folder" (parent folder
+        name), "title", "artist", "kbps" and named groups of the pattern :
+        Dict[str, str].
+  """
+
+  name = os.path.splitext(track.fileName)[0]
+  fields = {'name': name, 'ext': track.extension,
+            'folder': os.path.basename(os.path.dirname(track.fullName)),
+            'title': track.title, 'artist': track.artist,
+            'kbps': tf.kbpsText(track.kbps)}
+
+  if pattern is not None:
+    match = pattern.search(name)
+    if match is not None:
+      fields.update({key: value.strip()
+                     for key, value in match.groupdict().items()
+                     if value is not None})
+
+  return fields
+
+def applyNamingRules(tracks         : tf.TrackTable,
+                     nameTemplate   : str='{name}',
+                     titleTemplate  : str='{title|name}',
+                     artistTemplate : str='{artist}',
+                     pattern        : tp.Optional[str]=None,
+                     indices        : tp.Optional[tp.Iterable[int]]=None,
+                     taken          : tp.Optional[tp.Set[tp.Tuple[str,
+                                                                  str]]]=None
+                     ) -> None:
+  """
+  Fills new file names, titles and artists of audio tracks from templates
+      instead of a hand-edited CSV file. Tracks without audio
+      (no Bitrate Type and kb/s) are not converted.
+
+  tracks : TrackTable
+    Table of tracks, changed in place.
+
+  nameTemplate : str
+    Converted file name (no extension) template.
+    Defaults to '{name}' (input file name).
+
+  titleTemplate : str
+    Converted file title template.
+    Defaults to '{title|name}' (title tag or input file name).
+
+  artistTemplate : str
+    Converted file artist template.
+    Defaults to '{artist}' (artist tag).
+
+  pattern : str
+    Regular expression applied to input file names (no extension), its
+        named groups can be used in templates, e.g.
+        r'^(?P<track>\d+)\s*-\s*(?P<song>.*)$'.
+    Defaults to None.
+
+  indices : Iterable[int]
+    Indices of the tracks to name. Defaults to None (all tracks).
+
+  taken : Set[Tuple[str, str]]
+    Input folders and lowercase converted file names already in use,
+        a name in use gets a " (2)", " (3)", ... suffix. Updated with
+        the new names.
+    Defaults to None (names are unique within "tracks").
+
+  Returns None.
+  """
+
+  compiled = re.compile(pattern) if pattern is not None else None
+  if taken is None:
+    taken = set()
+  if indices is None:
+    indices = range(len(tracks))
+
+  for i in indices:
+    if tracks.bitrateType[i] == '' and tracks.kbps[i] == 0: # not an audio
+      tracks.newFileName[i] = ''
+      continue
+
+    fields = trackFields(tracks[i], compiled)
+    name   = sanitizeFileName(FORMATTER.format(nameTemplate, **fields))
+    if name == '': # nothing to name the file after
+      tracks.newFileName[i] = ''
+      continue
+
+    # converted files of an input folder share an output folder
+    folder = os.path.dirname(tracks.fullName[i])
+    unique = name
+    n      = 1
+    while (folder, unique.lower()) in taken:
+      n     += 1
+      unique = f'{name} ({n})'
+    taken.add((folder, unique.lower()))
+
+    tracks.newFileName[i] = unique
+    tracks.newTitle[i]    = FORMATTER.format(titleTemplate, **fields).strip()
+    tracks.newArtist[i]   = FORMATTER.format(artistTemplate, **fields).strip()
+
+  return None
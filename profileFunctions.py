@@ -0,0 +1,219 @@
+import subprocess as sp
+import typing as tp
+
+import segmentFunctions as sg
+import trackFunctions as tf
+
+class Profile:
+  """
+  Output profile: encoder, its rate control and the output format.
+
+  name : str
+    Profile name.
+
+  codec : str
+    ffmpeg encoder.
+
+  extension : str
+    Converted file extension.
+
+  muxer : str
+    ffmpeg output format.
+
+  kbps : float
+    Target bitrate (kbps) of bitrate modes, nominal bitrate of quality
+        modes (to compare with input bitrates).
+
+  quality : int
+    Encoder quality (e.g. LAME VBR -V level), None for bitrate modes.
+
+  bitrateType : str
+    Bitrate Type of converted files.
+
+  needsSeek : bool
+    Specifies whether the muxer rewrites the file header when it finishes
+        (the output cannot be a pipe).
+  """
+
+  __slots__ = ('name', 'codec', 'extension', 'muxer', 'kbps', 'quality',
+               'bitrateType', 'needsSeek')
+
+  def __init__(self,
+               name        : str,
+               codec       : str,
+               extension   : str,
+               muxer       : str,
+               kbps        : float,
+               quality     : tp.Optional[int],
+               bitrateType : str,
+               needsSeek   : bool=False) -> None:
+    self.name        = name
+    self.codec       = codec
+    self.extension   = extension
+    self.muxer       = muxer
+    self.kbps        = kbps
+    self.quality     = quality
+    self.bitrateType = bitrateType
+    self.needsSeek   = needsSeek
+
+  def encodeArgs(self, kbps: float) -> tp.List[str]:
+    """
+    Gets converter encoder arguments.
+
+    kbps : float
+      Encode kbps (ignored by quality modes).
+
+    Returns:
+      Converter arguments : List[str].
+    """
+
+    if self.quality is not None:
+      return ['-codec:a', self.codec, '-q:a', str(self.quality)]
+
+    return ['-codec:a', self.codec, '-b:a', f'{tf.kbpsText(kbps)}k']
+
+# nominal bitrates (kbps) of LAME VBR quality levels -V0 ... -V9
+LAME_VBR_KBPS = (245, 225, 190, 175, 165, 130, 115, 100, 85, 65)
+
+# named profiles, 'mp3' (constant bitrate MP3 at "outkbps") is built
+# by "getProfile"
+PROFILES = {
+  **{f'mp3-v{level}': Profile(f'mp3-v{level}', 'libmp3lame', 'mp3', 'mp3',
+                              kbps, level, 'Variable')
+     for level, kbps in enumerate(LAME_VBR_KBPS)},
+  **{f'opus-{kbps}': Profile(f'opus-{kbps}', 'libopus', 'opus', 'ogg', kbps,
+                             None, 'Variable')
+     for kbps in (24, 32, 48, 64, 96, 128)},
+  **{f'aac-{kbps}': Profile(f'aac-{kbps}', 'aac', 'm4a', 'ipod', kbps, None,
+                            'Constant', True)
+     for kbps in (64, 96, 128, 192)},
+}
+
+def getProfile(name: str, outkbps: int) -> Profile:
+  """
+  Gets an output profile by name.
+
+  name : str
+    'mp3' (constant bitrate MP3), 'mp3-v0' ... 'mp3-v9' (LAME VBR),
+        'opus-24' ... 'opus-128' (Opus in Ogg) or 'aac-64' ... 'aac-192'
+        (AAC in M4A).
+
+  outkbps : int
+    Bitrate (kbps) of the 'mp3' profile.
+
+  Returns:
+    Output profile : Profile.
+  """
+
+  if name == 'mp3':
+    return Profile('mp3', 'libmp3lame', 'mp3', 'mp3', float(outkbps), None,
+                   'Constant')
+
+  if name not in PROFILES:
+    raise ValueError('"profile" must be "mp3" or one of ' +
+                     f'{sorted(PROFILES)} ("{name}" was provided)!')
+
+  return PROFILES[name]
+
+def trialEncodekbps(fileFullName : str, profile: Profile, kbps: float,
+                    start        : float, seconds: float) -> \
+    tp.Optional[float]:
+  """
+  Encodes a sample of an audio file with a profile and measures its
+      bitrate (container overhead included).
+
+  fileFullName : str
+    Input file name.
+
+  profile : Profile
+    Output profile.
+
+  kbps : float
+    Encode kbps (see "Profile.encodeArgs").
+
+  start : float
+    Sample start, seconds.
+
+  seconds : float
+    Sample duration, seconds.
+
+  Returns:
+    Sample bitrate, kbps : float, or None if the sample was not encoded.
+  """
+
+  # an index written at the end cannot be rewritten in a pipe
+  muxArgs = ['-movflags', 'frag_keyframe+empty_moov'] \
+            if profile.needsSeek else []
+
+  cmd = ['ffmpeg', '-ss', f'{start:.3f}', '-t', f'{seconds:.3f}',
+         '-i', f'{fileFullName}', '-vn', '-sn', '-dn', '-map', 'a',
+         *profile.encodeArgs(kbps), '-map_metadata', '-1', *muxArgs,
+         '-f', profile.muxer, 'pipe:1']
+  cmdout = sp.run(cmd, stdin=sp.DEVNULL, stdout=sp.PIPE, stderr=sp.DEVNULL)
+  if cmdout.returncode != 0 or cmdout.stdout == b'':
+    return None
+
+  return len(cmdout.stdout) * 8 / 1000 / seconds
+
+def selectProfile(fileFullName : str, fileExistkbps: float,
+                  candidates   : tp.List[tp.Tuple[Profile, tp.Optional[
+                                                  float]]],
+                  maxkbps      : tp.Optional[float]=None,
+                  seconds      : float=20.0) -> int:
+  """
+  Selects a profile by encoding a sample from the middle of the file with
+      each candidate profile: the smallest one, or with a bitrate budget
+      the largest (highest quality) one within the budget.
+
+  fileFullName : str
+    Input file name.
+
+  fileExistkbps : float
+    Input file kbps (0 if unknown).
+
+  candidates : List[Tuple[Profile, Optional[float]]]
+    Candidate profiles (of acceptable quality) and their encode kbps
+        (None if the audio is copied, its bitrate is then the input one).
+
+  maxkbps : float
+    Bitrate budget, kbps: the candidate with the highest sample bitrate
+        not exceeding it is selected, the smallest one if none fits.
+    Defaults to None (the smallest candidate is selected).
+
+  seconds : float
+    Sample duration, seconds. Defaults to 20.0.
+
+  Returns:
+    Index of the selected candidate (0 if no sample was encoded) : int.
+  """
+
+  stream = sg.probeAudioStream(fileFullName)
+  if stream is None or stream[0] <= 0: # duration is unknown
+    return 0
+  duration = stream[0]
+
+  seconds = min(seconds, duration)
+  start   = max((duration - seconds) / 2, 0.0)
+
+  sizes = [] # sample kbps, candidate index
+  for i, (profile, kbps) in enumerate(candidates):
+    if kbps is None: # copied audio keeps the input bitrate
+      if fileExistkbps > 0:
+        sizes.append((fileExistkbps, i))
+      continue
+    samplekbps = trialEncodekbps(fileFullName, profile, kbps, start, seconds)
+    if samplekbps is not None:
+      sizes.append((samplekbps, i))
+
+  if sizes == []:
+    return 0
+
+  if maxkbps is None:
+    return min(sizes)[1]
+
+  # the best quality the budget allows
+  inBudget = [size for size in sizes if size[0] <= maxkbps]
+  if inBudget == []: # nothing fits, the smallest one is the closest
+    return min(sizes)[1]
+
+  return max(inBudget)[1]
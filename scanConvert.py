@@ -0,0 +1,371 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import typing as tp
+
+import audioConverter as ac
+import fileFunctions as ff
+import manifestFunctions as mf
+import metricFunctions as mt
+import namingFunctions as nf
+import profileFunctions as pf
+import sysFunctions as sf
+import trackFunctions as tf
+
+def scanTracks(folderIn : str, chunkSize: int,
+               naming   : tp.Dict[str, tp.Any],
+               taken    : tp.Set[tp.Tuple[str, str]],
+               **kwargs) -> tp.Iterator[tf.Track]:
+  """
+  Scans a folder and names its tracks chunk by chunk.
+
+  folderIn : str
+    Folder being processed.
+
+  chunkSize : int
+    Number of files probed together.
+
+  naming : Dict[str, Any]
+    "namingFunctions.applyNamingRules" template and pattern arguments.
+
+  taken : Set[Tuple[str, str]]
+    Converted file names in use (see "applyNamingRules"), updated.
+
+  kwargs
+    "getMetadata" keyword arguments.
+
+  Yields:
+    Named tracks in scan order : Track.
+  """
+
+  entries = ff.iterFiles(folderIn, True)
+  rows    = ff.iterFileData(entries, chunkSize, **kwargs)
+
+  for chunk in ff.iterChunks(rows, chunkSize):
+    tracks = tf.TrackTable(folderIn)
+    for row in chunk:
+      tracks.append(tf.Track(*row[:4], tf.parsekbps(row[4]), *row[5:]))
+    nf.applyNamingRules(tracks, **naming, taken=taken)
+
+    for i in range(len(tracks)):
+      yield tracks[i]
+
+def scanConvert(folderIn       : str, folderOut: str, outkbps: int,
+                nameTemplate   : str='{name}',
+                titleTemplate  : str='{title|name}',
+                artistTemplate : str='{artist}',
+                pattern        : tp.Optional[str]=None,
+                nProcs         : tp.Optional[int]=None,
+                nWorkers       : tp.Optional[int]=None,
+                cacheFile      : tp.Optional[str]='',
+                manifestFile   : tp.Optional[str]='',
+                metricsFile    : tp.Optional[str]='',
+                batchSize      : tp.Optional[int]=None,
+                nativeParser   : bool=False,
+                prefilter      : bool=True,
+                readBudget     : tp.Optional[int]=None,
+                nativeCopy     : bool=False,
+                profile        : str='mp3',
+                chunkSize      : int=16) -> int:
+  """
+  Scans a folder and converts its audio files in a single pass: files are
+      named by naming rules instead of a hand-edited CSV file and each
+      file is queued for conversion as soon as its chunk is probed, so
+      probing overlaps with encoding.
+
+  folderIn : str
+    Folder being processed.
+
+  folderOut : str
+    Folder to which converted files, the scan CSV file (with new names) and
+        the converted files CSV file are written.
+
+  outkbps : int
+    Output kbps.
+
+  nameTemplate, titleTemplate, artistTemplate, pattern
+    Naming rules, see "namingFunctions.applyNamingRules".
+
+  nProcs : int
+    Number of concurrent conversions.
+    Defaults to None (number of CPU physical cores).
+
+  nWorkers : int
+    Number of concurrent probes.
+    Defaults to None (number of CPU physical cores).
+
+  cacheFile : str
+    Full name of a persistent metadata cache (SQLite) file.
+    Defaults to '' ("metadata.sqlite" in "folderOut"),
+        None disables the cache.
+
+  manifestFile : str
+    Full name of a job manifest (SQLite) file, jobs done by previous runs
+        are skipped.
+    Defaults to '' ("manifest.sqlite" in "folderOut"),
+        None disables the manifest.
+
+  metricsFile : str
+    Full name of a JSON file to which conversion metrics and scan stages
+        ("scan" value) are written.
+    Defaults to '' ("metrics_<timestamp>.json" in "folderOut"),
+        None disables the file (progress is still printed).
+
+  batchSize : int
+    Maximum number of files probed by a single mediainfo call.
+    Defaults to None (one mediainfo call per file).
+
+  nativeParser : bool
+    Specifies whether to read MP3, FLAC, WAV and Ogg Vorbis headers
+        in-process instead of running mediainfo.
+    Defaults to False (probe all files with mediainfo).
+
+  prefilter : bool
+    Specifies whether to skip files which are not audio by extension and
+        first bytes instead of probing them.
+    Defaults to True.
+
+  readBudget : int
+    Maximum number of bytes the header parser reads from a file, mediainfo
+        reads the least of a file (see "fileFunctions.getMetadata"). Bytes
+        read per file are written to the "bytesRead" value of the "scan"
+        metrics.
+    Defaults to None (no budget).
+
+  nativeCopy : bool
+    Specifies whether to rewrite tags of MP3 files which are not
+        re-encoded without ffmpeg (see "convertAudioFiles").
+    Defaults to False.
+
+  profile : str
+    Output profile name (see "profileFunctions.getProfile"). Profile
+        selection by trial encodes needs the whole job list and is only
+        done by "convertAudioFiles".
+    Defaults to 'mp3' (constant bitrate MP3 at "outkbps").
+
+  chunkSize : int
+    Number of files probed together, the first conversion starts after
+        the first chunk is probed.
+    Defaults to 16.
+
+  Returns 0.
+  """
+
+  sf.limitTracebackInfo(0) # limit traceback info
+  ff.dirCheck(folderIn)    # check "folderIn" correctness
+  ff.dirCheck(folderOut)   # check "folderOut" correctness
+
+  # check "outkbps" argument type and value provided
+  if not isinstance(outkbps, int):
+    raise TypeError('"outkbps" must be an integer ' +
+                    f'("{type(outkbps)}" was provided)!')
+  if outkbps < 1:
+    raise ValueError('"outkbps" must be positive ' +
+                     f'("{outkbps}" was provided)!')
+
+  # check "nativeCopy" argument type provided
+  if not isinstance(nativeCopy, bool):
+    raise TypeError('"nativeCopy" must be a boolean ' +
+                    f'("{type(nativeCopy)}" was provided)!')
+
+  outProfile = pf.getProfile(profile, outkbps) # check "profile" value
+
+  sf.cmdInstalled('ffmpeg') # check if command is installed
+
+  # set number of concurrent conversions and probes
+  if nProcs is None:
+    nProcs = sf.nPhysicalCores()
+  if nWorkers is None:
+    nWorkers = sf.nPhysicalCores()
+
+  # check "nProcs" argument type and value provided
+  if not isinstance(nProcs, int):
+    raise TypeError('"nProcs" must be an integer ' +
+                    f'("{type(nProcs)}" was provided)!')
+  if nProcs < 1:
+    raise ValueError('"nProcs" must be positive ' +
+                     f'("{nProcs}" was provided)!')
+
+  # set default files in the output folder
+  if cacheFile == '':
+    cacheFile = os.path.join(folderOut, 'metadata.sqlite')
+  if manifestFile == '':
+    manifestFile = os.path.join(folderOut, 'manifest.sqlite')
+  timeStamp = sf.getTimeStamp()
+  if metricsFile == '':
+    metricsFile = os.path.join(folderOut, 'metrics' + timeStamp + '.json')
+
+  rootFolder = os.path.split(folderIn)[-1] # get root folder name
+
+  # create empty log-file for writing errors for not converted files
+  logFile = os.path.join(folderOut, 'LOG' + timeStamp)
+  open(logFile, 'wb').close()
+
+  # open the job manifest
+  connection = None
+  if manifestFile is not None:
+    connection = mf.openManifest(manifestFile)
+
+  # the number of files is unknown while scanning, so no ETA is shown;
+  # scan stages are measured separately and progress shows conversions
+  metrics     = mt.Metrics()
+  scanMetrics = mt.Metrics(recordFiles=False, progressEvery=float('inf'))
+
+  naming = {'nameTemplate': nameTemplate, 'titleTemplate': titleTemplate,
+            'artistTemplate': artistTemplate, 'pattern': pattern}
+
+  # the scan thread and the pool result thread report to the main thread,
+  # the scan waits for a slot before each track so that at most
+  # "2 * nProcs" tracks are queued or converted at once
+  events = queue.Queue()
+  stop   = threading.Event()
+  slots  = threading.Semaphore(2 * nProcs)
+
+  def scan() -> None:
+    err = None
+    try:
+      tracks = scanTracks(folderIn, chunkSize, naming, set(),
+                          cacheFile=cacheFile, batchSize=batchSize,
+                          nWorkers=nWorkers, nativeParser=nativeParser,
+                          prefilter=prefilter, readBudget=readBudget,
+                          metrics=scanMetrics)
+      for track in mt.timedIter(tracks, scanMetrics, 'scan'):
+        while not slots.acquire(timeout=0.1):
+          if stop.is_set():
+            break
+        if stop.is_set():
+          break
+        events.put(('track', track))
+    except BaseException as error: # passed to the main thread and raised
+      err = error
+    events.put(('scanned', err))
+
+  library  = tf.TrackTable(folderIn) # scanned tracks
+  outNames = {} # job index -> converted file full name
+  outSizes = {} # job index -> converted file size in bytes
+  jobInfo  = {} # converted file full name -> index, input stat, parameters
+  inFlight = 0
+  scanning = True
+
+  scanner = threading.Thread(target=scan, daemon=True)
+  with mp.Pool(nProcs) as pool:
+    scanner.start()
+    try:
+      while scanning or inFlight > 0:
+        kind, item = events.get()
+
+        if kind == 'scanned': # no more tracks
+          scanning = False
+          if item is not None:
+            raise item
+
+        elif kind == 'track':
+          j = len(library)
+          library.append(item)
+          if item.newFileName == '': # not an audio file
+            slots.release()
+            continue
+
+          outFolder = ac.createFolders(folderIn, rootFolder, folderOut,
+                                       [item.fullName], [item.fileName])[0]
+          outNames[j] = os.path.join(outFolder, item.newFileName + '.' +
+                                     outProfile.extension)
+          inStat = ff.statFile(item.fullName)
+          params = mf.jobParams(tf.kbpsText(item.kbps), item.newArtist,
+                                item.newTitle, outkbps,
+                                *([] if profile == 'mp3' else [[profile]]))
+
+          # skip jobs done by previous runs
+          if connection is not None:
+            if mf.isJobDone(connection, item.fullName, outNames[j], inStat,
+                            params):
+              outSizes[j] = ff.statFile(outNames[j]).st_size
+              slots.release()
+              continue
+            mf.setJobState(connection, item.fullName, outNames[j], inStat,
+                           params, 'pending', commit=False)
+
+          jobInfo[outNames[j]] = j, inStat, params
+          pool.apply_async(
+            ac.convertAudioJob,
+            ((item.fullName, item.kbps, outFolder, item.newFileName,
+              item.newArtist, item.newTitle, outkbps, nativeCopy,
+              profile),),
+            callback=lambda result: events.put(('result', result)),
+            error_callback=lambda err: events.put(('error', err)))
+          inFlight += 1
+
+        elif kind == 'error':
+          raise item
+
+        else: # a conversion result
+          inFlight -= 1
+          slots.release()
+          result, timings = item[:4], item[4]
+          j, inStat, params = jobInfo[result[1]]
+          nBytes = result[2]
+
+          # log on errors
+          ac.writeConversionLog(logFile, [result])
+
+          outSizes[j] = nBytes
+          metrics.addStageTime('encode', timings.get('encode', 0.0))
+          metrics.addStageTime('write', timings.get('write', 0.0))
+          metrics.addFile(library.fullName[j], timings['seconds'],
+                          library.sizeBytes[j], nBytes,
+                          encode=timings.get('encode'),
+                          write=timings.get('write'))
+
+          # record the job state
+          if connection is not None:
+            mf.setJobState(connection, library.fullName[j], outNames[j],
+                           inStat, params, 'done' if nBytes > 0 else
+                           'failed', nBytes)
+    finally:
+      stop.set() # stop scanning on errors
+
+  metrics.finish()
+  metrics.setValue('scan', {key: value for key, value in
+                            scanMetrics.summary().items()
+                            if key in ('seconds', 'files', 'inBytes',
+                                       'stages', 'bytesRead')})
+
+  if connection is not None:
+    connection.close()
+
+  nSkipped = len(outNames) - len(jobInfo)
+  if nSkipped > 0:
+    print(f'Skipped {nSkipped} files converted by previous runs.')
+
+  # write the scanned tracks with their new names (an editable CSV file)
+  tf.writeTracksCSV(library, os.path.join(folderOut,
+                                          'scan' + timeStamp + '.csv'))
+
+  # write a CSV output with converted files info
+  done = sorted((j for j in outSizes if outSizes[j] > 0),
+                key=lambda j: outNames[j])
+  with metrics.stage('csvWrite'):
+    ac.writeConvertedData(
+      os.path.join(folderOut, rootFolder), folderOut,
+      [outNames[j] for j in done],
+      [ac.getOutputBitrate(library.fullName[j], library.kbps[j],
+                           library.bitrateType[j], outkbps, profile)
+       for j in done],
+      [library.newTitle[j] for j in done],
+      [library.newArtist[j] for j in done],
+      [outSizes[j] for j in done],
+      [outNames[j] in jobInfo for j in done])
+
+  if metricsFile is not None:
+    metrics.writeJSON(metricsFile)
+
+  return 0
+
+if __name__ == '__main__':
+  folder  = r'/mnt/Internal_HDD/0_FROM_EXTERNAL/music/'
+  out     = r'/home/linux/Downloads/converted/'
+  outkbps = 128
+
+  print(scanConvert(folder, out, outkbps,
+                    nameTemplate='{artist} - {title|name}'))
@@ -0,0 +1,336 @@
+import json
+import math
+import os
+import struct
+import subprocess as sp
+import typing as tp
+
+import headerFunctions as hf
+import tagFunctions as tg
+
+# sample rates supported by MP3 (libmp3lame)
+MP3_SAMPLE_RATES = (44100, 48000, 32000, 22050, 24000, 16000, 11025, 12000,
+                    8000)
+
+LAME_DELAY      = 576 # encoder delay of libmp3lame written to the LAME tag
+PREROLL_FRAMES  = 2   # frames encoded before a segment and dropped
+POSTROLL_FRAMES = 2   # frames encoded after a segment and dropped
+
+def crc16(data: bytes) -> int:
+  """
+  Computes a CRC-16 (polynomial 0x8005, reflected) as used by LAME tags.
+
+  data : bytes
+    Data.
+
+  Returns:
+    CRC-16 : int.
+  """
+
+  crc = 0
+  for byte in data:
+    crc ^= byte
+    for _ in range(8):
+      crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+
+  return crc
+
+def probeAudioStream(file: str) -> tp.Optional[tp.Tuple[float, int]]:
+  """
+  Gets the duration and the sample rate of the first audio stream of a file
+      with ffprobe.
+
+  file : str
+    File full name.
+
+  Returns:
+    Duration, seconds : float.
+    Sample rate, Hz : int.
+    Or None if the file has no audio stream or its duration is unknown.
+  """
+
+  cmdout = sp.run(['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+                   '-show_entries', 'stream=sample_rate:format=duration',
+                   '-of', 'json', file], stdout=sp.PIPE, stderr=sp.DEVNULL)
+  try:
+    info       = json.loads(cmdout.stdout.decode('utf-8'))
+    duration   = float(info['format']['duration'])
+    sampleRate = int(info['streams'][0]['sample_rate'])
+  except (ValueError, KeyError, IndexError, TypeError):
+    return None
+
+  return duration, sampleRate
+
+def outputSampleRate(sampleRate: int) -> int:
+  """
+  Gets the sample rate of an MP3 stream encoded from an input stream.
+
+  sampleRate : int
+    Input sample rate, Hz.
+
+  Returns:
+    Output sample rate, Hz : int.
+  """
+  return sampleRate if sampleRate in MP3_SAMPLE_RATES else 44100
+
+def frameSamples(sampleRate: int) -> int:
+  """
+  Gets the number of samples in an MPEG Layer III frame.
+
+  sampleRate : int
+    Sample rate, Hz.
+
+  Returns:
+    Samples per frame : int.
+  """
+  return 1152 if sampleRate >= 32000 else 576 # MPEG-1 or MPEG-2/2.5
+
+def planSegments(duration   : float, sampleRate: int, nSegments: int,
+                 minSeconds : float=60.0) -> \
+    tp.List[tp.Tuple[int, tp.Optional[int]]]:
+  """
+  Splits an audio stream into segments on MP3 frame boundaries.
+
+  duration : float
+    Duration, seconds.
+
+  sampleRate : int
+    Output sample rate, Hz.
+
+  nSegments : int
+    Maximum number of segments.
+
+  minSeconds : float
+    Minimum segment duration, seconds. Defaults to 60.0.
+
+  Returns:
+    List of the first frame and the frame after the last one (None for
+        the last segment, which is encoded to the end of the input) :
+        List[Tuple[int, Optional[int]]].
+  """
+
+  nFrames   = math.ceil(duration * sampleRate / frameSamples(sampleRate))
+  nSegments = max(1, min(nSegments, int(duration // minSeconds)))
+  bounds    = [round(i * nFrames / nSegments) for i in range(nSegments)]
+
+  return [(bounds[i], bounds[i+1] if i + 1 < nSegments else None)
+          for i in range(nSegments)]
+
+def buildSegmentCmd(fileFullName : str, sampleRate: int, startFrame: int,
+                    endFrame     : tp.Optional[int], kbps: str,
+                    output       : str) -> tp.List[str]:
+  """
+  Builds a command encoding a segment of an audio file to MP3 frames
+      without a bit reservoir, tags and a Xing header, so that frames of
+      segments can be joined. The segment starts "PREROLL_FRAMES" early and
+      ends "POSTROLL_FRAMES" late to prime and flush the encoder.
+
+  fileFullName : str
+    Input file name.
+
+  sampleRate : int
+    Output sample rate, Hz.
+
+  startFrame : int
+    First frame of the segment.
+
+  endFrame : int
+    Frame after the last frame of the segment, None to encode to the end
+        of the input.
+
+  kbps : str
+    Encode kbps.
+
+  output : str
+    Encoded segment file name.
+
+  Returns:
+    Converter command : List[str].
+  """
+
+  samples = frameSamples(sampleRate)
+  first   = max(startFrame - PREROLL_FRAMES, 0)
+
+  cmd = ['ffmpeg', '-ss', f'{first * samples / sampleRate:.6f}']
+  if endFrame is not None:
+    last = endFrame + POSTROLL_FRAMES
+    cmd += ['-t', f'{(last - first) * samples / sampleRate:.6f}']
+  cmd += ['-i', f'{fileFullName}', '-vn', '-sn', '-dn',
+          '-map', 'a', '-codec:a', 'libmp3lame', '-b:a', f'{kbps}k',
+          '-ar', str(sampleRate), '-reservoir', '0',
+          '-map_metadata', '-1', '-id3v2_version', '0', '-write_xing', '0',
+          '-f', 'mp3', output]
+
+  return cmd
+
+def segmentRange(segmentFile : str, startFrame: int,
+                 endFrame    : tp.Optional[int]) -> \
+    tp.Tuple[int, int, int, bytes]:
+  """
+  Finds the frames of an encoded segment which belong to the segment
+      (pre-roll and post-roll frames are dropped).
+
+  segmentFile : str
+    Encoded segment file name.
+
+  startFrame : int
+    First frame of the segment.
+
+  endFrame : int
+    Frame after the last frame of the segment, None for the last segment.
+
+  Returns:
+    Byte offset of the first frame : int.
+    Byte offset after the last frame : int.
+    Number of frames : int.
+    Header of the first frame : bytes.
+  """
+
+  skip = startFrame - max(startFrame - PREROLL_FRAMES, 0) # pre-roll frames
+  keep = None if endFrame is None else endFrame - startFrame
+
+  with open(segmentFile, 'rb') as f:
+    data = f.read()
+
+  start  = None
+  header = b''
+  pos    = 0
+  index  = 0
+  while pos + 4 <= len(data):
+    frame = hf.parseMPEGFrame(data[pos:pos+4])
+    if frame is None:
+      raise ValueError(f'"{segmentFile}" contains no MPEG frame at byte ' +
+                       f'{pos}!')
+    if index == skip:
+      start  = pos
+      header = data[pos:pos+4]
+    pos   += frame['length']
+    index += 1
+    if keep is not None and index == skip + keep:
+      break
+
+  if start is None or pos > len(data):
+    raise ValueError(f'"{segmentFile}" is shorter than its segment!')
+
+  return start, pos, index - skip, header
+
+def buildInfoFrame(header : bytes, nFrames: int, nBytes: int, kbps: int,
+                   delay  : int, padding: int) -> bytes:
+  """
+  Builds an empty MPEG frame with an Info (constant bitrate Xing) header
+      and a LAME tag carrying the encoder delay and padding for gapless
+      playback.
+
+  header : bytes
+    Header of an audio frame of the stream.
+
+  nFrames : int
+    Number of audio frames.
+
+  nBytes : int
+    Size of the audio frames and the Info frame, bytes.
+
+  kbps : int
+    Stream bitrate, kbps.
+
+  delay : int
+    Encoder delay, samples.
+
+  padding : int
+    Samples padded at the end of the stream.
+
+  Returns:
+    Info frame : bytes, b'' if the header is not a Layer III header.
+  """
+
+  header = bytearray(header)
+  header[1] |= 0x01  # no CRC
+  header[2] &= ~0x02 # no padding
+
+  frame = hf.parseMPEGFrame(bytes(header))
+  if frame is None or frame['layer'] != 3:
+    return b''
+
+  # Info header follows side information
+  if frame['version'] == 1:
+    xingPos = 21 if frame['mono'] else 36
+  else:
+    xingPos = 13 if frame['mono'] else 21
+  lamePos = xingPos + 120 # after flags, frames, bytes, TOC and quality
+
+  # use a larger bitrate index if the tags do not fit the frame
+  bitrateIdx = header[2] >> 4
+  while frame['length'] < lamePos + 36 and bitrateIdx < 14:
+    bitrateIdx += 1
+    header[2] = bitrateIdx << 4 | header[2] & 0x0F
+    frame = hf.parseMPEGFrame(bytes(header))
+  if frame['length'] < lamePos + 36:
+    return b''
+
+  data = bytearray(frame['length'])
+  data[:4] = header
+  toc = bytes(i * 256 // 100 for i in range(100)) # linear for CBR
+  data[xingPos:lamePos] = b'Info' + struct.pack('>III', 0x0F, nFrames,
+                                                nBytes) + toc + bytes(4)
+
+  delay   = min(max(delay, 0), 4095)
+  padding = min(max(padding, 0), 4095)
+  data[lamePos:lamePos+34] = b'LAME3.100' + bytes([0x01, 0]) + bytes(9) + \
+                             bytes([min(kbps, 255)]) + \
+                             (delay << 12 | padding).to_bytes(3, 'big') + \
+                             bytes(4) + struct.pack('>I', nBytes) + bytes(2)
+  data[lamePos+34:lamePos+36] = struct.pack('>H',
+                                            crc16(data[:lamePos+34]))
+
+  return bytes(data)
+
+def joinSegments(segments : tp.List[tp.Tuple[str, int, tp.Optional[int]]],
+                 outFd    : int, nSamples: int, title: str,
+                 artist   : str) -> None:
+  """
+  Joins encoded segments into an MP3 file with a minimal ID3v2 tag and
+      an Info frame with gapless playback information.
+
+  segments : List[Tuple[str, int, Optional[int]]]
+    List of encoded segment file name, first frame and frame after the last
+        frame (None for the last segment) in order.
+
+  outFd : int
+    Output file descriptor (an empty file).
+
+  nSamples : int
+    Number of samples of the input stream.
+
+  title : str
+    Song title.
+
+  artist : str
+    Song artist.
+
+  Returns None.
+  """
+
+  ranges = [segmentRange(*segment) for segment in segments]
+  header = ranges[0][3]
+  frame  = hf.parseMPEGFrame(header)
+
+  nFrames = sum(r[2] for r in ranges)
+  nBytes  = sum(r[1] - r[0] for r in ranges)
+  padding = nFrames * frame['samples'] - LAME_DELAY - nSamples
+
+  info = buildInfoFrame(header, nFrames, 0, frame['bitrate'], LAME_DELAY,
+                        padding)
+  if info != b'': # write the size including the Info frame
+    info = buildInfoFrame(header, nFrames, nBytes + len(info),
+                          frame['bitrate'], LAME_DELAY, padding)
+
+  for data in (tg.buildID3v2(title, artist), info):
+    view = memoryview(data)
+    while view:
+      view = view[os.write(outFd, view):]
+
+  for (segmentFile, _, _), (start, end, _, _) in zip(segments, ranges):
+    with open(segmentFile, 'rb') as f:
+      tg.copyFileRange(f.fileno(), outFd, start, end - start)
+
+  return None
@@ -1,6 +1,10 @@
 import datetime as dt
+import os
 import shutil
+import subprocess as sp
 import sys
+import time
+import typing as tp
 
 import psutil
 
@@ -60,6 +64,65 @@ def nPhysicalCores() -> int:
   """
   return psutil.cpu_count(logical=False)
 
+def maxCmdLength() -> int:
+  """
+  Get maximum length of a command line (arguments and environment).
+
+  Returns:
+    Maximum command line length, bytes : int.
+  """
+
+  if sys.platform.startswith('win'): # CreateProcess limit, characters
+    return 32767
+
+  try:
+    argMax = os.sysconf('SC_ARG_MAX')
+  except (AttributeError, ValueError, OSError):
+    argMax = -1
+  if argMax < 1: # limit is not available, use the POSIX minimum
+    argMax = 4096
+
+  # the environment shares the limit with the arguments
+  envLength = sum(len(key) + len(value) + 2
+                  for key, value in os.environ.items())
+
+  return argMax - envLength
+
+def runCountingReads(cmd: tp.List[str]) -> tp.Tuple[bytes, tp.Optional[int]]:
+  """
+  Runs a command and counts bytes it read (read calls, page cache hits
+      included). The count is taken from "/proc/<pid>/io" after the command
+      exits and before it is reaped.
+
+  cmd : List[str]
+    Command and its arguments.
+
+  Returns:
+    Standard output of the command : bytes.
+    Number of bytes read by the command : int, or None if it is not
+        reported by the system.
+  """
+
+  process = sp.Popen(cmd, stdin=sp.DEVNULL, stdout=sp.PIPE)
+  try:
+    stdout = process.stdout.read()
+    process.stdout.close()
+
+    bytesRead = None
+    if hasattr(os, 'waitid'): # wait for the exit without reaping
+      try:
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        with open(f'/proc/{process.pid}/io') as io:
+          for line in io:
+            if line.startswith('rchar:'):
+              bytesRead = int(line.split()[1])
+      except (OSError, ValueError):
+        pass
+  finally:
+    process.wait()
+
+  return stdout, bytesRead
+
 def getTimeStamp() -> str:
   """
   Get current timestamp.
@@ -73,3 +136,155 @@ def getTimeStamp() -> str:
 
   return timestamp
 
+def systemLoad() -> tp.Tuple[float, float, float]:
+  """
+  Get system load since the previous call (the first call measures
+      since the module import).
+
+  Returns:
+    CPU utilisation, % : float.
+    I/O wait, % of CPU time (0 if not reported by the system) : float.
+    Available memory, % : float.
+  """
+
+  cpuPercent = psutil.cpu_percent(interval=None)
+  ioWait     = getattr(psutil.cpu_times_percent(interval=None), 'iowait', 0.0)
+  memPercent = 100 - psutil.virtual_memory().percent
+
+  return cpuPercent, ioWait, memPercent
+
+class ConcurrencyController:
+  """
+  Adapts the number of concurrent jobs to the system load and to the
+      observed job throughput.
+
+  The number of jobs is lowered when available memory is low, I/O wait
+      or CPU utilisation is high, and raised while the CPU has spare
+      capacity. An increase which does not raise the estimated total
+      throughput (per-job throughput times the number of jobs) is reverted
+      and not retried for a few intervals.
+
+  nProcs : int
+    Initial number of concurrent jobs.
+
+  minProcs : int
+    Minimum number of concurrent jobs. Defaults to 1.
+
+  maxProcs : int
+    Maximum number of concurrent jobs.
+    Defaults to None (number of CPU logical cores).
+
+  interval : float
+    Minimum time between adjustments, seconds. Defaults to 2.0.
+
+  cpuHigh : float
+    CPU utilisation (%) above which the number of jobs is lowered.
+    Defaults to 95.0.
+
+  cpuLow : float
+    CPU utilisation (%) below which the number of jobs is raised.
+    Defaults to 80.0.
+
+  ioWaitHigh : float
+    I/O wait (%) above which the number of jobs is lowered.
+    Defaults to 20.0.
+
+  memLow : float
+    Available memory (%) below which the number of jobs is lowered.
+    Defaults to 10.0.
+  """
+
+  def __init__(self, nProcs     : int,
+                     minProcs   : int=1,
+                     maxProcs   : tp.Optional[int]=None,
+                     interval   : float=2.0,
+                     cpuHigh    : float=95.0,
+                     cpuLow     : float=80.0,
+                     ioWaitHigh : float=20.0,
+                     memLow     : float=10.0) -> None:
+    if maxProcs is None:
+      maxProcs = max(psutil.cpu_count(logical=True) or 1, minProcs)
+
+    # check bounds provided
+    for name, value in (('nProcs', nProcs), ('minProcs', minProcs),
+                        ('maxProcs', maxProcs)):
+      if not isinstance(value, int):
+        raise TypeError(f'"{name}" must be an integer ' +
+                        f'("{type(value)}" was provided)!')
+      if value < 1:
+        raise ValueError(f'"{name}" must be positive ' +
+                         f'("{value}" was provided)!')
+    if minProcs > maxProcs:
+      raise ValueError(f'"minProcs" ({minProcs}) must not be greater ' +
+                       f'than "maxProcs" ({maxProcs})!')
+
+    self.nProcs     = min(max(nProcs, minProcs), maxProcs)
+    self.minProcs   = minProcs
+    self.maxProcs   = maxProcs
+    self.interval   = interval
+    self.cpuHigh    = cpuHigh
+    self.cpuLow     = cpuLow
+    self.ioWaitHigh = ioWaitHigh
+    self.memLow     = memLow
+
+    self.lastUpdate = time.perf_counter()
+    self.rates      = []   # per-job throughput since the last adjustment
+    self.lastTotal  = None # estimated total throughput before an increase
+    self.holdUntil  = 0.0  # no increases before this time
+    self.history    = []   # (time, number of jobs, reason)
+
+    systemLoad() # start measuring the load
+
+  def jobDone(self, nBytes: int, seconds: float) -> int:
+    """
+    Records a finished job and adjusts the number of concurrent jobs
+        at most every "interval" seconds.
+
+    nBytes : int
+      Input bytes processed by the job.
+
+    seconds : float
+      Job wall time, seconds.
+
+    Returns:
+      Number of concurrent jobs : int.
+    """
+
+    if seconds > 0:
+      self.rates.append(nBytes / seconds)
+
+    now = time.perf_counter()
+    if now - self.lastUpdate < self.interval:
+      return self.nProcs
+
+    cpuPercent, ioWait, memPercent = systemLoad()
+    total = sum(self.rates) / len(self.rates) * self.nProcs \
+            if self.rates else None
+
+    nProcs = self.nProcs
+    if memPercent < self.memLow:
+      nProcs, reason = nProcs - 1, f'available memory {memPercent:.0f}%'
+    elif ioWait > self.ioWaitHigh:
+      nProcs, reason = nProcs - 1, f'I/O wait {ioWait:.0f}%'
+    elif cpuPercent > self.cpuHigh:
+      nProcs, reason = nProcs - 1, f'CPU {cpuPercent:.0f}%'
+    elif self.lastTotal is not None and total is not None and \
+        total < self.lastTotal:
+      # the last increase did not pay off, revert it and wait
+      nProcs, reason = nProcs - 1, 'throughput did not increase'
+      self.holdUntil = now + 5*self.interval
+    elif cpuPercent < self.cpuLow and now >= self.holdUntil:
+      nProcs, reason = nProcs + 1, f'CPU {cpuPercent:.0f}%'
+    else:
+      reason = None
+
+    nProcs = min(max(nProcs, self.minProcs), self.maxProcs)
+    self.lastTotal = total if nProcs > self.nProcs else None
+    if nProcs != self.nProcs:
+      self.history.append((now, nProcs, reason))
+      self.nProcs = nProcs
+
+    self.rates      = []
+    self.lastUpdate = now
+
+    return self.nProcs
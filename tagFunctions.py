@@ -0,0 +1,234 @@
+import errno
+import os
+import struct
+import typing as tp
+
+import headerFunctions as hf
+
+COPY_SIZE = 1 << 20 # bytes copied by a single system call
+
+def synchsafe(value: int) -> bytes:
+  """
+  Encodes an ID3v2 synchsafe integer (7 bits per byte).
+
+  value : int
+    Integer below 2**28.
+
+  Returns:
+    Synchsafe integer : bytes.
+  """
+  return bytes([value >> 21 & 0x7F, value >> 14 & 0x7F,
+                value >> 7 & 0x7F, value & 0x7F])
+
+def unsynchsafe(data: bytes) -> int:
+  """
+  Decodes an ID3v2 synchsafe integer (7 bits per byte).
+
+  data : bytes
+    Synchsafe integer, 4 bytes.
+
+  Returns:
+    Integer : int.
+  """
+  return ((data[0] & 0x7F) << 21 | (data[1] & 0x7F) << 14 |
+          (data[2] & 0x7F) << 7 | (data[3] & 0x7F))
+
+def buildID3v2(title: str, artist: str) -> bytes:
+  """
+  Builds a minimal ID3v2.4 tag with Title and Artist UTF-8 text frames.
+
+  title : str
+    Song title, '' to omit the frame.
+
+  artist : str
+    Song artist, '' to omit the frame.
+
+  Returns:
+    ID3v2.4 tag, b'' if there are no frames : bytes.
+  """
+
+  frames = b''
+  for frameId, value in ((b'TIT2', title), (b'TPE1', artist)):
+    if value == '':
+      continue
+    data    = b'\x03' + value.encode('utf-8') # encoding byte: UTF-8
+    frames += frameId + synchsafe(len(data)) + b'\x00\x00' + data
+
+  if frames == b'':
+    return b''
+
+  return b'ID3\x04\x00\x00' + synchsafe(len(frames)) + frames
+
+def findAudioEnd(f: tp.BinaryIO, audioStart: int, fileSize: int) -> int:
+  """
+  Finds the end of the audio data before tags appended to a file
+      (ID3v1, Enhanced TAG, APEv1/APEv2, Lyrics3v2 and ID3v2 with a footer,
+      in any order).
+
+  f : BinaryIO
+    File opened in binary mode.
+
+  audioStart : int
+    Offset of the audio data.
+
+  fileSize : int
+    File size, bytes.
+
+  Returns:
+    End offset of the audio data : int.
+  """
+
+  end = fileSize
+  while end > audioStart:
+    f.seek(max(end - 128, audioStart))
+    tail = f.read(end - max(end - 128, audioStart))
+
+    if len(tail) == 128 and tail[:3] == b'TAG': # ID3v1
+      end -= 128
+      if end - 227 >= audioStart: # Enhanced TAG precedes ID3v1
+        f.seek(end - 227)
+        if f.read(4) == b'TAG+':
+          end -= 227
+    elif len(tail) >= 32 and tail[-32:-24] == b'APETAGEX': # APE footer
+      size  = struct.unpack('<I', tail[-20:-16])[0] # items and footer
+      flags = struct.unpack('<I', tail[-12:-8])[0]
+      end -= size + (32 if flags & 0x80000000 else 0) # with a header
+    elif len(tail) >= 10 and tail[-10:-7] == b'3DI': # ID3v2 footer
+      end -= unsynchsafe(tail[-4:]) + 20
+    elif tail[-9:] == b'LYRICS200' and tail[-15:-9].isdigit(): # Lyrics3v2
+      end -= int(tail[-15:-9]) + 15
+    else:
+      break
+
+  return max(end, audioStart)
+
+def findMP3Audio(f: tp.BinaryIO) -> tp.Optional[tp.Tuple[int, int]]:
+  """
+  Finds the MPEG audio frames of an MP3 file between leading and trailing
+      tags.
+
+  f : BinaryIO
+    File opened in binary mode.
+
+  Returns:
+    Start and end offsets of the audio frames : Tuple[int, int],
+        or None if the file does not start with MPEG audio frames after
+        its tags.
+  """
+
+  fileSize = os.fstat(f.fileno()).st_size
+
+  # skip leading ID3v2 tags (several tags may follow each other)
+  f.seek(0)
+  audioStart = 0
+  while True:
+    tagEnd, _ = hf.parseID3v2(f)
+    if tagEnd == 0 or tagEnd <= audioStart:
+      break
+    audioStart = tagEnd
+
+  # the first frame must follow the tags, other data is left to ffmpeg
+  f.seek(audioStart)
+  pos, frame = hf.findMPEGFrame(f.read(hf.HEAD_SIZE))
+  if pos != 0 or frame is None:
+    return None
+
+  audioEnd = findAudioEnd(f, audioStart, fileSize)
+  if audioEnd - audioStart < frame['length']:
+    return None
+
+  return audioStart, audioEnd
+
+def copyFileRange(inFd: int, outFd: int, offset: int, count: int) -> None:
+  """
+  Copies a byte range of a file to the current position of another file
+      in the kernel ("copy_file_range" or "sendfile") if possible.
+
+  inFd : int
+    Input file descriptor.
+
+  outFd : int
+    Output file descriptor.
+
+  offset : int
+    Input byte range offset.
+
+  count : int
+    Input byte range length, bytes.
+
+  Returns None.
+  """
+
+  end = offset + count
+
+  # errors of file systems or platforms not supporting a system call
+  unsupported = (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP,
+                 errno.ENOTSUP, errno.ENOTSOCK)
+
+  for method in ('copy_file_range', 'sendfile'):
+    if not hasattr(os, method):
+      continue
+    try:
+      while offset < end:
+        size = min(end - offset, COPY_SIZE)
+        if method == 'copy_file_range':
+          nBytes = os.copy_file_range(inFd, outFd, size, offset)
+        else:
+          nBytes = os.sendfile(outFd, inFd, offset, size)
+        if nBytes == 0:
+          raise OSError(errno.EIO, 'Unexpected end of file')
+        offset += nBytes
+      return None
+    except OSError as err:
+      if err.errno not in unsupported:
+        raise
+
+  # copy in user space
+  while offset < end:
+    data = os.pread(inFd, min(end - offset, COPY_SIZE), offset)
+    if data == b'':
+      raise OSError(errno.EIO, 'Unexpected end of file')
+    view = memoryview(data)
+    while view:
+      view = view[os.write(outFd, view):]
+    offset += len(data)
+
+  return None
+
+def rewriteMP3Tags(inFullName: str, outFd: int, title: str,
+                   artist: str) -> bool:
+  """
+  Writes an MP3 file with all tags replaced by a minimal ID3v2.4 tag with
+      Title and Artist, the audio frames are copied unchanged.
+
+  inFullName : str
+    Input MP3 file full name.
+
+  outFd : int
+    Output file descriptor (an empty file).
+
+  title : str
+    Song title.
+
+  artist : str
+    Song artist.
+
+  Returns:
+    True if the file was written, False if the input is not a plain
+        MP3 file (nothing is written) : bool.
+  """
+
+  with open(inFullName, 'rb') as f:
+    try:
+      region = findMP3Audio(f)
+    except (struct.error, IndexError, ValueError):
+      region = None
+    if region is None:
+      return False
+
+    tag  = memoryview(buildID3v2(title, artist))
+    while tag:
+      tag = tag[os.write(outFd, tag):]
+    copyFileRange(f.fileno(), outFd, region[0], region[1] - region[0])
+
+  return True
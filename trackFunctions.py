@@ -0,0 +1,389 @@
+import array
+import csv
+import os
+import struct
+import sys
+import typing as tp
+
+import headerFunctions as hf
+
+TRACKS_MAGIC   = b'AFOTRACK' # binary track file signature
+TRACKS_VERSION = 1
+
+# string columns of a track table in file order
+STR_COLUMNS = ('fullName', 'fileName', 'extension', 'bitrateType', 'title',
+               'artist', 'newFileName', 'newTitle', 'newArtist')
+
+class Track:
+  """
+  Track record.
+
+  fullName : str
+    File full name.
+
+  fileName : str
+    File name.
+
+  extension : str
+    File extension.
+
+  bitrateType : str
+    Bitrate Type.
+
+  kbps : float
+    Bitrate (kbps), 0 if unknown.
+
+  title : str
+    Song title.
+
+  artist : str
+    Song artist.
+
+  sizeBytes : int
+    File size in bytes.
+
+  newFileName : str
+    Converted file name (no extension), '' if the file is not converted.
+
+  newTitle : str
+    Converted file title.
+
+  newArtist : str
+    Converted file artist.
+  """
+
+  __slots__ = ('fullName', 'fileName', 'extension', 'bitrateType', 'kbps',
+               'title', 'artist', 'sizeBytes', 'newFileName', 'newTitle',
+               'newArtist')
+
+  def __init__(self,
+               fullName    : str,
+               fileName    : str,
+               extension   : str,
+               bitrateType : str,
+               kbps        : float,
+               title       : str,
+               artist      : str,
+               sizeBytes   : int,
+               newFileName : str='',
+               newTitle    : str='',
+               newArtist   : str='') -> None:
+    self.fullName    = fullName
+    self.fileName    = fileName
+    self.extension   = extension
+    self.bitrateType = bitrateType
+    self.kbps        = kbps
+    self.title       = title
+    self.artist      = artist
+    self.sizeBytes   = sizeBytes
+    self.newFileName = newFileName
+    self.newTitle    = newTitle
+    self.newArtist   = newArtist
+
+class TrackTable:
+  """
+  Column-oriented table of tracks. String fields are stored in lists,
+      numeric fields in typed arrays.
+
+  rootPath : str
+    Input root folder path.
+  """
+
+  __slots__ = ('rootPath', 'kbps', 'sizeBytes', *STR_COLUMNS)
+
+  def __init__(self, rootPath: str='') -> None:
+    self.rootPath  = rootPath
+    self.kbps      = array.array('d')
+    self.sizeBytes = array.array('q')
+    for column in STR_COLUMNS:
+      setattr(self, column, [])
+
+  def __len__(self) -> int:
+    return len(self.fullName)
+
+  def __getitem__(self, i: int) -> Track:
+    return Track(self.fullName[i], self.fileName[i], self.extension[i],
+                 self.bitrateType[i], self.kbps[i], self.title[i],
+                 self.artist[i], self.sizeBytes[i], self.newFileName[i],
+                 self.newTitle[i], self.newArtist[i])
+
+  def append(self, track: Track) -> None:
+    """
+    Appends a track to the table.
+
+    track : Track
+      Track record.
+
+    Returns None.
+    """
+
+    self.kbps.append(track.kbps)
+    self.sizeBytes.append(track.sizeBytes)
+    for column in STR_COLUMNS:
+      getattr(self, column).append(getattr(track, column))
+
+    return None
+
+  def selected(self) -> tp.List[int]:
+    """
+    Gets indices of the tracks to convert (with a new file name).
+
+    Returns:
+      List of track indices : List[int].
+    """
+    return [i for i, name in enumerate(self.newFileName) if name != '']
+
+def parsekbps(kbps: str) -> float:
+  """
+  Parses a CSV Bitrate (kbps) value, e.g. "1 411,2".
+
+  kbps : str
+    Bitrate (kbps).
+
+  Returns:
+    Bitrate (kbps), 0 if empty : float.
+  """
+
+  kbps = kbps.replace(' ', '').replace(',', '.')
+  if kbps == '':
+    return 0.0
+
+  return float(kbps)
+
+def kbpsText(kbps: float) -> str:
+  """
+  Formats a Bitrate (kbps) value for a CSV file.
+
+  kbps : float
+    Bitrate (kbps), 0 if unknown.
+
+  Returns:
+    Bitrate (kbps), '' if unknown : str.
+  """
+  return '' if kbps == 0 else hf.formatkbps(kbps * 1000)
+
+def readTracksCSV(infoFile: str) -> TrackTable:
+  """
+  Reads tracks from a CSV file written by "getInfo". Wrong "kb/s" and
+      "Size, bytes" values are read as unknown (0) in rows which are not
+      selected for conversion (no new file name).
+
+  infoFile : str
+    A csv file containing infromation about files.
+
+  Returns:
+    Table of tracks : TrackTable.
+  """
+
+  with open(infoFile, 'r', newline='') as csvfile:
+    reader = csv.reader(csvfile, dialect='excel')
+
+    # extract the root folder path
+    # NOTE: regex was not used because the path may contain brackets
+    header         = next(reader, ['']) # read and skip the header line
+    openBracketIdx = header[0].find('(')
+    rootPath       = header[0][openBracketIdx+1:-1] \
+                     if openBracketIdx > -1 else ''
+    if rootPath == '':
+      raise ValueError(f'The header of "{infoFile}" does not contain ' +
+                       'the root folder ("Full Name (<root folder>)")!')
+
+    tracks = TrackTable(rootPath)
+    for n, row in enumerate(reader, 2):
+      if len(row) < 8: # not a file row
+        continue
+      row += ['']*(11 - len(row)) # rows without new values
+
+      try:
+        kbps = parsekbps(row[4])
+      except ValueError:
+        kbps = None
+      try:
+        sizeBytes = int(row[7]) if row[7] != '' else 0
+      except ValueError:
+        sizeBytes = None
+
+      # wrong values only matter for files selected for conversion,
+      # they are unknown in other rows
+      if kbps is None or sizeBytes is None:
+        if row[8] != '':
+          raise ValueError(f'Line {n} of "{infoFile}" contains a wrong ' +
+                           f'"kb/s" ("{row[4]}") or "Size, bytes" ' +
+                           f'("{row[7]}") value!')
+        kbps      = 0.0 if kbps is None else kbps
+        sizeBytes = 0 if sizeBytes is None else sizeBytes
+
+      tracks.append(Track(row[0], row[1], row[2], row[3], kbps, row[5],
+                          row[6], sizeBytes, row[8], row[9], row[10]))
+
+  return tracks
+
+def writeTracksCSV(tracks: TrackTable, outFullName: str) -> None:
+  """
+  Writes tracks to an editable CSV file.
+
+  tracks : TrackTable
+    Table of tracks.
+
+  outFullName : str
+    Output CSV file full name.
+
+  Returns None.
+  """
+
+  with open(outFullName, mode='w', newline='') as outcsv:
+    writer = csv.writer(outcsv, dialect='excel')
+
+    # write a header
+    writer.writerow([f'Full Name ({tracks.rootPath})', 'File Name',
+                     'Extension', 'Bitrate Type', 'kb/s', 'Title', 'Artist',
+                     'Size, bytes', 'File Name (no extension, new)',
+                     'Title (new)', 'Artist (new)'])
+
+    for i in range(len(tracks)):
+      writer.writerow([tracks.fullName[i], tracks.fileName[i],
+                       tracks.extension[i], tracks.bitrateType[i],
+                       kbpsText(tracks.kbps[i]), tracks.title[i],
+                       tracks.artist[i], tracks.sizeBytes[i],
+                       tracks.newFileName[i], tracks.newTitle[i],
+                       tracks.newArtist[i]])
+
+  return None
+
+def writeTracks(tracks: TrackTable, outFullName: str) -> None:
+  """
+  Writes tracks to a binary column-oriented track file.
+
+  tracks : TrackTable
+    Table of tracks.
+
+  outFullName : str
+    Output track file full name.
+
+  Returns None.
+  """
+
+  def packColumn(values: tp.List[str]) -> bytes:
+    blob = '\x00'.join(values)
+    if blob.count('\x00') != max(len(values) - 1, 0):
+      raise ValueError('Track fields must not contain null characters!')
+    blob = blob.encode('utf-8', errors='surrogateescape')
+    return struct.pack('<Q', len(blob)) + blob
+
+  def packArray(values: array.array) -> bytes:
+    values = array.array(values.typecode, values)
+    if sys.byteorder == 'big': # the file is little-endian
+      values.byteswap()
+    return values.tobytes()
+
+  with open(outFullName, 'wb') as outFile:
+    outFile.write(struct.pack('<8sIQ', TRACKS_MAGIC, TRACKS_VERSION,
+                              len(tracks)))
+    outFile.write(packColumn([tracks.rootPath]))
+    for column in STR_COLUMNS:
+      outFile.write(packColumn(getattr(tracks, column)))
+    outFile.write(packArray(tracks.kbps))
+    outFile.write(packArray(tracks.sizeBytes))
+
+  return None
+
+def readTracks(infoFile: str) -> TrackTable:
+  """
+  Reads tracks from a binary column-oriented track file.
+
+  infoFile : str
+    Track file full name.
+
+  Returns:
+    Table of tracks : TrackTable.
+  """
+
+  with open(infoFile, 'rb') as inFile:
+    data = memoryview(inFile.read())
+
+  magic, version, nTracks = struct.unpack_from('<8sIQ', data)
+  if magic != TRACKS_MAGIC or version != TRACKS_VERSION:
+    raise ValueError(f'"{infoFile}" is not a supported track file!')
+  pos = struct.calcsize('<8sIQ')
+
+  def unpackColumn(n: int) -> tp.List[str]:
+    nonlocal pos
+    length = struct.unpack_from('<Q', data, pos)[0]
+    blob   = bytes(data[pos+8:pos+8+length])
+    pos   += 8 + length
+    if n == 0:
+      return []
+    values = blob.decode('utf-8', errors='surrogateescape').split('\x00')
+    if len(values) != n:
+      raise ValueError(f'"{infoFile}" is corrupted!')
+    return values
+
+  def unpackArray(typecode: str) -> array.array:
+    nonlocal pos
+    values = array.array(typecode)
+    length = values.itemsize * nTracks
+    values.frombytes(data[pos:pos+length])
+    pos   += length
+    if sys.byteorder == 'big': # the file is little-endian
+      values.byteswap()
+    return values
+
+  tracks = TrackTable(unpackColumn(1)[0])
+  for column in STR_COLUMNS:
+    setattr(tracks, column, unpackColumn(nTracks))
+  tracks.kbps      = unpackArray('d')
+  tracks.sizeBytes = unpackArray('q')
+
+  return tracks
+
+def isTrackFile(infoFile: str) -> bool:
+  """
+  Checks whether a file is a binary track file.
+
+  infoFile : str
+    File full name.
+
+  Returns:
+    True for a binary track file, False otherwise (e.g. a CSV file) : bool.
+  """
+
+  with open(infoFile, 'rb') as inFile:
+    return inFile.read(len(TRACKS_MAGIC)) == TRACKS_MAGIC
+
+def loadTracks(infoFile: str) -> TrackTable:
+  """
+  Reads tracks from a binary track file or a CSV file.
+
+  infoFile : str
+    Track file or CSV file full name.
+
+  Returns:
+    Table of tracks : TrackTable.
+  """
+
+  if isTrackFile(infoFile):
+    return readTracks(infoFile)
+
+  return readTracksCSV(infoFile)
+
+def convertTrackFile(inFullName: str, outFullName: str) -> None:
+  """
+  Converts a CSV file to a binary track file and vice versa, the output
+      format is defined by the output file extension (".csv" for CSV).
+
+  inFullName : str
+    Input track file or CSV file full name.
+
+  outFullName : str
+    Output file full name.
+
+  Returns None.
+  """
+
+  tracks = loadTracks(inFullName)
+  if os.path.splitext(outFullName)[1].lower() == '.csv':
+    writeTracksCSV(tracks, outFullName)
+  else:
+    writeTracks(tracks, outFullName)
+
+  return None
@@ -0,0 +1,361 @@
+import os
+import time
+import typing as tp
+
+import audioConverter as ac
+import cacheFunctions as cf
+import fileFunctions as ff
+import namingFunctions as nf
+import profileFunctions as pf
+import sysFunctions as sf
+import trackFunctions as tf
+
+def probeTracks(files     : tp.List[str],
+                snapshot  : tp.Dict[str, tp.Tuple[str, os.stat_result]],
+                rootPath  : str,
+                **kwargs) -> tf.TrackTable:
+  """
+  Probes files of a snapshot into a table of tracks.
+
+  files : List[str]
+    File full names.
+
+  snapshot : Dict[str, Tuple[str, os.stat_result]]
+    Snapshot the files belong to (as returned by "takeSnapshot").
+
+  rootPath : str
+    Input root folder path.
+
+  kwargs
+    "getMetadata" keyword arguments.
+
+  Returns:
+    Table of tracks (not named) : TrackTable.
+  """
+
+  fileNames = [snapshot[file][0] for file in files]
+  fileStats = [snapshot[file][1] for file in files]
+
+  bitrateType, kbps, title, artist = \
+      ff.getMetadata(files, fileStats=fileStats, **kwargs)
+  extensions = ff.getFileExtension(fileNames)
+
+  tracks = tf.TrackTable(rootPath)
+  for i in range(len(files)):
+    tracks.append(tf.Track(files[i], fileNames[i], extensions[i],
+                           bitrateType[i], tf.parsekbps(kbps[i]), title[i],
+                           artist[i], fileStats[i].st_size))
+
+  return tracks
+
+def outputName(track: tf.Track, rootPath: str, folderOut: str) -> str:
+  """
+  Gets the converted file full name of a track without an extension.
+
+  track : Track
+    Track record.
+
+  rootPath : str
+    Input root folder path.
+
+  folderOut : str
+    Output folder path.
+
+  Returns:
+    Converted file full name (no extension), '' if the track is not
+        converted : str.
+  """
+
+  if track.newFileName == '':
+    return ''
+
+  outPath = ac.getOutFolders(rootPath, os.path.split(rootPath)[-1],
+                             folderOut, [track.fullName],
+                             [track.fileName])[0]
+
+  return os.path.join(outPath, track.newFileName)
+
+def removeOutput(outFullName: str, extensions: tp.Iterable[str]) -> None:
+  """
+  Removes a converted file and its folder if the folder becomes empty.
+
+  outFullName : str
+    Converted file full name (no extension).
+
+  extensions : Iterable[str]
+    Extensions the converted file may have (one per output profile).
+
+  Returns None.
+  """
+
+  for extension in extensions:
+    try:
+      os.remove(outFullName + '.' + extension)
+    except OSError:
+      pass
+
+  try:
+    os.rmdir(os.path.dirname(outFullName)) # fails if not empty
+  except OSError:
+    pass
+
+  return None
+
+def writeLibrary(tracks      : tp.Dict[str, tf.Track], rootPath: str,
+                 libraryFile : str) -> None:
+  """
+  Atomically replaces the library CSV file.
+
+  tracks : Dict[str, Track]
+    Tracks by file full name.
+
+  rootPath : str
+    Input root folder path.
+
+  libraryFile : str
+    Library CSV file full name.
+
+  Returns None.
+  """
+
+  table = tf.TrackTable(rootPath)
+  for fullName in sorted(tracks):
+    table.append(tracks[fullName])
+
+  fd, tempName = ff.createTempFile(libraryFile)
+  os.close(fd)
+  try:
+    tf.writeTracksCSV(table, tempName)
+    os.replace(tempName, libraryFile)
+  except BaseException:
+    os.remove(tempName)
+    raise
+
+  return None
+
+def watchFolder(folderIn       : str, folderOut: str, outkbps: int,
+                interval       : float=60.0,
+                settle         : float=10.0,
+                nameTemplate   : str='{name}',
+                titleTemplate  : str='{title|name}',
+                artistTemplate : str='{artist}',
+                pattern        : tp.Optional[str]=None,
+                libraryFile    : str='',
+                cacheFile      : tp.Optional[str]='',
+                nWorkers       : tp.Optional[int]=None,
+                nativeParser   : bool=False,
+                prefilter      : bool=True,
+                readBudget     : tp.Optional[int]=None,
+                maxPolls       : tp.Optional[int]=None,
+                **kwargs) -> int:
+  """
+  Watches a library folder and converts new and changed audio files.
+      A snapshot of the folder tree is compared with the previous one every
+      "interval" seconds, only added and changed files are probed and
+      converted, files are named by naming rules instead of a hand-edited
+      CSV file. A library CSV file and the output tree are kept in sync:
+      converted files of removed inputs are removed.
+
+  folderIn : str
+    Library folder.
+
+  folderOut : str
+    Folder to which converted files and the library CSV file are written.
+
+  outkbps : int
+    Output kbps.
+
+  interval : float
+    Time between snapshots, seconds. Defaults to 60.0.
+
+  settle : float
+    Files modified within this time, seconds, are left to the next
+        snapshot (e.g. files being copied).
+    Defaults to 10.0.
+
+  nameTemplate, titleTemplate, artistTemplate, pattern
+    Naming rules, see "namingFunctions.applyNamingRules".
+
+  libraryFile : str
+    Full name of the library CSV file (the "getInfo" CSV file with
+        new names filled by the naming rules). Tracks listed in the file
+        are known from a previous run, so converted files of inputs removed
+        meanwhile are removed as well.
+    Defaults to '' ("library.csv" in "folderOut").
+
+  cacheFile : str
+    Full name of a persistent metadata cache (SQLite) file.
+    Defaults to '' ("metadata.sqlite" in "folderOut"),
+        None disables the cache.
+
+  nWorkers : int
+    Number of concurrent probes.
+    Defaults to None (number of CPU physical cores).
+
+  nativeParser : bool
+    Specifies whether to read MP3, FLAC, WAV and Ogg Vorbis headers
+        in-process instead of running mediainfo.
+    Defaults to False (probe all files with mediainfo).
+
+  prefilter : bool
+    Specifies whether to skip files which are not audio by extension and
+        first bytes instead of probing them.
+    Defaults to True.
+
+  readBudget : int
+    Maximum number of bytes the header parser reads from a file, mediainfo
+        reads the least of a file (see "fileFunctions.getMetadata").
+    Defaults to None (no budget).
+
+  maxPolls : int
+    Number of snapshots to take. Defaults to None (watch until
+        interrupted).
+
+  kwargs
+    "convertAudioFiles" keyword arguments ("metricsFile" defaults to None,
+        converted files CSV and LOG files are not written, "libraryFile"
+        is kept instead).
+
+  Returns 0.
+  """
+
+  sf.limitTracebackInfo(0) # limit traceback info
+  ff.dirCheck(folderIn)    # check "folderIn" correctness
+  ff.dirCheck(folderOut)   # check "folderOut" correctness
+
+  # check "interval" and "settle" argument values provided
+  for name, value in (('interval', interval), ('settle', settle)):
+    if not isinstance(value, (int, float)):
+      raise TypeError(f'"{name}" must be a number ' +
+                      f'("{type(value)}" was provided)!')
+    if value < 0:
+      raise ValueError(f'"{name}" must not be negative ' +
+                       f'("{value}" was provided)!')
+
+  # check "maxPolls" argument type and value provided
+  if maxPolls is not None:
+    if not isinstance(maxPolls, int):
+      raise TypeError('"maxPolls" must be an integer ' +
+                      f'("{type(maxPolls)}" was provided)!')
+    if maxPolls < 1:
+      raise ValueError('"maxPolls" must be positive ' +
+                       f'("{maxPolls}" was provided)!')
+
+  # set default files next to converted files
+  if libraryFile == '':
+    libraryFile = os.path.join(folderOut, 'library.csv')
+  if cacheFile == '':
+    cacheFile = os.path.join(folderOut, 'metadata.sqlite')
+
+  # set number of concurrent probes
+  if nWorkers is None:
+    nWorkers = sf.nPhysicalCores()
+
+  kwargs.setdefault('metricsFile', None) # one conversion run per snapshot
+  kwargs['reports'] = False # the library file lists converted files
+
+  # extensions of converted files of the output profiles
+  profiles   = kwargs.get('profile', 'mp3')
+  extensions = {pf.getProfile(profile, outkbps).extension for profile in
+                ([profiles] if isinstance(profiles, str) else profiles)}
+
+  # tracks known from a previous run
+  tracks = {} # file full name -> track
+  if os.path.isfile(libraryFile):
+    library = tf.readTracksCSV(libraryFile)
+    if library.rootPath == folderIn:
+      tracks = {library.fullName[i]: library[i] for i in range(len(library))}
+
+  taken = {(os.path.dirname(track.fullName), track.newFileName.lower())
+           for track in tracks.values() if track.newFileName != ''}
+
+  snapshot = {} # previous snapshot
+  nPolls   = 0
+  try:
+    while True:
+      start = time.monotonic()
+
+      # files being written are left to the next snapshot
+      listed  = ff.takeSnapshot(folderIn)
+      current = dict(listed)
+      now     = time.time_ns()
+      for fullName, (_, fileStat) in listed.items():
+        if now - fileStat.st_mtime_ns < settle * 1e9:
+          if fullName in snapshot:
+            current[fullName] = snapshot[fullName]
+          else:
+            del current[fullName]
+
+      added, changed, removed = ff.diffSnapshots(snapshot, current)
+      removed = sorted(set(removed) |
+                       {fullName for fullName in tracks
+                        if fullName not in listed})
+      snapshot = current
+
+      # remove converted files of removed inputs
+      for fullName in removed:
+        track = tracks.pop(fullName, None)
+        if track is None:
+          continue
+        if track.newFileName != '':
+          taken.discard((os.path.dirname(fullName),
+                         track.newFileName.lower()))
+          removeOutput(outputName(track, folderIn, folderOut), extensions)
+
+      if removed != [] and cacheFile is not None:
+        connection = cf.openMetadataCache(cacheFile)
+        cf.removeCachedMetadata(connection, removed)
+        connection.close()
+
+      # probe and name added and changed files
+      files = added + changed
+      if files != []:
+        batch = probeTracks(files, snapshot, folderIn, cacheFile=cacheFile,
+                            nWorkers=nWorkers, nativeParser=nativeParser,
+                            prefilter=prefilter, readBudget=readBudget)
+
+        oldNames = {} # converted file names of changed files
+        for fullName in files:
+          track = tracks.get(fullName)
+          if track is not None and track.newFileName != '':
+            taken.discard((os.path.dirname(fullName),
+                           track.newFileName.lower()))
+            oldNames[fullName] = outputName(track, folderIn, folderOut)
+
+        nf.applyNamingRules(batch, nameTemplate, titleTemplate,
+                            artistTemplate, pattern, taken=taken)
+
+        for i in range(len(batch)):
+          track = batch[i]
+          tracks[track.fullName] = track
+          # a changed file may get another name (e.g. its tags changed)
+          oldName = oldNames.get(track.fullName, '')
+          if oldName != '' and \
+              oldName != outputName(track, folderIn, folderOut):
+            removeOutput(oldName, extensions)
+
+        # convert named files, unchanged jobs are skipped by the manifest
+        if batch.selected() != []:
+          ac.convertAudioFiles(batch, folderOut, outkbps, **kwargs)
+
+      if files != [] or removed != []:
+        print(f'Added {len(added)}, changed {len(changed)}, ' +
+              f'removed {len(removed)} files.')
+        writeLibrary(tracks, folderIn, libraryFile)
+
+      nPolls += 1
+      if maxPolls is not None and nPolls >= maxPolls:
+        break
+
+      time.sleep(max(interval - (time.monotonic() - start), 0))
+  except KeyboardInterrupt: # stop watching
+    pass
+
+  return 0
+
+if __name__ == '__main__':
+  folder  = r'/mnt/Internal_HDD/0_FROM_EXTERNAL/music/'
+  out     = r'/home/linux/Downloads/converted/'
+  outkbps = 128
+
+  print(watchFolder(folder, out, outkbps))